@@ -0,0 +1,63 @@
+from importlib import import_module
+from typing import Any, Awaitable, Callable
+
+ASGIApp = Callable[..., Awaitable[None]]
+
+
+def load_app(spec: str) -> ASGIApp:
+    module_name, _, attr = spec.partition(":")
+    return getattr(import_module(module_name), attr or "app")
+
+
+async def call(
+    app: ASGIApp,
+    method: str,
+    path: str,
+    query_string: bytes = b"",
+    body: bytes = b"",
+) -> tuple[int, bytes]:
+    """Drive raw ASGI callable with a single http request, bypassing any server"""
+    scope: dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string,
+        "root_path": "",
+        "headers": [(b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8000),
+    }
+    status = 0
+    chunks: list[bytes] = []
+    request_sent = False
+
+    async def receive() -> dict[str, Any]:
+        nonlocal request_sent
+        if request_sent:
+            return {"type": "http.disconnect"}
+
+        request_sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+
+    return status, b"".join(chunks)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
@@ -0,0 +1,81 @@
+"""Requests/sec of a raw ASGI callable on a single core, no server involved.
+
+    python -m lecture_1.benchmarks.asgi_rps --app lecture_1.hw.math_plain_asgi:app
+"""
+
+import argparse
+import asyncio
+import time
+
+from typing import Any
+
+from lecture_1.benchmarks.asgi import ASGIApp, call, load_app
+
+REQUESTS = {
+    "factorial": ("GET", "/factorial", b"n=10", b""),
+    "fibonacci": ("GET", "/fibonacci/10", b"", b""),
+    "mean": ("GET", "/mean", b"", b"[1, 2.5, 3]"),
+    "bad_request": ("GET", "/fibonacci/-1", b"", b""),
+    "not_found": ("GET", "/not_found", b"", b""),
+    "wrong_method": ("POST", "/factorial", b"n=10", b""),
+}
+
+
+async def drive(app: ASGIApp, request: tuple, iterations: int) -> tuple[int, float]:
+    """Call app in a tight loop with scope and channels allocated once"""
+    method, path, query_string, body = request
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": [(b"content-length", str(len(body)).encode())],
+    }
+    request_message = {"type": "http.request", "body": body, "more_body": False}
+    status = 0
+
+    async def receive() -> dict[str, Any]:
+        return request_message
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, receive, send)
+
+    return status, time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    app = load_app(args.app)
+    names = args.routes or list(REQUESTS)
+
+    print(f"app={args.app} iterations={args.iterations}")
+    total_requests, total_elapsed = 0, 0.0
+    for name in names:
+        await call(app, *REQUESTS[name])  # warmup caches
+        await drive(app, REQUESTS[name], args.iterations // 10)
+        status, elapsed = await drive(app, REQUESTS[name], args.iterations)
+
+        total_requests += args.iterations
+        total_elapsed += elapsed
+        print(f"{name:>12}: {status} {args.iterations / elapsed:>10.0f} req/s")
+
+    print(f"{'total':>12}: {total_requests / total_elapsed:>14.0f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="lecture_1.hw.math_plain_asgi:app")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--routes", nargs="*", choices=list(REQUESTS))
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
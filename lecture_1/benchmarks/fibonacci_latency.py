@@ -0,0 +1,74 @@
+"""Latency of `/fibonacci/{n}` under mixed small/large n traffic.
+
+Requests arrive at a fixed rate (open loop), so latency includes time spent
+waiting behind heavy requests on the same event loop.
+
+    python -m lecture_1.benchmarks.fibonacci_latency --app lecture_1.hw.math_plain_asgi:app
+    python -m lecture_1.benchmarks.fibonacci_latency --app lecture_1.math_example:app
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from lecture_1.benchmarks.asgi import call, load_app, percentile
+from lecture_1.fibonacci import default_engine
+
+
+async def run(args: argparse.Namespace) -> None:
+    app = load_app(args.app)
+    default_engine.cache_size = args.cache_size
+    default_engine.clear()
+
+    rng = random.Random(args.seed)
+    latencies: dict[str, list[float]] = {"small": [], "large": []}
+    errors = 0
+
+    async def one(at: float, kind: str, n: int) -> None:
+        nonlocal errors
+        await asyncio.sleep(max(0.0, at - time.perf_counter()))
+        status, _ = await call(app, "GET", f"/fibonacci/{n}")
+        latencies[kind].append(time.perf_counter() - at)
+        errors += status != 200
+
+    start = time.perf_counter() + 0.1
+    tasks = []
+    for i in range(args.requests):
+        if rng.random() < args.large_ratio:
+            kind, n = "large", rng.randint(args.large_n // 2, args.large_n)
+        else:
+            kind, n = "small", rng.randint(0, args.small_n)
+
+        tasks.append(one(start + i / args.rps, kind, n))
+
+    await asyncio.gather(*tasks)
+
+    print(f"app={args.app} rps={args.rps} requests={args.requests} errors={errors}")
+    for kind, values in latencies.items():
+        values.sort()
+        print(
+            f"{kind:>5}: count={len(values):<6}"
+            + " ".join(
+                f"p{int(q * 100)}={percentile(values, q) * 1000:.3f}ms"
+                for q in (0.5, 0.95, 0.99)
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="lecture_1.hw.math_plain_asgi:app")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--rps", type=float, default=1_000.0)
+    parser.add_argument("--large-ratio", type=float, default=0.05)
+    parser.add_argument("--large-n", type=int, default=default_engine.max_n)
+    parser.add_argument("--small-n", type=int, default=100)
+    parser.add_argument("--cache-size", type=int, default=default_engine.cache_size)
+    parser.add_argument("--seed", type=int, default=42)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+
+# str(int) is limited to 4300 digits by default (sys.get_int_max_str_digits),
+# F(20_000) has 4180 digits so results up to this bound are always encodable
+DEFAULT_MAX_N = 20_000
+
+
+@dataclass(slots=True)
+class FibonacciEngine:
+    """Fast doubling Fibonacci with a bounded LRU cache.
+
+    `pair(n)` returns `(F(n), F(n + 1))`. Besides final results the cache keeps
+    checkpoints - pairs for prefixes of `n`'s binary representation taken every
+    `checkpoint_bits` doubling steps - so that nearby large `n` only redo the
+    low bits.
+    """
+
+    max_n: int = DEFAULT_MAX_N
+    cache_size: int = 1024
+    checkpoint_bits: int = 4
+
+    _cache: OrderedDict[int, tuple[int, int]] = field(
+        init=False, default_factory=OrderedDict
+    )
+    _lock: Lock = field(init=False, default_factory=Lock)
+
+    def pair(self, n: int) -> tuple[int, int]:
+        if n < 0:
+            raise ValueError("n must be non-negative")
+
+        if n > self.max_n:
+            raise ValueError(f"n must not exceed {self.max_n}")
+
+        cached = self._get(n)
+        if cached is not None:
+            return cached
+
+        # resume from the longest already known prefix of n
+        shift = n.bit_length()
+        a, b = 0, 1
+        for s in range(1, shift):
+            cached = self._get(n >> s)
+            if cached is not None:
+                a, b = cached
+                shift = s
+                break
+
+        for s in range(shift - 1, -1, -1):
+            # F(2k) = F(k) * (2F(k + 1) - F(k)), F(2k + 1) = F(k)^2 + F(k + 1)^2
+            c = a * (2 * b - a)
+            d = a * a + b * b
+            a, b = (d, c + d) if (n >> s) & 1 else (c, d)
+
+            if s and s % self.checkpoint_bits == 0:
+                self._put(n >> s, (a, b))
+
+        self._put(n, (a, b))
+        return a, b
+
+    def get(self, n: int) -> int:
+        return self.pair(n)[0]
+
+    def warm(self, ns: range | list[int]) -> None:
+        for n in ns:
+            self.pair(n)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _get(self, n: int) -> tuple[int, int] | None:
+        with self._lock:
+            value = self._cache.get(n)
+            if value is not None:
+                self._cache.move_to_end(n)
+
+            return value
+
+    def _put(self, n: int, value: tuple[int, int]) -> None:
+        if self.cache_size <= 0:
+            return
+
+        with self._lock:
+            self._cache[n] = value
+            self._cache.move_to_end(n)
+
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+default_engine = FibonacciEngine()
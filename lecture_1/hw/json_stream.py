@@ -0,0 +1,166 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import Any, Awaitable, Callable
+
+_TOKEN = re.compile(
+    rb"[ \t\r\n]*(?:(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)|([\[\],]))"
+)
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_NUMBER_CHARS = frozenset(b"-+.0123456789eE")
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class MalformedArray(ValueError):
+    pass
+
+
+class _State(Enum):
+    START = auto()
+    FIRST_VALUE = auto()
+    VALUE = auto()
+    COMMA = auto()
+    DONE = auto()
+
+
+@dataclass(slots=True)
+class StreamingMean:
+    """Incremental parser of a flat JSON array of numbers.
+
+    Numbers are folded into a Neumaier compensated sum as soon as they are
+    tokenized, only an unfinished token at the end of a chunk is kept around.
+    """
+
+    count: int = field(init=False, default=0)
+
+    _total: float = field(init=False, default=0.0)
+    _compensation: float = field(init=False, default=0.0)
+    _state: _State = field(init=False, default=_State.START)
+    _tail: bytes = field(init=False, default=b"")
+
+    @property
+    def value(self) -> float:
+        if self.count == 0:
+            raise ZeroDivisionError("mean of an empty array")
+
+        return (self._total + self._compensation) / self.count
+
+    def feed(self, chunk: bytes) -> None:
+        self._consume(self._tail + chunk if self._tail else chunk, final=False)
+
+    def close(self) -> None:
+        self._consume(self._tail, final=True)
+
+        if self._state is not _State.DONE:
+            raise MalformedArray("unexpected end of body")
+
+    def _consume(self, data: bytes, final: bool) -> None:
+        pos, size = 0, len(data)
+        self._tail = b""
+
+        while pos < size:
+            if self._state is _State.DONE:
+                if _WHITESPACE.match(data, pos).end() != size:
+                    raise MalformedArray("trailing data after array")
+                return
+
+            match = _TOKEN.match(data, pos)
+
+            if match is None:
+                rest = _WHITESPACE.match(data, pos).end()
+                if rest == size:
+                    return
+                if not final and all(c in _NUMBER_CHARS for c in data[rest:]):
+                    self._tail = data[rest:]
+                    return
+                raise MalformedArray(f"unexpected byte at {rest}")
+
+            number, punct = match.group(1, 2)
+
+            if number is not None:
+                end = match.end()
+                while end < size and data[end] in _NUMBER_CHARS:
+                    end += 1
+
+                if end == size and not final:
+                    # number may continue in the next chunk
+                    self._tail = data[match.start(1) :]
+                    return
+                if end != match.end():
+                    raise MalformedArray(f"invalid number at {match.start(1)}")
+
+                self._add_number(float(number))
+            else:
+                self._add_punct(punct)
+
+            pos = match.end()
+
+    def _add_number(self, x: float) -> None:
+        if self._state not in (_State.FIRST_VALUE, _State.VALUE):
+            raise MalformedArray("unexpected number")
+
+        total = self._total + x
+        if abs(self._total) >= abs(x):
+            self._compensation += (self._total - total) + x
+        else:
+            self._compensation += (x - total) + self._total
+
+        self._total = total
+        self.count += 1
+        self._state = _State.COMMA
+
+    def _add_punct(self, punct: bytes) -> None:
+        match punct, self._state:
+            case b"[", _State.START:
+                self._state = _State.FIRST_VALUE
+            case b",", _State.COMMA:
+                self._state = _State.VALUE
+            case b"]", _State.FIRST_VALUE | _State.COMMA:
+                self._state = _State.DONE
+            case _:
+                raise MalformedArray(f"unexpected {punct!r}")
+
+
+def _content_length(scope: dict[str, Any]) -> int | None:
+    for name, value in scope.get("headers", ()):
+        if name.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+
+    return None
+
+
+async def read_mean(
+    scope: dict[str, Any],
+    receive: Callable[[], Awaitable[dict[str, Any]]],
+    max_body_size: int,
+) -> StreamingMean | None:
+    """Fold request body into `StreamingMean`, returns None if client is gone"""
+    content_length = _content_length(scope)
+    if content_length is not None and content_length > max_body_size:
+        raise BodyTooLarge(f"content-length {content_length} > {max_body_size}")
+
+    mean = StreamingMean()
+    received = 0
+    more_body = True
+
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+
+        chunk = message.get("body", b"")
+        received += len(chunk)
+        if received > max_body_size:
+            raise BodyTooLarge(f"body exceeds {max_body_size} bytes")
+
+        mean.feed(chunk)
+        more_body = message.get("more_body", False)
+
+    mean.close()
+    return mean
@@ -1,90 +1,103 @@
 from typing import Any, Awaitable, Callable
 from urllib.parse import parse_qs
 import json
-import math
 
-async def bad_request(send):
-    await send({"type": "http.response.start", "status": 400, 'headers': [(b'content-type', b'text/plain')]})
-    await send({"type": "http.response.body", "body": b" Bad Request"})
+from lecture_1.fibonacci import default_engine as fibonacci_engine
+from lecture_1.hw.json_stream import BodyTooLarge, MalformedArray, read_mean
+from lecture_1.hw.routing import Router, StaticResponse
+from lecture_1.offload import FACTORIAL_MAX_N, Overloaded, encode_factorial
+from lecture_1.offload import default_executor as offload_executor
+from lecture_1.precomputed import default_tables as result_tables
 
-async def unprocessable_entity(send):
-    await send({"type": "http.response.start", "status": 422, 'headers': [(b'content-type', b'text/plain')]})
-    await send({"type": "http.response.body", "body": b" Unprocessable Entity"})
+MAX_MEAN_BODY_SIZE = 16 * 1024 * 1024
+
+BAD_REQUEST = StaticResponse.build(400, b" Bad Request")
+UNPROCESSABLE_ENTITY = StaticResponse.build(422, b" Unprocessable Entity")
+PAYLOAD_TOO_LARGE = StaticResponse.build(413, b" Payload Too Large")
+SERVICE_UNAVAILABLE = StaticResponse.build(503, b" Service Unavailable", headers=((b'retry-after', b'1'),))
+OK_START = {"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]}
 
 async def good_response(send, response_body):
-    await send({"type": "http.response.start", "status": 200, "headers": [ (b"content-type", b"application/json")]})
+    await send(OK_START)
     await send({"type": "http.response.body", "body": response_body})
 
-async def not_found(send):
-    await send({"type": "http.response.start", "status": 404, "headers": [ (b"content-type", b"application/json")]})
-    await send({"type": "http.response.body", "body": b"Not Found"})
+
+router = Router()
+
+
+@router.get('/factorial')
+async def factorial(scope, receive, send, params):
+    num_json = parse_qs(scope.get('query_string').decode())
+    try:
+        n = int(num_json.get('n')[0])
+        if 0 <= n <= FACTORIAL_MAX_N:
+            response_body = result_tables.factorial_body(n)
+            if response_body is None:
+                response_body = await offload_executor.run(encode_factorial, n, cost=n)
+            await good_response(send, response_body)
+        else:
+            await BAD_REQUEST(send)
+    except (TypeError, ValueError):
+        await UNPROCESSABLE_ENTITY(send)
+    except Overloaded:
+        await SERVICE_UNAVAILABLE(send)
+
+
+@router.get('/fibonacci')
+async def fibonacci_without_n(scope, receive, send, params):
+    await UNPROCESSABLE_ENTITY(send)
+
+
+@router.get('/fibonacci/{n}')
+async def fibonacci(scope, receive, send, params):
+    try:
+        n = int(params['n'])
+    except ValueError:
+        await UNPROCESSABLE_ENTITY(send)
+        return None
+    if 0 <= n <= fibonacci_engine.max_n:
+        response_body = result_tables.fibonacci_body(n)
+        if response_body is None:
+            # same value the original loop returned (`b` after n steps)
+            _, result = fibonacci_engine.pair(n)
+            response_body = json.dumps({"result": result}).encode('utf-8')
+        await good_response(send, response_body)
+    else:
+        await BAD_REQUEST(send)
+
+
+@router.get('/mean')
+async def mean(scope, receive, send, params):
+    try:
+        mean = await read_mean(scope, receive, MAX_MEAN_BODY_SIZE)
+    except BodyTooLarge:
+        await PAYLOAD_TOO_LARGE(send)
+        return None
+    except MalformedArray:
+        await UNPROCESSABLE_ENTITY(send)
+        return None
+    if mean is None:
+        return None
+    if mean.count == 0:
+        await BAD_REQUEST(send)
+        return None
+    response_body = json.dumps({"result": mean.value}).encode('utf-8')
+    await good_response(send, response_body)
 
 
 async def app(
         scope: dict[str, Any],
         receive: Callable[[], Awaitable[dict[str, Any]]],
         send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
-    if scope['type'] == 'lifespan':
+    if scope['type'] == 'http':
+        handler, params = router.resolve(scope['method'], scope['path'])
+        await handler(scope, receive, send, params)
+    elif scope['type'] == 'lifespan':
         while True:
             message = await receive()
             if message['type'] == 'lifespan.startup':
                 await send({'type': 'lifespan.startup.complete'})
             elif message['type'] == 'lifespan.shutdown':
+                offload_executor.shutdown()
                 await send({'type': 'lifespan.shutdown.complete'})
                 return
-    elif scope['type'] == 'http':
-        # assert scope['type'] == 'http'
-        if scope['method'] == 'GET':
-            path = scope.get('path')
-            if path.startswith('/factorial'):
-                num_json = parse_qs(scope.get('query_string').decode())
-                try:
-                    n = int(num_json.get('n')[0])
-                    if n>=0:
-                        result = math.factorial(n)
-                        response_body = json.dumps({"result": result}).encode('utf-8')
-                        await good_response(send, response_body)
-                    else:
-                        await bad_request(send)
-                except (TypeError, ValueError):
-                    await unprocessable_entity(send)
-
-
-            elif path.startswith('/fibonacci'):
-                num_str = path.split('/')[-1]
-                try:
-                    n = int(num_str)
-                    if n>=0:
-                        a, b = 0, 1
-                        for _ in range(n):
-                            a, b = b, a + b
-                        fibonacci = b
-                        response_body = json.dumps({"result": fibonacci}).encode('utf-8')
-                        await good_response(send, response_body)
-                    else:
-                        await bad_request(send)
-                except (TypeError, ValueError):
-                    await unprocessable_entity(send)
-
-
-            elif path.startswith('/mean'):
-                message = await receive()
-                decoded_string = message.get("body").decode('utf-8')
-                if not decoded_string:
-                    await unprocessable_entity(send)
-                    return None
-                if decoded_string == '[]':
-                    await bad_request(send)
-                    return None
-                try:
-                    numbers = json.loads(decoded_string)
-                    mean_value = sum(numbers) / len(numbers)
-                    response_body = json.dumps({"result": mean_value}).encode('utf-8')
-                    await good_response(send, response_body)
-                except:
-                    await unprocessable_entity(send)
-                    return None
-            else:
-                await not_found(send)
-        else:
-            await not_found(send)
@@ -0,0 +1,127 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Handler = Callable[[dict[str, Any], Receive, Send, dict[str, str]], Awaitable[None]]
+
+_PARAM = re.compile(r"{(\w+)}")
+
+
+@dataclass(slots=True, frozen=True)
+class StaticResponse:
+    """Response messages built once and sent as is on every request"""
+
+    start: dict[str, Any]
+    body: dict[str, Any]
+
+    @staticmethod
+    def build(
+        status: int,
+        body: bytes,
+        content_type: bytes = b"text/plain",
+        headers: tuple[tuple[bytes, bytes], ...] = (),
+    ) -> "StaticResponse":
+        return StaticResponse(
+            start={
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", content_type),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            },
+            body={"type": "http.response.body", "body": body},
+        )
+
+    async def __call__(self, send: Send) -> None:
+        await send(self.start)
+        await send(self.body)
+
+    async def handle(
+        self, scope: dict[str, Any], receive: Receive, send: Send, params: dict[str, str]
+    ) -> None:
+        await send(self.start)
+        await send(self.body)
+
+
+NOT_FOUND = StaticResponse.build(404, b"Not Found", b"application/json")
+
+_not_found = NOT_FOUND.handle
+_NO_PARAMS: dict[str, str] = {}
+
+
+def _method_not_allowed(methods: dict[str, Handler]) -> StaticResponse:
+    allow = ", ".join(sorted(methods)).encode()
+    return StaticResponse.build(405, b" Method Not Allowed", headers=((b"allow", allow),))
+
+
+@dataclass(slots=True)
+class _Route:
+    methods: dict[str, Handler] = field(default_factory=dict)
+    method_not_allowed: Handler = _not_found
+
+
+@dataclass(slots=True)
+class Router:
+    """Compiles path patterns like `/fibonacci/{n}` once.
+
+    Exact paths are resolved with a single dict lookup, parameterized ones
+    are tried in registration order. Path params are passed to handlers as
+    strings.
+    """
+
+    _exact: dict[str, _Route] = field(init=False, default_factory=dict)
+    _patterns: list[tuple[re.Pattern[str], _Route]] = field(
+        init=False, default_factory=list
+    )
+
+    def add(self, method: str, path: str, handler: Handler) -> None:
+        route = self._route(path)
+        route.methods[method] = handler
+        route.method_not_allowed = _method_not_allowed(route.methods).handle
+
+    def get(self, path: str) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self.add("GET", path, handler)
+            return handler
+
+        return decorator
+
+    def resolve(self, method: str, path: str) -> tuple[Handler, dict[str, str]]:
+        """Returns handler for request, 404 and 405 are handlers as well"""
+        route = self._exact.get(path)
+        if route is not None:
+            params = _NO_PARAMS
+        else:
+            for pattern, route in self._patterns:
+                match = pattern.fullmatch(path)
+                if match is not None:
+                    params = match.groupdict()
+                    break
+            else:
+                return _not_found, _NO_PARAMS
+
+        handler = route.methods.get(method)
+        if handler is None:
+            return route.method_not_allowed, _NO_PARAMS
+
+        return handler, params
+
+    def _route(self, path: str) -> _Route:
+        if _PARAM.search(path) is None:
+            return self._exact.setdefault(path, _Route())
+
+        regex = "".join(
+            f"(?P<{part}>[^/]+)" if i % 2 else re.escape(part)
+            for i, part in enumerate(_PARAM.split(path))
+        )
+        for pattern, route in self._patterns:
+            if pattern.pattern == regex:
+                return route
+
+        route = _Route()
+        self._patterns.append((re.compile(regex), route))
+        return route
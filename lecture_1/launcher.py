@@ -0,0 +1,208 @@
+"""Pre-forking launcher for the math services.
+
+Caches are warmed once in the parent and inherited by forked workers, each
+worker listens on its own SO_REUSEPORT socket so the kernel balances
+connections between them. Crashed workers are restarted, SIGTERM/SIGINT
+drain all workers gracefully.
+
+    python -m lecture_1.launcher lecture_1.hw.math_plain_asgi:app --workers 4
+    python -m lecture_1.launcher lecture_1.math_example:app --port 8080
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass, field
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+import uvicorn
+
+from lecture_1.fibonacci import default_engine as fibonacci_engine
+from lecture_1.offload import default_executor as offload_executor
+from lecture_1.precomputed import default_tables as result_tables
+
+logger = logging.getLogger("lecture_1.launcher")
+
+# workers that die sooner than this after start are restarted with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def load_app(spec: str) -> Any:
+    module_name, _, attr = spec.partition(":")
+    return getattr(import_module(module_name), attr or "app")
+
+
+def warm_caches(fibonacci_up_to: int) -> None:
+    fibonacci_engine.warm(range(0, fibonacci_up_to + 1))
+
+    # checkpoints on the way to max_n speed up all large requests
+    step = max(1, fibonacci_engine.max_n // 16)
+    fibonacci_engine.warm(range(step, fibonacci_engine.max_n + 1, step))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+
+    return sock
+
+
+@dataclass(slots=True)
+class Supervisor:
+    app: Any
+    host: str
+    port: int
+    workers: int
+    graceful_timeout: float = 10.0
+    backlog: int = 2048
+    log_level: str = "info"
+
+    _reserved: socket.socket | None = field(init=False, default=None)
+    _pids: dict[int, float] = field(init=False, default_factory=dict)
+    _stopping_since: float | None = field(init=False, default=None)
+    _killed: bool = field(init=False, default=False)
+
+    def run(self) -> None:
+        # fail fast if address is taken and keep the port reserved for restarts,
+        # not listening so that kernel never routes connections to it
+        self._reserved = bind_socket(self.host, self.port)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        try:
+            while self._pids:
+                self._reap()
+                time.sleep(0.05)
+        finally:
+            self._reserved.close()
+
+        logger.info("all workers stopped")
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+
+        if pid == 0:
+            code = 0
+            try:
+                self._serve()
+            except BaseException:
+                logger.exception("worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+
+        self._pids[pid] = time.monotonic()
+        logger.info("started worker %d", pid)
+
+    def _serve(self) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        self._reserved.close()
+        sock = bind_socket(self.host, self.port)
+        sock.listen(self.backlog)
+        # process pool can't be shared across fork, each worker starts its own
+        # and together they shouldn't oversubscribe the cores
+        if offload_executor.max_workers is None:
+            offload_executor.max_workers = max(1, (os.cpu_count() or 1) // self.workers)
+        offload_executor.warm()
+
+        config = uvicorn.Config(
+            self.app,
+            log_level=self.log_level,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def _reap(self) -> None:
+        while self._pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+
+            started_at = self._pids.pop(pid, None)
+            if started_at is None:
+                continue
+
+            if self._stopping_since is not None:
+                logger.info("worker %d stopped", pid)
+                continue
+
+            logger.warning(
+                "worker %d exited with code %d, restarting",
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            if time.monotonic() - started_at < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+                # a signal received while sleeping must not start new workers
+                if self._stopping_since is not None:
+                    continue
+
+            self._spawn()
+
+        if (
+            self._stopping_since is not None
+            and not self._killed
+            and time.monotonic() - self._stopping_since > self.graceful_timeout + 1
+        ):
+            self._killed = True
+            for pid in self._pids:
+                logger.warning("worker %d did not drain in time, killing", pid)
+                os.kill(pid, signal.SIGKILL)
+
+    def _stop(self, signum: int, _: Any) -> None:
+        if self._stopping_since is not None:
+            return
+
+        logger.info("received %s, draining workers", signal.Signals(signum).name)
+        self._stopping_since = time.monotonic()
+
+        for pid in self._pids:
+            os.kill(pid, signal.SIGTERM)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("app", help="module:attr of ASGI app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=float, default=10.0)
+    parser.add_argument("--warm-fibonacci", type=int, default=500)
+    parser.add_argument("--tables", type=Path, help="precomputed tables directory")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    app = load_app(args.app)
+    warm_caches(args.warm_fibonacci)
+    if args.tables is not None:
+        # mapped before fork, so all workers share the same page cache
+        result_tables.load(args.tables)
+
+    Supervisor(
+        app=app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        graceful_timeout=args.graceful_timeout,
+        log_level=args.log_level,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,74 @@
-import math
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-app = FastAPI()
+from lecture_1.fibonacci import default_engine as fibonacci_engine
+from lecture_1.offload import FACTORIAL_MAX_N, Overloaded, encode_factorial
+from lecture_1.offload import default_executor as offload_executor
+from lecture_1.precomputed import default_tables as result_tables
+
+
+class RawJSONResponse(Response):
+    """Sends already encoded body as is, memoryviews included"""
+
+    media_type = "application/json"
+
+    def render(self, content: bytes | memoryview) -> bytes | memoryview:
+        return content
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+
+    offload_executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/factorial")
-def get_factorial(n: Annotated[int, Query()]) -> JSONResponse:
-    if n < 0:
+async def get_factorial(n: Annotated[int, Query()]) -> Response:
+    if not 0 <= n <= FACTORIAL_MAX_N:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
-            detail="Invalid value for n, must be non-negative",
+            detail=f"Invalid value for n, must be in [0, {FACTORIAL_MAX_N}]",
         )
 
-    result = math.factorial(n)
+    body = result_tables.factorial_body(n)
+    if body is not None:
+        return RawJSONResponse(body)
 
-    return JSONResponse({"result": result})
+    try:
+        body = await offload_executor.run(encode_factorial, n, cost=n)
+    except Overloaded:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="Too many heavy requests in flight, retry later",
+            headers={"Retry-After": "1"},
+        )
+
+    return RawJSONResponse(body)
 
 
 @app.get("/fibonacci/{n}")
-def get_fibonacci(n: int) -> JSONResponse:
-    if n < 0:
+def get_fibonacci(n: int) -> Response:
+    if not 0 <= n <= fibonacci_engine.max_n:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
-            detail="Invalid value for n, must be non-negative",
+            detail=f"Invalid value for n, must be in [0, {fibonacci_engine.max_n}]",
         )
 
-    a, b = 0, 1
-    for _ in range(n):
-        a, b = b, a + b
+    body = result_tables.fibonacci_body(n)
+    if body is not None:
+        return RawJSONResponse(body)
+
+    _, result = fibonacci_engine.pair(n)
 
-    return JSONResponse({"result": b})
+    return JSONResponse({"result": result})
 
 
 @app.get("/mean")
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from threading import Thread
+from typing import Callable
+
+# math.factorial(1_000) has 2568 digits, well below default int->str limit of
+# 4300 digits, so everything below the threshold is safe to encode inline
+DEFAULT_COST_THRESHOLD = 1_000
+FACTORIAL_MAX_N = 100_000
+
+
+class Overloaded(Exception):
+    pass
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    while os.getppid() == parent_pid:
+        time.sleep(1.0)
+
+    os._exit(1)
+
+
+def _init_worker() -> None:
+    # workers exist to encode huge integers, lift the DoS guard only there
+    sys.set_int_max_str_digits(0)
+
+    # don't outlive a server process that was killed without shutting pool down
+    Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+
+def encode_factorial(n: int) -> bytes:
+    return json.dumps({"result": math.factorial(n)}).encode("utf-8")
+
+
+@dataclass(slots=True)
+class OffloadExecutor:
+    """Runs cheap calls inline and heavy ones in a process pool.
+
+    At most `max_in_flight` heavy calls are running or queued at a time, the
+    rest are rejected with `Overloaded` so callers can answer 503 right away.
+    """
+
+    cost_threshold: int = DEFAULT_COST_THRESHOLD
+    max_workers: int | None = None
+    max_in_flight: int = 8
+
+    _pool: ProcessPoolExecutor | None = field(init=False, default=None)
+    _in_flight: int = field(init=False, default=0)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def run[_TRes](
+        self,
+        func: Callable[..., _TRes],
+        *args,
+        cost: int,
+    ) -> _TRes:
+        if cost < self.cost_threshold:
+            return func(*args)
+
+        if self._in_flight >= self.max_in_flight:
+            raise Overloaded(f"{self._in_flight} heavy calls already in flight")
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        finally:
+            self._in_flight -= 1
+
+    def start(self) -> None:
+        self._get_pool()
+
+    def warm(self) -> None:
+        """Spawns pool processes ahead of the first heavy request"""
+        pool = self._get_pool()
+        workers = self.max_workers or os.cpu_count() or 1
+        for future in [pool.submit(int) for _ in range(workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+
+        return self._pool
+
+
+default_executor = OffloadExecutor()
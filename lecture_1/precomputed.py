@@ -0,0 +1,167 @@
+"""Precomputed response bodies for hot math inputs.
+
+Table file layout (little endian):
+
+    magic   8 bytes  b"MATHTBL1"
+    count   u64      bodies are stored for n in [0, count)
+    offsets u64 * (count + 1), relative to the start of data
+    data    concatenated encoded JSON bodies
+
+Build tables once and point the apps to their directory:
+
+    python -m lecture_1.precomputed ./tables --factorial 3000 --fibonacci 20000
+    MATH_TABLES_DIR=./tables uvicorn lecture_1.hw.math_plain_asgi:app
+    python -m lecture_1.launcher lecture_1.math_example:app --tables ./tables
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+MAGIC = b"MATHTBL1"
+TABLES_DIR_ENV = "MATH_TABLES_DIR"
+TABLE_NAMES = ("factorial", "fibonacci")
+
+_HEADER = struct.Struct("<8sQ")
+_OFFSET = struct.Struct("<Q")
+
+
+def factorial_bodies(limit: int) -> Iterable[bytes]:
+    value = 1
+    for n in range(limit):
+        if n > 0:
+            value *= n
+        yield json.dumps({"result": value}).encode("utf-8")
+
+
+def fibonacci_bodies(limit: int) -> Iterable[bytes]:
+    # same values as /fibonacci/{n} returns, F(n + 1)
+    a, b = 0, 1
+    for _ in range(limit):
+        a, b = b, a + b
+        yield json.dumps({"result": a}).encode("utf-8")
+
+
+def write_table(path: Path, count: int, bodies: Iterable[bytes]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    offsets = [0]
+
+    with tmp.open("wb") as out:
+        out.write(_HEADER.pack(MAGIC, count))
+        out.seek(_OFFSET.size * (count + 1), os.SEEK_CUR)
+
+        for body in bodies:
+            out.write(body)
+            offsets.append(offsets[-1] + len(body))
+
+        if len(offsets) != count + 1:
+            raise ValueError(f"expected {count} bodies, got {len(offsets) - 1}")
+
+        out.seek(_HEADER.size)
+        out.write(struct.pack(f"<{count + 1}Q", *offsets))
+
+    tmp.replace(path)
+
+
+@dataclass(slots=True)
+class ResultTable:
+    """Read-only view over a table file, `get` returns slices of the mapping"""
+
+    count: int
+    _mapping: mmap.mmap
+    _view: memoryview
+    _offsets: memoryview
+    _data_start: int
+
+    @staticmethod
+    def open(path: Path) -> "ResultTable":
+        with path.open("rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = _HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            mapping.close()
+            raise ValueError(f"{path} is not a result table")
+
+        view = memoryview(mapping)
+        offsets_end = _HEADER.size + _OFFSET.size * (count + 1)
+
+        return ResultTable(
+            count=count,
+            _mapping=mapping,
+            _view=view,
+            _offsets=view[_HEADER.size : offsets_end].cast("Q"),
+            _data_start=offsets_end,
+        )
+
+    def get(self, n: int) -> memoryview | None:
+        if not 0 <= n < self.count:
+            return None
+
+        start = self._data_start + self._offsets[n]
+        end = self._data_start + self._offsets[n + 1]
+        return self._view[start:end]
+
+    def close(self) -> None:
+        self._offsets.release()
+        self._view.release()
+        self._mapping.close()
+
+
+@dataclass(slots=True)
+class Tables:
+    factorial: ResultTable | None = None
+    fibonacci: ResultTable | None = None
+
+    @staticmethod
+    def from_env() -> "Tables":
+        tables = Tables()
+        if directory := os.environ.get(TABLES_DIR_ENV):
+            tables.load(Path(directory))
+
+        return tables
+
+    def load(self, directory: Path) -> None:
+        for name in TABLE_NAMES:
+            path = directory / f"{name}.tbl"
+            if path.exists():
+                setattr(self, name, ResultTable.open(path))
+
+    def factorial_body(self, n: int) -> memoryview | None:
+        return self.factorial.get(n) if self.factorial is not None else None
+
+    def fibonacci_body(self, n: int) -> memoryview | None:
+        return self.fibonacci.get(n) if self.fibonacci is not None else None
+
+
+default_tables = Tables.from_env()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--factorial", type=int, default=3_000, help="n limit")
+    parser.add_argument("--fibonacci", type=int, default=20_000, help="n limit")
+    args = parser.parse_args()
+
+    # bodies for large n are way above default int->str digit limit
+    sys.set_int_max_str_digits(0)
+    args.directory.mkdir(parents=True, exist_ok=True)
+
+    for name, count, bodies in (
+        ("factorial", args.factorial, factorial_bodies(args.factorial)),
+        ("fibonacci", args.fibonacci, fibonacci_bodies(args.fibonacci)),
+    ):
+        path = args.directory / f"{name}.tbl"
+        write_table(path, count, bodies)
+        print(f"{path}: {count} bodies, {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Python-side cost of broadcasting one message to many Starlette websockets.
+
+`send_text` builds a new ASGI event per subscriber, the broadcast path
+builds one and hands the same event to every `ws.send`. The ASGI send
+below is a no-op, so server framing is not included.
+
+    python -m lecture_2.hw.benchmarks.broadcast_send --subscribers 10000 --sizes 16 4096
+"""
+
+import argparse
+import asyncio
+import time
+
+from starlette.websockets import WebSocket
+
+from lecture_2.hw.shop_api.fanout import text_event
+
+
+async def connected(count: int) -> list[WebSocket]:
+    async def receive() -> dict:
+        return {"type": "websocket.connect"}
+
+    async def send(message: dict) -> None:
+        pass
+
+    sockets = []
+    for _ in range(count):
+        ws = WebSocket({"type": "websocket", "path": "/", "headers": []}, receive, send)
+        await ws.accept()
+        sockets.append(ws)
+
+    return sockets
+
+
+async def per_subscriber(sockets: list[WebSocket], message: str) -> None:
+    for ws in sockets:
+        await ws.send_text(message)
+
+
+async def broadcast(sockets: list[WebSocket], message: str) -> None:
+    event = text_event(message)
+    for ws in sockets:
+        await ws.send(event)
+
+
+async def measure(func, sockets: list[WebSocket], message: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func(sockets, message)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    sockets = await connected(args.subscribers)
+
+    for size in args.sizes:
+        message = "x" * size
+        old = await measure(per_subscriber, sockets, message, args.repeat)
+        new = await measure(broadcast, sockets, message, args.repeat)
+        print(
+            f"subscribers={args.subscribers} size={size:<6} "
+            f"send_text {old:7.2f}ms  shared event {new:7.2f}ms per publish"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 4096])
+    parser.add_argument("--repeat", type=int, default=20)
+
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cost of adding to and filtering carts with thousands of lines.
+
+Compares the line map kept by `Cart` with the linear scan over `cart.items`
+and the per-request `sum(...)` over lines that shop_api used before.
+
+    python -m lecture_2.hw.benchmarks.cart_lines --lines 1000 5000
+"""
+
+import argparse
+import random
+import time
+
+from lecture_2.hw.shop_api.models import Cart, CartItem
+from lecture_2.hw.shop_api.store import CartStore, ItemStore
+
+
+def linear_add(cart: Cart, item) -> None:
+    for line in cart.items:
+        if line.id == item.id:
+            line.quantity += 1
+            break
+    else:
+        cart.items.append(CartItem(id=item.id, name=item.name, quantity=1))
+    cart.price += item.price
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(lines: int, carts_count: int, adds: int) -> None:
+    rng = random.Random(lines)
+    items = ItemStore()
+    catalog = [items.create(f"item {i}", rng.uniform(1.0, 100.0)) for i in range(lines)]
+
+    carts = CartStore()
+    for _ in range(carts_count):
+        cart = carts.create()
+        for item in catalog:
+            carts.add_item(cart.id, item)
+
+    baseline = Cart(id=0)
+    for item in catalog:
+        linear_add(baseline, item)
+    target = carts.get(1)
+
+    picks = [rng.choice(catalog) for _ in range(adds)]
+    it_new, it_old, it_store = iter(picks), iter(picks), iter(picks)
+
+    add_new = measure(lambda: target.add(next(it_new)), adds)
+    add_old = measure(lambda: linear_add(baseline, next(it_old)), adds)
+    # includes moving cart within price and quantity indexes
+    add_store = measure(lambda: carts.add_item(target.id, next(it_store)), adds)
+
+    all_carts = list(carts._data.values())
+    filter_old = measure(
+        lambda: [
+            c
+            for c in all_carts
+            if sum(line.quantity for line in c.items) >= lines
+            and sum(line.quantity for line in c.items) <= 2 * lines
+        ],
+        10,
+    )
+    filter_new = measure(
+        lambda: carts.list(limit=carts_count, min_quantity=lines, max_quantity=2 * lines),
+        10,
+    )
+
+    print(
+        f"lines={lines:<6} add: map {add_new:7.2f}us  scan {add_old:7.2f}us  "
+        f"store {add_store:7.2f}us | "
+        f"filter {carts_count} carts: aggregates {filter_new:9.1f}us  "
+        f"sum {filter_old:9.1f}us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1_000, 5_000])
+    parser.add_argument("--carts", type=int, default=50)
+    parser.add_argument("--adds", type=int, default=2_000)
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        run(lines, args.carts, args.adds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Frames sent and fan-out time for a burst of chat messages, with and
+without coalescing.
+
+Every message is published to a `ChatRoom` of in-memory subscribers as
+fast as possible. With coalescing, each window of `--delay` seconds or
+`--batch` messages goes out as one JSON array frame.
+
+    python -m lecture_2.hw.benchmarks.chat_coalescing --subscribers 1000 --messages 10000
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+
+from lecture_2.hw.shop_api.websocket import ChatRoom
+
+
+@dataclass(slots=True, eq=False)
+class CountingWebSocket:
+    frames: int = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send(self, event: dict) -> None:
+        self.frames += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def run(room: ChatRoom, subscribers: int, messages: int) -> tuple[float, int]:
+    sockets = [CountingWebSocket() for _ in range(subscribers)]
+    for ws in sockets:
+        await room.subscribe(ws)
+
+    start = time.perf_counter()
+    for i in range(messages):
+        await room.publish(f"message {i}")
+        if i % 100 == 99:
+            # lets sender tasks and coalescing timers run, like a receive loop would
+            await asyncio.sleep(0)
+    if room.coalescer is not None:
+        room.coalescer.flush()
+    while any(subscriber._queue for subscriber in room.subscribers.values()):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    for ws in sockets:
+        await room.unsubscribe(ws)
+    return elapsed, sum(ws.frames for ws in sockets)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(f"subscribers={args.subscribers} messages={args.messages}")
+    rooms = (
+        ("per message", ChatRoom(max_queue=args.messages)),
+        ("coalesced", ChatRoom(max_queue=args.messages, coalesce_delay=args.delay, coalesce_batch=args.batch)),
+    )
+    for name, room in rooms:
+        elapsed, frames = await run(room, args.subscribers, args.messages)
+        print(f"{name:>12}: {elapsed * 1e3:9.1f}ms  {frames:>10} frames")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--batch", type=int, default=64)
+
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Delivery latency of healthy chat subscribers while a few are slow.
+
+Compares `ChatRoom` with per-subscriber queues and writer tasks against
+the previous room that awaited `send_text` on every subscriber in turn.
+Subscribers are in-memory fakes, so only fan-out overhead is measured.
+
+    python -m lecture_2.hw.benchmarks.chat_fanout --subscribers 10000 --slow 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from lecture_2.hw.shop_api.websocket import ChatRoom
+
+
+@dataclass(slots=True)
+class SequentialRoom:
+    subscribers: list = field(default_factory=list)
+
+    async def subscribe(self, ws) -> None:
+        await ws.accept()
+        self.subscribers.append(ws)
+
+    async def unsubscribe(self, ws) -> None:
+        self.subscribers.remove(ws)
+
+    async def publish(self, message: str) -> None:
+        for ws in self.subscribers:
+            await ws.send_text(message)
+
+
+@dataclass(slots=True, eq=False)
+class FakeWebSocket:
+    published: dict[str, float]
+    latencies: list[float] | None
+    delay: float = 0.0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send(self, event: dict) -> None:
+        message = event["text"]
+        if message.startswith("{"):
+            # ChatRoom frames carry the message with its seq, the replay frame carries none
+            message = json.loads(message).get("message")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.latencies is not None and message is not None:
+            self.latencies.append(time.perf_counter() - self.published[message])
+
+    async def send_text(self, message: str) -> None:
+        await self.send({"type": "websocket.send", "text": message})
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def run(room, subscribers: int, slow: int, messages: int, interval: float, delay: float):
+    published: dict[str, float] = {}
+    latencies: list[float] = []
+    slow_positions = set(random.Random(0).sample(range(subscribers), slow))
+
+    sockets = [
+        FakeWebSocket(published, None, delay) if i in slow_positions
+        else FakeWebSocket(published, latencies)
+        for i in range(subscribers)
+    ]
+    for ws in sockets:
+        await room.subscribe(ws)
+
+    publish_times = []
+    for i in range(messages):
+        message = f"message {i}"
+        published[message] = time.perf_counter()
+        await room.publish(message)
+        publish_times.append(time.perf_counter() - published[message])
+        await asyncio.sleep(interval)
+
+    expected = (subscribers - slow) * messages
+    deadline = time.perf_counter() + 60
+    while len(latencies) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    for ws in sockets:
+        await room.unsubscribe(ws)
+
+    return latencies, publish_times
+
+
+def describe(name: str, latencies: list[float], publish_times: list[float]) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:>10}: healthy p50 {quantiles[49] * 1e3:8.2f}ms  p99 {quantiles[98] * 1e3:8.2f}ms  "
+        f"max {max(latencies) * 1e3:8.2f}ms | publish call {statistics.mean(publish_times) * 1e3:8.2f}ms"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"subscribers={args.subscribers} slow={args.slow} (+{args.delay * 1e3:.0f}ms per send) "
+        f"messages={args.messages} every {args.interval * 1e3:.0f}ms"
+    )
+    for name, room in (("queued", ChatRoom()), ("sequential", SequentialRoom())):
+        latencies, publish_times = await run(
+            room, args.subscribers, args.slow, args.messages, args.interval, args.delay
+        )
+        describe(name, latencies, publish_times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--slow", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds per send for slow ones")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between publishes")
+
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cost of rendering `/item` and `/cart` list bodies.
+
+Compares what FastAPI does for returned models (`jsonable_encoder` and
+`json.dumps`) with joining per-entity JSON bytes cached on the models.
+
+    python -m lecture_2.hw.benchmarks.list_serialization --limits 10 100 1000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from lecture_2.hw.shop_api.main import json_list_response
+from lecture_2.hw.shop_api.store import CartStore, ItemStore
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def encoder_body(entities: list) -> bytes:
+    # same as starlette JSONResponse.render after FastAPI serialize_response
+    return json.dumps(
+        jsonable_encoder(entities),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def run(limit: int, lines: int, repeat: int) -> None:
+    rng = random.Random(limit)
+    items, carts = ItemStore(), CartStore()
+    catalog = [items.create(f"item {i}", rng.uniform(1.0, 100.0)) for i in range(limit)]
+    for _ in range(limit):
+        cart = carts.create()
+        carts.add_items(cart.id, [(rng.choice(catalog), rng.randint(1, 3)) for _ in range(lines)])
+
+    for name, page in (
+        ("items", items.list(limit=limit).entities),
+        ("carts", carts.list(limit=limit).entities),
+    ):
+        assert json.loads(encoder_body(page)) == json.loads(json_list_response(page).body)
+
+        encoder = measure(lambda: encoder_body(page), repeat)
+        cold = measure(
+            lambda: [entity.invalidate_json() for entity in page] and json_list_response(page),
+            repeat,
+        )
+        cached = measure(lambda: json_list_response(page), repeat)
+
+        print(
+            f"{name} limit={limit:<5} jsonable_encoder {encoder:9.1f}us  "
+            f"cold cache {cold:9.1f}us  cached {cached:9.1f}us"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 100, 1_000])
+    parser.add_argument("--lines", type=int, default=5, help="lines per cart")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for limit in args.limits:
+        run(limit, args.lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
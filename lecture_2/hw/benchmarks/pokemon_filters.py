@@ -0,0 +1,72 @@
+"""Filtered Pokemon listing at 1M records, indexes against a linear filter.
+
+The linear filter walks every pokemon, which is what a client paging
+through the unfiltered list does. `DenseStore.get_many` answers
+`published` from the slot state bytes and `name_prefix` from the sorted
+name index, or by a walk in slot order when the prefix is common.
+
+    python -m lecture_2.hw.benchmarks.pokemon_filters --records 1000000
+"""
+
+import argparse
+import random
+import time
+from itertools import islice
+
+from lecture_2.rest_example.store import DenseStore, PokemonInfo
+
+
+def linear(store: DenseStore, offset: int, limit: int, published: bool | None, name_prefix: str | None):
+    matches = (
+        entity
+        for entity in store.entities()
+        if (published is None or entity.info.published == published)
+        and (name_prefix is None or entity.info.name.startswith(name_prefix))
+    )
+    return list(islice(matches, offset, offset + limit))
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    store = DenseStore()
+    start = time.perf_counter()
+    for i in range(args.records):
+        # 1% published, names share a few thousand 4 letter prefixes
+        store.add(PokemonInfo(f"{rng.randrange(5000):04d}-{i}", rng.random() < 0.01))
+    print(f"records={args.records} limit={args.limit} built in {time.perf_counter() - start:.1f}s")
+
+    cases = (
+        ("published, offset 0", 0, True, None),
+        ("published, offset 5000", 5000, True, None),
+        ("unpublished, offset 500000", 500_000, False, None),
+        ("name_prefix 0042", 0, None, "0042"),
+        ("name_prefix 0, 20% of names", 0, None, "0"),
+        ("name_prefix 0, offset 5000", 5000, None, "0"),
+        ("name_prefix 0 + published", 0, True, "0"),
+        ("name_prefix 004 + published", 0, True, "004"),
+    )
+    for name, offset, published, name_prefix in cases:
+        expected = linear(store, offset, args.limit, published, name_prefix)
+        result = store.get_many(offset, args.limit, published, name_prefix)
+        assert [e.id for e in result] == [e.id for e in expected]
+
+        indexed = timed(lambda: store.get_many(offset, args.limit, published, name_prefix), args.repeat)
+        scanned = timed(lambda: linear(store, offset, args.limit, published, name_prefix), args.repeat)
+        print(f"{name:>30}: index {indexed:9.3f}ms  linear {scanned:9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
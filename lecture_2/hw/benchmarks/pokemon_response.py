@@ -0,0 +1,108 @@
+"""Per-request cost of the Pokemon read routes, JSON bytes written from the
+stored dataclasses against the previous PokemonResponse path.
+
+The previous handlers built a PokemonResponse per pokemon and FastAPI
+validated and serialized it as the response model. Both apps are called
+through ASGI directly, so no HTTP client or server is involved.
+
+CPython keeps no running count of allocations, so allocation is reported
+as the peak of tracemalloc-traced memory above the baseline during one
+request.
+
+    python -m lecture_2.hw.benchmarks.pokemon_response --requests 2000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from typing import Annotated
+
+from fastapi import APIRouter, FastAPI, Query
+
+from lecture_2.rest_example import store
+from lecture_2.rest_example.api.pokemon import PokemonResponse
+from lecture_2.rest_example.main import app
+from lecture_2.rest_example.store import PokemonInfo
+
+previous = APIRouter(prefix="/pokemon")
+
+
+@previous.get("/")
+async def get_pokemon_list(
+    offset: Annotated[int, Query()] = 0, limit: Annotated[int, Query()] = 10
+) -> list[PokemonResponse]:
+    return [PokemonResponse.from_entity(e) for e in store.get_many(offset, limit)]
+
+
+@previous.get("/{id}")
+async def get_pokemon_by_id(id: int) -> PokemonResponse:
+    return PokemonResponse.from_entity(store.get_one(id))
+
+
+previous_app = FastAPI()
+previous_app.include_router(previous)
+
+
+async def request(asgi_app, path: str, query: bytes = b"") -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+        "root_path": "", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    await asgi_app(scope, receive, send)
+
+
+async def measure(asgi_app, path: str, query: bytes, requests: int) -> tuple[float, int]:
+    for _ in range(100):
+        await request(asgi_app, path, query)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await request(asgi_app, path, query)
+    elapsed = (time.perf_counter() - start) / requests * 1e6
+
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await request(asgi_app, path, query)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, peak - current
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    for i in range(1000):
+        store.add(PokemonInfo(f"pokemon {i}", i % 2 == 0))
+
+    cases = (
+        ("GET /pokemon/{id}", "/pokemon/500", b""),
+        (f"GET /pokemon/?limit={args.limit}", "/pokemon/", f"limit={args.limit}".encode()),
+    )
+    for name, path, query in cases:
+        for label, asgi_app in (("dataclass json", app), ("response model", previous_app)):
+            elapsed, peak = await measure(asgi_app, path, query, args.requests)
+            print(f"{name:>24} {label:>15}: {elapsed:8.1f}us  peak allocated {peak / 1024:7.1f}KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
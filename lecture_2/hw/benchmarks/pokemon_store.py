@@ -0,0 +1,87 @@
+"""Pokemon store operations at 1M records, dense slot store against the
+previous dict store.
+
+The dict store paged by walking its items from the start, so the cost of
+`get_many` grew with the offset. `DenseStore` finds the first slot of a
+page through a Fenwick tree and then reads `limit` slots.
+
+    python -m lecture_2.hw.benchmarks.pokemon_store --records 1000000
+"""
+
+import argparse
+import random
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Iterable
+
+from lecture_2.rest_example.store import DenseStore, PokemonEntity, PokemonInfo
+
+
+@dataclass(slots=True)
+class DictStore:
+    _data: dict[int, PokemonInfo] = field(default_factory=dict)
+    _ids: Iterable[int] = field(default_factory=count)
+
+    def add(self, info: PokemonInfo) -> PokemonEntity:
+        id = next(self._ids)
+        self._data[id] = info
+        return PokemonEntity(id, info)
+
+    def delete(self, id: int) -> None:
+        if id in self._data:
+            del self._data[id]
+
+    def get_one(self, id: int) -> PokemonEntity | None:
+        if id not in self._data:
+            return None
+        return PokemonEntity(id, self._data[id])
+
+    def get_many(self, offset: int = 0, limit: int = 10) -> Iterable[PokemonEntity]:
+        curr = 0
+        for id, info in self._data.items():
+            if offset <= curr < offset + limit:
+                yield PokemonEntity(id, info)
+            curr += 1
+
+
+def timed(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(store, records: int, limit: int, pages: int) -> dict[str, float]:
+    rng = random.Random(0)
+    infos = [PokemonInfo(f"pokemon {i}", i % 3 == 0) for i in range(records)]
+    results = {"add (s)": timed(lambda: [store.add(info) for info in infos])}
+
+    ids = [rng.randrange(records) for _ in range(100_000)]
+    results["get_one (us)"] = timed(lambda: [store.get_one(id) for id in ids]) / len(ids) * 1e6
+
+    deleted = rng.sample(range(records), records // 10)
+    results["delete 10% (s)"] = timed(lambda: [store.delete(id) for id in deleted])
+
+    live = records - len(deleted)
+    for name, offset in (("page at 0", 0), ("page at 50%", live // 2), ("last page", live - limit)):
+        results[f"{name} (ms)"] = timed(lambda: list(store.get_many(offset, limit)), pages) * 1e3
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5, help="repeats of every page read")
+    args = parser.parse_args()
+
+    print(f"records={args.records} limit={args.limit}")
+    for name, store in (("dense", DenseStore()), ("dict", DictStore())):
+        results = run(store, args.records, args.limit, args.pages)
+        print(f"{name:>6}: " + "  ".join(f"{key} {value:8.3f}" for key, value in results.items()))
+
+
+if __name__ == "__main__":
+    main()
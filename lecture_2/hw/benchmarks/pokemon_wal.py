@@ -0,0 +1,78 @@
+"""Write throughput and recovery time of the durable Pokemon store.
+
+Writes go through `DurableStore.add` with each fsync policy, with
+`always` every write also waits for its commit like a handler awaiting
+`sync()` does. The longest `add` that starts a snapshot is how long a
+request stalls the event loop for it. Recovery reopens a store
+whose state is all in the log and one whose state is all in a snapshot.
+
+    python -m lecture_2.hw.benchmarks.pokemon_wal --records 1000000 --always 2000
+"""
+
+import argparse
+import tempfile
+import time
+
+from lecture_2.rest_example.store import DurableStore, FsyncPolicy, PokemonInfo
+
+
+def write(data_dir: str, policy: FsyncPolicy, records: int) -> float:
+    store = DurableStore(data_dir, policy, snapshot_every=records + 1)
+    start = time.perf_counter()
+    for i in range(records):
+        store.add(PokemonInfo(f"pokemon {i}", i % 3 == 0))
+        if policy is FsyncPolicy.ALWAYS:
+            store.wal.commit()
+    store.close()
+    return records / (time.perf_counter() - start)
+
+
+def snapshot_stall(data_dir: str, records: int, snapshots: int) -> float:
+    """Longest `add` that started a snapshot, other adds stall on garbage collection alike"""
+    store = DurableStore(data_dir, FsyncPolicy.INTERVAL, snapshot_every=records // snapshots)
+    longest = 0.0
+    for i in range(records):
+        start = time.perf_counter()
+        store.add(PokemonInfo(f"pokemon {i}", i % 3 == 0))
+        if store.wal.records == 0:
+            longest = max(longest, time.perf_counter() - start)
+    store.close()
+    return longest
+
+
+def recover(data_dir: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    store = DurableStore(data_dir, FsyncPolicy.NEVER)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, len(store.store)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--always", type=int, default=2000, help="records written with fsync per write")
+    args = parser.parse_args()
+
+    for policy in FsyncPolicy:
+        records = args.always if policy is FsyncPolicy.ALWAYS else args.records
+        with tempfile.TemporaryDirectory() as data_dir:
+            rate = write(data_dir, policy, records)
+        print(f"write  {policy:>8}: {rate:12,.0f} records/s ({records} records)")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        stall = snapshot_stall(data_dir, args.records, 4)
+    print(f"longest add starting a snapshot: {stall * 1e3:8.1f}ms")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write(data_dir, FsyncPolicy.NEVER, args.records)
+        # the first reopen replays the log and compacts it into a snapshot
+        from_log, count = recover(data_dir)
+        from_snapshot, _ = recover(data_dir)
+
+    print(f"recover from log:      {from_log:6.2f}s ({count} records, includes writing the snapshot)")
+    print(f"recover from snapshot: {from_snapshot:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
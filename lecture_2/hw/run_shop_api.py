@@ -1,54 +1,413 @@
-import requests
+"""Load generator for shop_api.
+
+Requests arrive open loop: a Poisson process at `--rps` schedules them
+whether or not earlier ones have finished, and latency is measured from
+the scheduled arrival, so a stalled server shows up as latency instead of
+silently lowering the offered load. `--rps 0` switches to closed loop,
+`--concurrency` workers sending back to back. Connections are HTTP/1.1
+keep-alive and pooled, one per concurrent request.
+
+    python lecture_2/hw/run_shop_api.py --rps 500 --duration 30
+    python lecture_2/hw/run_shop_api.py --rps 0 --concurrency 64 --weights get_item=10 list_items=1
+"""
+
+import argparse
+import asyncio
+import json
+import math
 import random
 import time
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.parse import urlsplit
 
 BASE_URL = "http://localhost:8000"
 
-def create_item(name: str, price: float):
-    url = f"{BASE_URL}/item"
-    data = {"name": name, "price": price}
-    response = requests.post(url, json=data)
-    return response.json()
 
-def create_cart():
-    url = f"{BASE_URL}/cart"
-    response = requests.post(url)
-    return response.json()
+class ProtocolError(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class Connection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    reusable: bool = True
+
+    async def request(self, method: str, target: str, body: bytes = b"") -> tuple[int, bytes]:
+        head = f"{method} {target} HTTP/1.1\r\nhost: shop\r\ncontent-length: {len(body)}\r\n"
+        if body:
+            head += "content-type: application/json\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+
+        status_line = await self.reader.readuntil(b"\r\n")
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/1."):
+            raise ProtocolError(f"bad status line {status_line!r}")
+
+        length, chunked, close = None, False, False
+        while (line := await self.reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.partition(b":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = value == b"chunked"
+            elif name == b"connection":
+                close = value == b"close"
+
+        if chunked:
+            content = bytearray()
+            while size := int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                content += await self.reader.readexactly(size + 2)
+                del content[-2:]
+            await self.reader.readuntil(b"\r\n")
+            content = bytes(content)
+        elif length is not None:
+            content = await self.reader.readexactly(length)
+        else:
+            raise ProtocolError("response without length")
+
+        self.reusable = not close
+        return int(parts[1]), content
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+@dataclass(slots=True)
+class ConnectionPool:
+    """At most `size` keep-alive connections, opened lazily and reopened after errors"""
+
+    host: str
+    port: int
+    size: int
+    _idle: list[Connection] = field(init=False, default_factory=list)
+    _slots: asyncio.Semaphore = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._slots = asyncio.Semaphore(self.size)
+
+    async def request(self, method: str, target: str, body: bytes = b"") -> tuple[int, bytes]:
+        async with self._slots:
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                connection = Connection(reader, writer)
+
+            try:
+                result = await connection.request(method, target, body)
+            except BaseException:
+                connection.close()
+                raise
+
+            if connection.reusable:
+                self._idle.append(connection)
+            else:
+                connection.close()
+            return result
+
+    def close(self) -> None:
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+@dataclass(slots=True)
+class Histogram:
+    """Log-bucketed latency histogram, ~1% relative error, constant memory"""
+
+    precision: float = 0.01
+    counts: dict[int, int] = field(default_factory=dict)
+    total: int = 0
+    max: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        bucket = math.ceil(math.log(max(seconds, 1e-7)) / math.log1p(self.precision))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, in seconds"""
+        if not self.total:
+            return 0.0
+
+        rank = max(1, math.ceil(round(q / 100 * self.total, 6)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min((1 + self.precision) ** bucket, self.max)
+
+        return self.max
+
+
+@dataclass(slots=True)
+class RouteStats:
+    latency: Histogram = field(default_factory=Histogram)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+
+@dataclass(slots=True)
+class Shop:
+    """Ids the scenarios pick from, grows as scenarios create entities"""
+
+    rng: random.Random
+    items: list[int] = field(default_factory=list)
+    carts: list[int] = field(default_factory=list)
+
+    def item(self) -> int:
+        return self.rng.choice(self.items)
+
+    def cart(self) -> int:
+        return self.rng.choice(self.carts)
+
+
+@dataclass(slots=True, frozen=True)
+class Call:
+    route: str
+    method: str
+    target: str
+    body: bytes = b""
+    expected: int = 200
+    on_success: Callable[[bytes], None] | None = None
+
+
+def _item_body(shop: Shop) -> dict:
+    name = f"item {shop.rng.getrandbits(32):08x}"
+    return {"name": name, "price": round(shop.rng.uniform(5.0, 50.0), 2)}
+
+
+def create_item(shop: Shop) -> Call:
+    return Call(
+        "POST /item", "POST", "/item", json.dumps(_item_body(shop)).encode(), 201,
+        lambda body: shop.items.append(json.loads(body)["id"]),
+    )
+
+
+def create_items(shop: Shop) -> Call:
+    batch = [_item_body(shop) for _ in range(20)]
+    return Call(
+        "POST /item/batch", "POST", "/item/batch", json.dumps(batch).encode(), 201,
+        lambda body: shop.items.extend(item["id"] for item in json.loads(body)),
+    )
+
+
+def get_item(shop: Shop) -> Call:
+    return Call("GET /item/{id}", "GET", f"/item/{shop.item()}")
+
+
+def get_items(shop: Shop) -> Call:
+    ids = ",".join(str(shop.item()) for _ in range(10))
+    return Call("GET /item?ids", "GET", f"/item?ids={ids}")
+
+
+def list_items(shop: Shop) -> Call:
+    low = round(shop.rng.uniform(5.0, 40.0), 2)
+    return Call("GET /item", "GET", f"/item?limit=20&min_price={low}&max_price={low + 10}")
+
+
+def create_cart(shop: Shop) -> Call:
+    return Call(
+        "POST /cart", "POST", "/cart", expected=201,
+        on_success=lambda body: shop.carts.append(json.loads(body)["id"]),
+    )
+
+
+def add_to_cart(shop: Shop) -> Call:
+    return Call("POST /cart/{id}/add/{item}", "POST", f"/cart/{shop.cart()}/add/{shop.item()}")
+
+
+def add_many_to_cart(shop: Shop) -> Call:
+    lines = [{"item_id": shop.item(), "quantity": shop.rng.randint(1, 5)} for _ in range(5)]
+    return Call("POST /cart/{id}/add", "POST", f"/cart/{shop.cart()}/add", json.dumps(lines).encode())
+
+
+def add_missing_to_cart(shop: Shop) -> Call:
+    target = f"/cart/{shop.cart()}/add/{shop.rng.randint(10**8, 10**9)}"
+    return Call("POST /cart/{id}/add/{missing}", "POST", target, expected=404)
+
+
+def get_cart(shop: Shop) -> Call:
+    return Call("GET /cart/{id}", "GET", f"/cart/{shop.cart()}")
+
+
+def list_carts(shop: Shop) -> Call:
+    return Call("GET /cart", "GET", f"/cart?limit=20&min_quantity={shop.rng.randint(0, 10)}")
+
+
+SCENARIOS: dict[str, tuple[Callable[[Shop], Call], float]] = {
+    "create_item": (create_item, 5),
+    "create_items": (create_items, 0.5),
+    "get_item": (get_item, 30),
+    "get_items": (get_items, 5),
+    "list_items": (list_items, 10),
+    "create_cart": (create_cart, 5),
+    "add_to_cart": (add_to_cart, 20),
+    "add_many_to_cart": (add_many_to_cart, 5),
+    "add_missing_to_cart": (add_missing_to_cart, 1),
+    "get_cart": (get_cart, 15),
+    "list_carts": (list_carts, 3),
+}
+
+
+@dataclass(slots=True)
+class LoadGenerator:
+    pool: ConnectionPool
+    shop: Shop
+    weights: dict[str, float]
+    stats: dict[str, RouteStats] = field(default_factory=dict)
+    dropped: int = 0
+
+    async def seed(self, items: int, carts: int) -> None:
+        while len(self.shop.items) < items:
+            await self._send(create_items(self.shop), time.perf_counter(), record=False)
+        while len(self.shop.carts) < carts:
+            await self._send(create_cart(self.shop), time.perf_counter(), record=False)
+
+    def next_call(self) -> Call:
+        name = self.shop.rng.choices(list(self.weights), list(self.weights.values()))[0]
+        return SCENARIOS[name][0](self.shop)
+
+    async def open_loop(self, rps: float, duration: float, max_in_flight: int) -> None:
+        tasks: set[asyncio.Task] = set()
+        start = time.perf_counter()
+        scheduled = start
+
+        while (scheduled := scheduled + self.shop.rng.expovariate(rps)) < start + duration:
+            if (delay := scheduled - time.perf_counter()) > 0:
+                await asyncio.sleep(delay)
+
+            if len(tasks) >= max_in_flight:
+                self.dropped += 1
+                continue
+
+            task = asyncio.create_task(self._send(self.next_call(), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+
+    async def closed_loop(self, concurrency: int, duration: float) -> None:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                await self._send(self.next_call(), time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def _send(self, call: Call, started: float, record: bool = True) -> None:
+        error = None
+        try:
+            status, body = await self.pool.request(call.method, call.target, call.body)
+            if status != call.expected:
+                error = str(status)
+            elif call.on_success is not None:
+                call.on_success(body)
+        except Exception as e:
+            # any failure, including one in on_success, is counted, a raised
+            # exception would end the task and go unnoticed
+            error = type(e).__name__
+
+        if not record:
+            if error is not None:
+                raise RuntimeError(f"seeding failed on {call.route}: {error}")
+            return
+
+        stats = self.stats.setdefault(call.route, RouteStats())
+        stats.latency.record(time.perf_counter() - started)
+        if error is not None:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+
+
+def report(generator: LoadGenerator, elapsed: float) -> str:
+    lines = [
+        f"{'route':<32}{'count':>8}{'rps':>9}{'err %':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'max ms':>9}  errors"
+    ]
+    total = RouteStats()
+    for route, stats in sorted(generator.stats.items()):
+        for bucket, count in stats.latency.counts.items():
+            total.latency.counts[bucket] = total.latency.counts.get(bucket, 0) + count
+        total.latency.total += stats.latency.total
+        total.latency.max = max(total.latency.max, stats.latency.max)
+        for error, count in stats.errors.items():
+            total.errors[error] = total.errors.get(error, 0) + count
+
+    for route, stats in [*sorted(generator.stats.items()), ("total", total)]:
+        count = stats.latency.total
+        percentiles = "".join(
+            f"{stats.latency.percentile(q) * 1e3:>9.2f}" for q in (50, 95, 99, 99.9)
+        )
+        errors = " ".join(f"{name}={count}" for name, count in sorted(stats.errors.items()))
+        lines.append(
+            f"{route:<32}{count:>8}{count / elapsed:>9.1f}"
+            f"{100 * stats.error_count / max(count, 1):>8.2f}"
+            f"{percentiles}{stats.latency.max * 1e3:>9.2f}  {errors}"
+        )
+
+    if generator.dropped:
+        lines.append(f"dropped {generator.dropped} arrivals, in-flight limit reached")
+
+    return "\n".join(lines)
+
+
+def parse_weights(values: list[str]) -> dict[str, float]:
+    if not values:
+        return {name: weight for name, (_, weight) in SCENARIOS.items()}
+
+    weights = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name}, one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+
+    return weights
 
-def add_item_to_cart(cart_id: int, item_id: int):
-    url = f"{BASE_URL}/cart/{cart_id}/add/{item_id}"
-    response = requests.post(url)
-    return response.json()
 
-def get_cart(cart_id: int):
-    url = f"{BASE_URL}/cart/{cart_id}"
-    response = requests.get(url)
-    return response.json()
+async def run(args: argparse.Namespace) -> LoadGenerator:
+    url = urlsplit(args.url)
+    pool = ConnectionPool(url.hostname or "localhost", url.port or 80, args.concurrency)
+    generator = LoadGenerator(pool, Shop(random.Random(args.seed)), parse_weights(args.weights))
 
-def get_item(item_id: int):
-    url = f"{BASE_URL}/item/{item_id}"
-    response = requests.get(url)
-    return response.json()
+    try:
+        await generator.seed(args.seed_items, args.seed_carts)
 
-def main():
-    for i in range(100):
-        item_name = f"Item{i+1}"
-        item_price = round(random.uniform(5.0, 50.0), 2)
-        item = create_item(item_name, item_price)
+        start = time.perf_counter()
+        if args.rps > 0:
+            await generator.open_loop(args.rps, args.duration, args.max_in_flight)
+        else:
+            await generator.closed_loop(args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
 
-        cart = create_cart()
+    print(report(generator, elapsed))
+    return generator
 
-        for _ in range(random.randint(1, 5)):
-            add_item_to_cart(cart['id'], item['id'])
 
-        cart_details = get_cart(cart['id'])
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--rps", type=float, default=200.0, help="target arrival rate, 0 for closed loop")
+    parser.add_argument("--concurrency", type=int, default=32, help="pooled connections")
+    parser.add_argument("--max-in-flight", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--weights", nargs="*", default=[], metavar="SCENARIO=WEIGHT")
+    parser.add_argument("--seed-items", type=int, default=100)
+    parser.add_argument("--seed-carts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=None)
 
-        if random.random() < 0.2:
-            fake_item_id = random.randint(1000, 9999)
-            error_response = add_item_to_cart(cart['id'], fake_item_id)
-            print(f"Error response for adding item ID {fake_item_id}: {error_response}")
+    asyncio.run(run(parser.parse_args()))
 
-        time.sleep(0.5)
 
 if __name__ == "__main__":
     main()
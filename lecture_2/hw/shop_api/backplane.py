@@ -0,0 +1,271 @@
+"""Relays chat room messages between worker processes.
+
+Every message goes through the backplane, including those for local
+subscribers, so all workers deliver room messages in the same order.
+
+`memory` keeps everything in the process. `unix:///path/to/chat.sock`
+elects one worker as hub through an flock on `<path>.lock`. The hub
+listens on the socket, numbers every message and relays it to all other
+workers, which connect as peers. When the hub dies its lock is released,
+and the first peer to reconnect takes over with a new epoch.
+
+Wire format is newline delimited JSON. Peers send `[room, message]` and
+the hub sends `[epoch, seq, room, message]`. Writes are batched per
+event loop iteration, so a burst of messages costs one write per
+connection.
+
+Both backplanes refuse messages over `MAX_MESSAGE_SIZE` with
+`MessageTooLarge`, so any message one accepts fits into a line the other
+workers read.
+"""
+
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Protocol
+
+BACKPLANE_ENV = "CHAT_BACKPLANE"
+
+# peers whose socket buffers this much are dropped, they reconnect and carry on
+MAX_PEER_BUFFER = 16 * 1024 * 1024
+# characters of room name and message together, uvicorn alone takes websocket messages up to 16 MiB
+MAX_MESSAGE_SIZE = 1024 * 1024
+# JSON takes at most 6 bytes per character (`\u001f`), epoch, seq and punctuation fit in the rest.
+# Default StreamReader limit is 64 KiB
+LINE_LIMIT = 6 * MAX_MESSAGE_SIZE + 256
+
+Deliver = Callable[[str, str], None]
+
+logger = logging.getLogger(__name__)
+
+
+class MessageTooLarge(ValueError):
+    pass
+
+
+def check_message_size(room: str, message: str) -> None:
+    if len(room) + len(message) > MAX_MESSAGE_SIZE:
+        raise MessageTooLarge(f"room name and message longer than {MAX_MESSAGE_SIZE} characters")
+
+
+class Backplane(Protocol):
+    async def publish(self, room: str, message: str) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+@dataclass(slots=True)
+class InProcessBackplane:
+    deliver: Deliver
+
+    async def publish(self, room: str, message: str) -> None:
+        check_message_size(room, message)
+        self.deliver(room, message)
+
+    async def close(self) -> None:
+        pass
+
+
+@dataclass(slots=True, eq=False)
+class _Outbox:
+    """Lines waiting to be written to one connection, flushed once per loop iteration"""
+
+    writer: asyncio.StreamWriter
+    lines: list[bytes] = field(default_factory=list)
+    scheduled: bool = False
+
+    def push(self, line: bytes) -> None:
+        self.lines.append(line)
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        self.scheduled = False
+        if self.lines and not self.writer.is_closing():
+            self.writer.write(b"".join(self.lines))
+        self.lines.clear()
+
+
+@dataclass(slots=True)
+class UnixSocketBackplane:
+    path: str
+    deliver: Deliver
+    reconnect_delay: float = 0.05
+
+    epoch: str | None = field(init=False, default=None)
+    seq: int = field(init=False, default=0)
+    gaps: int = field(init=False, default=0)
+
+    _lock_fd: int | None = field(init=False, default=None)
+    _server: asyncio.Server | None = field(init=False, default=None)
+    _peers: dict[asyncio.StreamWriter, _Outbox] = field(init=False, default_factory=dict)
+    _hub: _Outbox | None = field(init=False, default=None)
+    _pending: list[bytes] = field(init=False, default_factory=list)
+    _connecting: asyncio.Task | None = field(init=False, default=None)
+    _tasks: set[asyncio.Task] = field(init=False, default_factory=set)
+    _closed: bool = field(init=False, default=False)
+
+    @property
+    def is_hub(self) -> bool:
+        return self._server is not None
+
+    async def start(self) -> None:
+        if self._server is not None or self._hub is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.create_task(self._connect())
+        await asyncio.shield(self._connecting)
+
+    async def publish(self, room: str, message: str) -> None:
+        check_message_size(room, message)
+        await self.start()
+
+        if self._server is not None:
+            self._relay(room, message)
+        elif self._hub is not None:
+            self._hub.push(_encode([room, message]))
+        else:
+            # hub went away, sent after reconnecting
+            self._pending.append(_encode([room, message]))
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._server is not None:
+            self._server.close()
+        tasks = [task for task in [*self._tasks, self._connecting] if task is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        if self._hub is not None:
+            self._hub.writer.close()
+        for writer in self._peers:
+            writer.close()
+        if self._server is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _connect(self) -> None:
+        while not self._closed:
+            if self._acquire_hub_lock():
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                self._server = await asyncio.start_unix_server(
+                    self._serve_peer, self.path, limit=LINE_LIMIT
+                )
+                self.epoch, self.seq = uuid.uuid4().hex, 0
+                for line in self._pending:
+                    room, message = json.loads(line)
+                    self._relay(room, message)
+                break
+
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # hub holds the lock but does not listen yet
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self._hub = _Outbox(writer)
+            for line in self._pending:
+                self._hub.push(line)
+            self._spawn(self._read_hub(reader, writer))
+            break
+
+        self._pending.clear()
+        self._connecting = None
+
+    def _acquire_hub_lock(self) -> bool:
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        return True
+
+    def _relay(self, room: str, message: str) -> None:
+        self.seq += 1
+        line = _encode([self.epoch, self.seq, room, message])
+        for writer, outbox in list(self._peers.items()):
+            if writer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+                logger.warning("dropping backplane peer, %d bytes behind", MAX_PEER_BUFFER)
+                writer.close()
+                del self._peers[writer]
+                continue
+            outbox.push(line)
+
+        self.deliver(room, message)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # peers see messages relayed after this point, like a client joining a room
+        self._peers[writer] = _Outbox(writer)
+        self._track(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                room, message = json.loads(line)
+                self._relay(room, message)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("dropping backplane peer: %s", e)
+        except asyncio.CancelledError:
+            # the server's done callback logs a cancelled handler as an error
+            if not self._closed:
+                raise
+        finally:
+            self._peers.pop(writer, None)
+            writer.close()
+
+    async def _read_hub(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                epoch, seq, room, message = json.loads(line)
+                if epoch == self.epoch and seq != self.seq + 1:
+                    self.gaps += 1
+                    logger.warning("backplane gap, expected %d got %d", self.seq + 1, seq)
+                self.epoch, self.seq = epoch, seq
+                self.deliver(room, message)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("lost backplane hub: %s", e)
+        finally:
+            writer.close()
+            if self._hub is not None and self._hub.writer is writer:
+                # unsent lines are retried through the next hub
+                self._pending.extend(self._hub.lines)
+                self._hub = None
+            if not self._closed and self._connecting is None:
+                self._connecting = asyncio.create_task(self._connect())
+
+    def _spawn(self, coro) -> None:
+        self._track(asyncio.create_task(coro))
+
+    def _track(self, task: asyncio.Task) -> None:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def _encode(value: list) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def open_backplane(url: str, deliver: Deliver) -> Backplane:
+    """`memory` (default, per process) or `unix:///path/to/chat.sock` (shared by workers)"""
+    if url == "memory":
+        return InProcessBackplane(deliver)
+
+    if url.startswith("unix://"):
+        return UnixSocketBackplane(url.removeprefix("unix://"), deliver)
+
+    raise ValueError(f"unsupported backplane url: {url}")
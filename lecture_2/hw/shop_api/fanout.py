@@ -0,0 +1,132 @@
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any, Callable
+
+from fastapi import WebSocket
+
+# "try again later", sent to subscribers dropped for not keeping up
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+Event = dict[str, Any]
+
+
+def text_event(message: str) -> Event:
+    """ASGI send event built once per broadcast and shared by every subscriber"""
+    return {"type": "websocket.send", "text": message}
+
+
+class OverflowPolicy(StrEnum):
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
+
+@dataclass(slots=True, eq=False)
+class Subscriber:
+    """Bounded send queue drained by a sender task of its own.
+
+    `offer` never waits, so a slow connection only ever delays itself.
+    When the queue is full it either drops the oldest message or closes
+    the connection, depending on `policy`.
+    """
+
+    ws: WebSocket
+    max_queue: int = 1024
+    policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    dropped: int = 0
+
+    _queue: deque[Event] = field(init=False, default_factory=deque)
+    _sender: asyncio.Task | None = field(init=False, default=None)
+    _evicted: bool = field(init=False, default=False)
+    _closed: bool = field(init=False, default=False)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed or self._evicted
+
+    def offer(self, event: Event) -> bool:
+        if self._closed or self._evicted:
+            return False
+
+        if len(self._queue) >= self.max_queue:
+            if self.policy is OverflowPolicy.DISCONNECT:
+                self._evicted = True
+                self._queue.clear()
+                if self._sender is None:
+                    self._start_sender()
+                return False
+
+            self._queue.popleft()
+            self.dropped += 1
+
+        self._queue.append(event)
+        if self._sender is None:
+            self._start_sender()
+        return True
+
+    async def stop(self) -> None:
+        self._closed = True
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+
+    def _start_sender(self) -> None:
+        # eager: when every send completes without blocking, as it does while the
+        # transport keeps up, the queue is drained right here and no task is scheduled
+        sender = asyncio.Task(
+            self._send_queued(), loop=asyncio.get_running_loop(), eager_start=True
+        )
+        if not sender.done():
+            self._sender = sender
+
+    async def _send_queued(self) -> None:
+        try:
+            while self._queue and not self._evicted:
+                await self.ws.send(self._queue.popleft())
+
+            if self._evicted:
+                self._closed = True
+                await self.ws.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # connection is gone, receive loop of the client cleans up
+            self._closed = True
+        finally:
+            self._sender = None
+
+
+@dataclass(slots=True, eq=False)
+class Coalescer:
+    """Collects messages for up to `max_delay` seconds or `max_batch` messages.
+
+    Each batch goes to `emit` as one JSON array frame, so a busy room sends
+    one frame per window instead of one per message. Messages are any JSON
+    values.
+    """
+
+    emit: Callable[[str], None]
+    max_delay: float = 0.005
+    max_batch: int = 64
+
+    _batch: list[Any] = field(init=False, default_factory=list)
+    _timer: asyncio.TimerHandle | None = field(init=False, default=None)
+
+    def add(self, message: Any) -> None:
+        self._batch.append(message)
+        if len(self._batch) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._batch:
+            frame = json.dumps(self._batch, ensure_ascii=False)
+            self._batch.clear()
+            self.emit(frame)
@@ -1,32 +1,102 @@
-from fastapi import FastAPI, HTTPException, status
+import math
+import os
+from fastapi import FastAPI, Header, HTTPException, Response, status
 from fastapi.responses import JSONResponse
-from typing import Optional, Dict, Any
+from typing import Optional, Any, Iterable, List, Set
 from http import HTTPStatus
-from .models import Item, Cart, CartItem, ItemPost
+from pydantic import ValidationError
+from .models import CachedJSON, CartAddition, ItemPost
+from .repository import STORAGE_ENV, open_repositories
+from .store import InvalidCursor, VersionConflict
 from prometheus_fastapi_instrumentator import Instrumentator
 
 
 app = FastAPI(title="Shop API")
 Instrumentator().instrument(app).expose(app)
 
-items: Dict[int, Item] = {}
-carts: Dict[int, Cart] = {}
+items, carts = open_repositories(os.environ.get(STORAGE_ENV, "memory"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# upper bound on entries per batch request and ids per `GET /item?ids=`
+MAX_BATCH_SIZE = 1000
+
+
+def etag(version: int) -> str:
+    return f'W/"{version}"'
+
+
+def parse_etags(header: str) -> Optional[Set[int]]:
+    """Versions listed in If-Match/If-None-Match, None for `*`"""
+    if header.strip() == "*":
+        return None
+    versions = set()
+    for tag in header.split(","):
+        # versions are exact, so weak tags are compared by value for If-Match too
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.isdigit():
+            versions.add(int(tag))
+    return versions
+
+
+def not_modified(if_none_match: Optional[str], version: int) -> bool:
+    if if_none_match is None:
+        return False
+    versions = parse_etags(if_none_match)
+    return versions is None or version in versions
+
+
+def json_response(entity: CachedJSON) -> Response:
+    return Response(content=entity.json_bytes(), media_type="application/json",
+                    headers={"ETag": etag(entity.version)})
+
+
+def json_list_response(entities: Iterable[CachedJSON], next_cursor: Optional[str] = None) -> Response:
+    # cached fragments are joined as is, no jsonable_encoder pass over the page
+    body = b"[" + b",".join([entity.json_bytes() for entity in entities]) + b"]"
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def check_batch_size(size: int):
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail=f"At most {MAX_BATCH_SIZE} entries per request")
+
+
+def check_prices(posts: Iterable[ItemPost]):
+    # checked here, a 422 from the model would echo the NaN back and fail to encode it
+    if not all(math.isfinite(post.price) for post in posts):
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail="Price must be a finite number")
+
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail="ids must be a comma separated list of integers")
+    check_batch_size(len(parsed))
+    return parsed
 
 
 @app.post("/cart", status_code=status.HTTP_201_CREATED)
 def create_cart():
-    cart_id = len(carts) + 1
-    carts[cart_id] = Cart(id=cart_id)
+    cart_id = carts.create().id
     return JSONResponse(content={"id": cart_id},
                         status_code=status.HTTP_201_CREATED,
                         headers={"Location": f"/cart/{cart_id}"})
 
 
 @app.get("/cart/{id}")
-def get_cart(id: int):
-    if id not in carts:
+def get_cart(id: int, if_none_match: Optional[str] = Header(None)):
+    cart = carts.get(id)
+    if cart is None:
         raise HTTPException(status_code=404, detail="Cart not found")
-    return carts[id]
+    if not_modified(if_none_match, cart.version):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag(cart.version)})
+    return json_response(cart)
 
 
 @app.get("/cart")
@@ -35,7 +105,8 @@ def get_cart_list(offset: int = 0,
                   min_price: Optional[float] = None,
                   max_price: Optional[float] = None,
                   min_quantity: Optional[int] = None,
-                  max_quantity: Optional[int] = None):
+                  max_quantity: Optional[int] = None,
+                  cursor: Optional[str] = None):
     if offset < 0 or limit <= 0:
         raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
                             detail="Offset must be non-negative and Limit must be positive")
@@ -43,49 +114,68 @@ def get_cart_list(offset: int = 0,
         if value is not None and value < 0:
             raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
                                 detail="Price and quantity must be a non-negative number")
-    filtered_carts = [cart for cart in list(carts.values())[offset:offset + limit]
-                      if (min_price is None or cart.price >= min_price) and
-                      (max_price is None or cart.price <= max_price) and
-                      (min_quantity is None or sum(item.quantity for item in cart.items) >= min_quantity) and
-                      (max_quantity is None or sum(item.quantity for item in cart.items) <= max_quantity)]
-    return filtered_carts
+    try:
+        page = carts.list(offset, limit, min_price, max_price, min_quantity, max_quantity, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return json_list_response(page.entities, page.next_cursor)
 
 
 @app.post("/cart/{cart_id}/add/{item_id}")
 def add_to_cart(cart_id: int, item_id: int):
-    if cart_id not in carts:
+    cart = carts.get(cart_id)
+    if cart is None:
         raise HTTPException(status_code=404, detail="Cart not found")
-    if item_id not in items or items[item_id].deleted:
+    item = items.get(item_id)
+    if item is None or item.deleted:
         raise HTTPException(status_code=404, detail="Item not found or deleted")
-    item = items[item_id]
-    cart = carts[cart_id]
-    for cart_item in cart.items:
-        if cart_item.id == item.id:
-            cart_item.quantity += 1
-            break
-    else:
-        cart.items.append(CartItem(id=item.id, name=item.name, quantity=1))
-    cart.price += item.price
-    return cart
+    return json_response(carts.add_item(cart_id, item))
+
+
+@app.post("/cart/{cart_id}/add")
+def add_many_to_cart(cart_id: int, additions: List[CartAddition]):
+    check_batch_size(len(additions))
+    cart = carts.get(cart_id)
+    if cart is None:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    # all items are checked before anything is added, a batch applies fully or not at all
+    found = items.get_many(addition.item_id for addition in additions)
+    for addition, item in zip(additions, found):
+        if item is None or item.deleted:
+            raise HTTPException(status_code=404,
+                                detail=f"Item {addition.item_id} not found or deleted")
+    return json_response(carts.add_items(cart_id, [(item, addition.quantity)
+                                                   for addition, item in zip(additions, found)]))
 
 
 @app.post("/item", status_code=status.HTTP_201_CREATED)
 def create_item(item: ItemPost):
-    item_id = len(items) + 1
-    new_item = Item(id=item_id, name=item.name, price=item.price)
-    items[item_id] = new_item
+    check_prices([item])
+    new_item = items.create(item.name, item.price)
+    item_id = new_item.id
     return JSONResponse(
         content={"id": item_id, "name": new_item.name, "price": new_item.price},
         status_code=status.HTTP_201_CREATED,
         headers={"Location": f"/item/{item_id}"})
 
 
+@app.post("/item/batch", status_code=status.HTTP_201_CREATED)
+def create_items(batch: List[ItemPost]):
+    check_batch_size(len(batch))
+    check_prices(batch)
+    created = items.create_many((item.name, item.price) for item in batch)
+    return [{"id": item.id, "name": item.name, "price": item.price} for item in created]
+
+
 @app.get("/item/{id}", status_code=status.HTTP_200_OK)
-def get_item(id: int):
-    if id not in items or items[id].deleted:
+def get_item(id: int, if_none_match: Optional[str] = Header(None)):
+    item = items.get(id)
+    if item is None or item.deleted:
         raise HTTPException(status_code=404, detail="Item not found")
-    item = items[id]
-    return {"id": item.id, "name": item.name, "price": item.price}
+    if not_modified(if_none_match, item.version):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag(item.version)})
+    return JSONResponse(content={"id": item.id, "name": item.name, "price": item.price},
+                        headers={"ETag": etag(item.version)})
 
 
 @app.get("/item")
@@ -93,30 +183,45 @@ def get_item_list(offset: int = 0,
                   limit: int = 10,
                   min_price: Optional[float] = None,
                   max_price: Optional[float] = None,
-                  show_deleted: bool = False):
+                  show_deleted: bool = False,
+                  cursor: Optional[str] = None,
+                  ids: Optional[str] = None):
     if offset < 0 or limit <= 0:
         raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
                             detail="Offset must be non-negative and limit positive")
     if any(val is not None and val < 0 for val in (min_price, max_price)):
         raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail="Price must be non-negative")
-    filtered_items = [item for item in list(items.values())[offset:offset + limit]
-                      if (show_deleted or not item.deleted) and
-                      (min_price is None or item.price >= min_price) and
-                      (max_price is None or item.price <= max_price)]
-    return filtered_items
+    if ids is not None:
+        # lookup by ids in the requested order, unknown ones are skipped
+        return json_list_response(
+            item for item in items.get_many(parse_ids(ids))
+            if item is not None
+            and (show_deleted or not item.deleted)
+            and (min_price is None or item.price >= min_price)
+            and (max_price is None or item.price <= max_price))
+    try:
+        page = items.list(offset, limit, min_price, max_price, show_deleted, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return json_list_response(page.entities, page.next_cursor)
 
 
 @app.put("/item/{id}")
-def update_item(id: int, item: ItemPost):
-    if id not in items:
+def update_item(id: int, item: ItemPost, if_match: Optional[str] = Header(None)):
+    check_prices([item])
+    try:
+        new_item = items.replace(id, item.name, item.price,
+                                 parse_etags(if_match) if if_match is not None else None)
+    except VersionConflict as e:
+        raise HTTPException(status_code=HTTPStatus.PRECONDITION_FAILED, detail=str(e))
+    if new_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    new_item = Item(id=id, name=item.name, price=item.price)
-    items[id] = new_item
-    return {"id": new_item.id, "name": new_item.name, "price": new_item.price}
+    return JSONResponse(content={"id": new_item.id, "name": new_item.name, "price": new_item.price},
+                        headers={"ETag": etag(new_item.version)})
 
 
 @app.patch("/item/{id}")
-def patch_item(id: int, body: dict[str, Any]):
+def patch_item(id: int, body: dict[str, Any], if_match: Optional[str] = Header(None)):
     item = items.get(id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
@@ -125,14 +230,18 @@ def patch_item(id: int, body: dict[str, Any]):
     allowed_fields = {"name", "price"}
     if any(field not in allowed_fields for field in body):
         raise HTTPException(status_code=422, detail="Invalid field in request body")
-    for key, value in body.items():
-        setattr(item, key, value)
-    return {"id": item.id, "name": item.name, "price": item.price}
+    try:
+        item = items.patch(id, body, parse_etags(if_match) if if_match is not None else None)
+    except VersionConflict as e:
+        raise HTTPException(status_code=HTTPStatus.PRECONDITION_FAILED, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail="Invalid value in request body")
+    return JSONResponse(content={"id": item.id, "name": item.name, "price": item.price},
+                        headers={"ETag": etag(item.version)})
 
 
 @app.delete("/item/{id}")
 def delete_item(id: int):
-    if id not in items:
+    if not items.delete(id):
         raise HTTPException(status_code=404, detail="Item not found")
-    items[id].deleted = True
     return {"message": "Item marked as deleted"}
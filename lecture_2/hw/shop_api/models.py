@@ -1,12 +1,36 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, Dict, List, Optional
 
 
-class Item(BaseModel):
+class CachedJSON(BaseModel):
+    """Model that keeps its encoded JSON until `invalidate_json` is called.
+
+    Anything mutating a model in place must invalidate it, replaced models
+    start with an empty cache.
+    """
+
+    _json: Optional[bytes] = PrivateAttr(default=None)
+
+    def json_bytes(self) -> bytes:
+        # private attributes go through BaseModel.__getattr__, too slow for a per-entity hot path
+        private = self.__pydantic_private__
+        encoded = private["_json"]
+        if encoded is None:
+            encoded = private["_json"] = self.__pydantic_serializer__.to_json(self)
+        return encoded
+
+    def invalidate_json(self) -> None:
+        self.__pydantic_private__["_json"] = None
+
+
+class Item(CachedJSON):
     id: int
     name: str
-    price: float
+    # NaN and infinities would break the ordering of price indexes
+    price: float = Field(allow_inf_nan=False)
     deleted: bool = False
+    # bumped by every change, exposed only through ETag headers
+    version: int = Field(default=1, exclude=True)
 
 
 class CartItem(BaseModel):
@@ -16,12 +40,47 @@ class CartItem(BaseModel):
     available: bool = True
 
 
-class Cart(BaseModel):
+class Cart(CachedJSON):
     id: int
     items: List[CartItem] = []
     price: float = 0.0
+    version: int = Field(default=1, exclude=True)
+
+    # lookup and aggregates over `items`, not part of the serialized view
+    _lines: Dict[int, CartItem] = PrivateAttr(default_factory=dict)
+    _quantity: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._lines = {line.id: line for line in self.items}
+        self._quantity = sum(line.quantity for line in self.items)
+
+    @property
+    def quantity(self) -> int:
+        return self._quantity
+
+    def line(self, item_id: int) -> CartItem | None:
+        return self._lines.get(item_id)
+
+    def add(self, item: Item, quantity: int = 1) -> CartItem:
+        line = self._lines.get(item.id)
+        if line is None:
+            line = CartItem(id=item.id, name=item.name, quantity=0)
+            self._lines[item.id] = line
+            self.items.append(line)
+
+        line.quantity += quantity
+        self._quantity += quantity
+        self.price += item.price * quantity
+        self.invalidate_json()
+
+        return line
 
 
 class ItemPost(BaseModel):
     name: str
     price: float
+
+
+class CartAddition(BaseModel):
+    item_id: int
+    quantity: int = Field(default=1, gt=0)
@@ -0,0 +1,71 @@
+from typing import Any, Collection, Iterable, Protocol
+
+from .models import Cart, Item
+from .store import CartStore, ItemStore, Page
+
+STORAGE_ENV = "SHOP_API_STORAGE"
+
+
+class ItemRepository(Protocol):
+    def create(self, name: str, price: float) -> Item: ...
+
+    def create_many(self, entries: Iterable[tuple[str, float]]) -> list[Item]: ...
+
+    def get(self, id: int) -> Item | None: ...
+
+    def get_many(self, ids: Iterable[int]) -> list[Item | None]: ...
+
+    def replace(
+        self, id: int, name: str, price: float, versions: Collection[int] | None = None
+    ) -> Item | None: ...
+
+    def patch(
+        self, id: int, fields: dict[str, Any], versions: Collection[int] | None = None
+    ) -> Item | None: ...
+
+    def delete(self, id: int) -> bool: ...
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        show_deleted: bool = False,
+        cursor: str | None = None,
+    ) -> Page[Item]: ...
+
+
+class CartRepository(Protocol):
+    def create(self) -> Cart: ...
+
+    def get(self, id: int) -> Cart | None: ...
+
+    def add_item(self, cart_id: int, item: Item) -> Cart | None: ...
+
+    def add_items(self, cart_id: int, lines: Iterable[tuple[Item, int]]) -> Cart | None: ...
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        min_quantity: int | None = None,
+        max_quantity: int | None = None,
+        cursor: str | None = None,
+    ) -> Page[Cart]: ...
+
+
+def open_repositories(url: str) -> tuple[ItemRepository, CartRepository]:
+    """`memory` (default, per process) or `sqlite:///path/to/shop.db` (shared)"""
+    if url == "memory":
+        return ItemStore(), CartStore()
+
+    if url.startswith("sqlite:///"):
+        from .sqlite_store import SQLiteCartStore, SQLiteDatabase, SQLiteItemStore
+
+        database = SQLiteDatabase(url.removeprefix("sqlite:///"))
+        return SQLiteItemStore(database), SQLiteCartStore(database)
+
+    raise ValueError(f"unsupported storage url: {url}")
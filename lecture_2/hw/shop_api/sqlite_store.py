@@ -0,0 +1,390 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Collection, Iterable, Iterator
+
+from .models import Cart, CartItem, Item
+from .store import InvalidCursor, Page, check_version, decode_cursor, encode_cursor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS items_price ON items (price, id);
+CREATE INDEX IF NOT EXISTS items_active ON items (deleted, id);
+CREATE INDEX IF NOT EXISTS items_active_price ON items (deleted, price, id);
+
+CREATE TABLE IF NOT EXISTS carts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    price REAL NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS carts_price ON carts (price, id);
+CREATE INDEX IF NOT EXISTS carts_quantity ON carts (quantity, id);
+
+CREATE TABLE IF NOT EXISTS cart_items (
+    cart_id INTEGER NOT NULL REFERENCES carts (id),
+    item_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    UNIQUE (cart_id, item_id)
+);
+"""
+
+_SELECT_ITEM = "SELECT id, name, price, deleted, version FROM items"
+_SELECT_CART = "SELECT id, price, version FROM carts"
+
+
+@dataclass(slots=True)
+class SQLiteDatabase:
+    """SQLite database in WAL mode shared by any number of worker processes.
+
+    Every thread of every process lazily opens its own connection and keeps
+    it for its lifetime, sqlite3 caches prepared statements per connection.
+    """
+
+    path: str
+    busy_timeout_ms: int = 5_000
+    cached_statements: int = 256
+
+    _local: threading.local = field(init=False, default_factory=threading.local)
+
+    def __post_init__(self) -> None:
+        self.connection().executescript(_SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+
+        # connections must not be reused across fork
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                cached_statements=self.cached_statements,
+            )
+            connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+
+def _item(row: tuple) -> Item:
+    id, name, price, deleted, version = row
+    return Item(id=id, name=name, price=price, deleted=bool(deleted), version=version)
+
+
+def _keyset(
+    index: str,
+    columns: tuple[str, ...],
+    cursor: str | None,
+    where: list[str],
+    params: list[Any],
+) -> None:
+    if cursor is None:
+        return
+
+    name, key = decode_cursor(cursor)
+    if name != index or len(key) != len(columns):
+        raise InvalidCursor("cursor does not match requested filters")
+
+    where.append(f"({', '.join(columns)}) > ({', '.join('?' * len(columns))})")
+    params.extend(key)
+
+
+def _where(conditions: list[str]) -> str:
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def _load_carts(connection: sqlite3.Connection, sql: str, params: tuple) -> list[Cart]:
+    return _with_lines(connection, connection.execute(sql, params).fetchall())
+
+
+def _with_lines(
+    connection: sqlite3.Connection, rows: list[tuple[int, float, int]]
+) -> list[Cart]:
+    if not rows:
+        return []
+
+    lines: dict[int, list[CartItem]] = {id: [] for id, _, _ in rows}
+    placeholders = ", ".join("?" * len(rows))
+    for cart_id, item_id, name, quantity in connection.execute(
+        "SELECT cart_id, item_id, name, quantity FROM cart_items"
+        f" WHERE cart_id IN ({placeholders}) ORDER BY rowid",
+        tuple(lines),
+    ):
+        lines[cart_id].append(CartItem(id=item_id, name=name, quantity=quantity))
+
+    return [
+        Cart(id=id, items=lines[id], price=price, version=version)
+        for id, price, version in rows
+    ]
+
+
+@dataclass(slots=True)
+class SQLiteItemStore:
+    database: SQLiteDatabase
+
+    def create(self, name: str, price: float) -> Item:
+        with self.database.transaction() as connection:
+            cursor = connection.execute(
+                "INSERT INTO items (name, price) VALUES (?, ?)", (name, price)
+            )
+
+        return Item(id=cursor.lastrowid, name=name, price=price)
+
+    def create_many(self, entries: Iterable[tuple[str, float]]) -> list[Item]:
+        entries = list(entries)
+        if not entries:
+            return []
+
+        # one transaction and one statement for the whole batch
+        values = ", ".join("(?, ?)" for _ in entries)
+        with self.database.transaction() as connection:
+            ids = connection.execute(
+                f"INSERT INTO items (name, price) VALUES {values} RETURNING id",
+                [part for entry in entries for part in entry],
+            ).fetchall()
+
+        return [
+            Item(id=id, name=name, price=price)
+            for (id,), (name, price) in zip(sorted(ids), entries)
+        ]
+
+    def get(self, id: int) -> Item | None:
+        row = (
+            self.database.connection()
+            .execute(f"{_SELECT_ITEM} WHERE id = ?", (id,))
+            .fetchone()
+        )
+        return _item(row) if row is not None else None
+
+    def get_many(self, ids: Iterable[int]) -> list[Item | None]:
+        ids = list(ids)
+        if not ids:
+            return []
+
+        rows = (
+            self.database.connection()
+            .execute(
+                f"{_SELECT_ITEM} WHERE id IN ({', '.join('?' * len(ids))})", ids
+            )
+            .fetchall()
+        )
+        found = {row[0]: _item(row) for row in rows}
+        return [found.get(id) for id in ids]
+
+    def replace(
+        self, id: int, name: str, price: float, versions: Collection[int] | None = None
+    ) -> Item | None:
+        with self.database.transaction() as connection:
+            row = connection.execute("SELECT version FROM items WHERE id = ?", (id,)).fetchone()
+            if row is None:
+                return None
+            check_version(row[0], versions)
+
+            connection.execute(
+                "UPDATE items SET name = ?, price = ?, deleted = 0, version = ? WHERE id = ?",
+                (name, price, row[0] + 1, id),
+            )
+
+        return Item(id=id, name=name, price=price, version=row[0] + 1)
+
+    def patch(
+        self, id: int, fields: dict[str, Any], versions: Collection[int] | None = None
+    ) -> Item | None:
+        with self.database.transaction() as connection:
+            row = connection.execute(f"{_SELECT_ITEM} WHERE id = ?", (id,)).fetchone()
+            if row is None:
+                return None
+
+            item = _item(row)
+            check_version(item.version, versions)
+
+            patched = Item.model_validate(
+                item.model_dump() | fields | {"version": item.version + 1}
+            )
+            connection.execute(
+                "UPDATE items SET name = ?, price = ?, version = ? WHERE id = ?",
+                (patched.name, patched.price, patched.version, id),
+            )
+
+        return patched
+
+    def delete(self, id: int) -> bool:
+        with self.database.transaction() as connection:
+            # deleting a deleted item is a no-op and keeps its version
+            cursor = connection.execute(
+                "UPDATE items SET version = version + 1 - deleted, deleted = 1 WHERE id = ?",
+                (id,),
+            )
+
+        return cursor.rowcount > 0
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        show_deleted: bool = False,
+        cursor: str | None = None,
+    ) -> Page[Item]:
+        # index names and ordering match in-memory ItemStore, so do cursors
+        if min_price is None and max_price is None:
+            index, columns = "id", ("id",)
+        else:
+            index, columns = "price", ("price", "id")
+
+        where: list[str] = []
+        params: list[Any] = []
+        if not show_deleted:
+            index += "_active"
+            where.append("deleted = 0")
+        if min_price is not None:
+            where.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("price <= ?")
+            params.append(max_price)
+        _keyset(index, columns, cursor, where, params)
+
+        rows = (
+            self.database.connection()
+            .execute(
+                f"{_SELECT_ITEM}{_where(where)} ORDER BY {', '.join(columns)} LIMIT ? OFFSET ?",
+                (*params, limit + 1, offset),
+            )
+            .fetchall()
+        )
+
+        entities = [_item(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = entities[-1]
+            key = (last.id,) if len(columns) == 1 else (last.price, last.id)
+            next_cursor = encode_cursor(index, key)
+
+        return Page(entities=entities, next_cursor=next_cursor)
+
+
+@dataclass(slots=True)
+class SQLiteCartStore:
+    database: SQLiteDatabase
+
+    def create(self) -> Cart:
+        with self.database.transaction() as connection:
+            cursor = connection.execute("INSERT INTO carts DEFAULT VALUES")
+
+        return Cart(id=cursor.lastrowid)
+
+    def get(self, id: int) -> Cart | None:
+        carts = _load_carts(
+            self.database.connection(), f"{_SELECT_CART} WHERE id = ?", (id,)
+        )
+        return carts[0] if carts else None
+
+    def add_item(self, cart_id: int, item: Item) -> Cart | None:
+        return self.add_items(cart_id, [(item, 1)])
+
+    def add_items(self, cart_id: int, lines: Iterable[tuple[Item, int]]) -> Cart | None:
+        lines = list(lines)
+        with self.database.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE carts SET price = price + ?, quantity = quantity + ?, version = version + 1"
+                " WHERE id = ?",
+                (
+                    sum(item.price * quantity for item, quantity in lines),
+                    sum(quantity for _, quantity in lines),
+                    cart_id,
+                ),
+            )
+            if not cursor.rowcount:
+                return None
+
+            connection.executemany(
+                "INSERT INTO cart_items (cart_id, item_id, name, quantity) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (cart_id, item_id) DO UPDATE"
+                " SET quantity = quantity + excluded.quantity",
+                [(cart_id, item.id, item.name, quantity) for item, quantity in lines],
+            )
+
+            return _load_carts(connection, f"{_SELECT_CART} WHERE id = ?", (cart_id,))[0]
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        min_quantity: int | None = None,
+        max_quantity: int | None = None,
+        cursor: str | None = None,
+    ) -> Page[Cart]:
+        where: list[str] = []
+        params: list[Any] = []
+        for column, operator, value in (
+            ("price", ">=", min_price),
+            ("price", "<=", max_price),
+            ("quantity", ">=", min_quantity),
+            ("quantity", "<=", max_quantity),
+        ):
+            if value is not None:
+                where.append(f"{column} {operator} ?")
+                params.append(value)
+
+        candidates = []
+        if min_price is not None or max_price is not None:
+            candidates.append("price")
+        if min_quantity is not None or max_quantity is not None:
+            candidates.append("quantity")
+        candidates = candidates or ["id"]
+
+        index = candidates[0]
+        if cursor is not None:
+            name, _ = decode_cursor(cursor)
+            if name in candidates:
+                index = name
+        columns = ("id",) if index == "id" else (index, "id")
+        _keyset(index, columns, cursor, where, params)
+
+        connection = self.database.connection()
+        rows = connection.execute(
+            f"SELECT id, price, version, quantity FROM carts{_where(where)}"
+            f" ORDER BY {', '.join(columns)} LIMIT ? OFFSET ?",
+            (*params, limit + 1, offset),
+        ).fetchall()
+
+        page_rows = rows[:limit]
+        entities = _with_lines(connection, [row[:3] for row in page_rows])
+
+        next_cursor = None
+        if len(rows) > limit:
+            id, price, _, quantity = page_rows[-1]
+            key = {"id": (id,), "price": (price, id), "quantity": (quantity, id)}[index]
+            next_cursor = encode_cursor(index, key)
+
+        return Page(entities=entities, next_cursor=next_cursor)
@@ -0,0 +1,371 @@
+import base64
+import json
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Iterable
+
+from .models import Cart, Item
+
+Key = tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class VersionConflict(Exception):
+    """Entity changed since the version the caller based its update on"""
+
+
+def check_version(version: int, expected: Collection[int] | None) -> None:
+    if expected is not None and version not in expected:
+        raise VersionConflict(f"current version is {version}")
+
+
+@dataclass(slots=True)
+class Page[_T]:
+    entities: list[_T]
+    next_cursor: str | None = None
+
+
+def encode_cursor(index: str, key: Key) -> str:
+    raw = json.dumps([index, list(key)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Key]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        index, key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("malformed cursor") from e
+
+    if not isinstance(key, list) or not all(
+        isinstance(part, int | float) and not isinstance(part, bool) for part in key
+    ):
+        raise InvalidCursor("malformed cursor")
+
+    return str(index), tuple(key)
+
+
+@dataclass(slots=True)
+class SortedIndex:
+    """Sorted list of `(value..., id)` keys, entity id is always the last part"""
+
+    name: str
+    _keys: list[Key] = field(init=False, default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Key) -> None:
+        if not self._keys or self._keys[-1] < key:
+            self._keys.append(key)
+        else:
+            insort(self._keys, key)
+
+    def remove(self, key: Key) -> None:
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def span(self, low: float | None, high: float | None) -> tuple[int, int]:
+        """Positions of keys whose first part is within [low, high]"""
+        start = 0 if low is None else bisect_left(self._keys, (low,))
+        stop = len(self._keys) if high is None else bisect_right(self._keys, (high, math.inf))
+        return start, stop
+
+    def position_after(self, key: Key) -> int:
+        return bisect_right(self._keys, key)
+
+    def page(
+        self,
+        start: int,
+        stop: int,
+        offset: int,
+        limit: int,
+        predicate: Callable[[Key], bool] | None = None,
+    ) -> tuple[list[Key], bool]:
+        """Keys of the page and whether there is anything after it"""
+        if predicate is None:
+            begin = min(start + offset, stop)
+            end = min(begin + limit, stop)
+            return self._keys[begin:end], end < stop
+
+        keys: list[Key] = []
+        skipped = 0
+        for position in range(start, stop):
+            key = self._keys[position]
+            if not predicate(key):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(keys) == limit:
+                return keys, True
+            keys.append(key)
+
+        return keys, False
+
+
+@dataclass(slots=True, frozen=True)
+class _Scan:
+    index: SortedIndex
+    low: float | None = None
+    high: float | None = None
+
+    def span(self) -> tuple[int, int]:
+        return self.index.span(self.low, self.high)
+
+    def width(self) -> int:
+        start, stop = self.span()
+        return stop - start
+
+
+def _list_page[_T](
+    entities: dict[int, _T],
+    scans: list[_Scan],
+    offset: int,
+    limit: int,
+    cursor: str | None,
+    predicate_for: Callable[[SortedIndex], Callable[[Key], bool] | None],
+) -> Page[_T]:
+    """Pages over the narrowest applicable index, or the one cursor was issued for"""
+    if cursor is None:
+        scan = min(scans, key=_Scan.width)
+        start, stop = scan.span()
+    else:
+        name, after = decode_cursor(cursor)
+        scan = next((scan for scan in scans if scan.index.name == name), None)
+        if scan is None:
+            raise InvalidCursor("cursor does not match requested filters")
+
+        start, stop = scan.span()
+        start = max(start, scan.index.position_after(after))
+
+    keys, has_more = scan.index.page(start, stop, offset, limit, predicate_for(scan.index))
+
+    return Page(
+        entities=[entities[key[-1]] for key in keys],
+        next_cursor=encode_cursor(scan.index.name, keys[-1]) if has_more else None,
+    )
+
+
+@dataclass(slots=True)
+class ItemStore:
+    """In-memory items, safe to share between the threads running sync handlers"""
+
+    _data: dict[int, Item] = field(init=False, default_factory=dict)
+    _last_id: int = field(init=False, default=0)
+    # guards ids, entities and indexes, a mutation touches several of them
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
+    _by_id: SortedIndex = field(init=False, default_factory=lambda: SortedIndex("id"))
+    _by_id_active: SortedIndex = field(
+        init=False, default_factory=lambda: SortedIndex("id_active")
+    )
+    _by_price: SortedIndex = field(init=False, default_factory=lambda: SortedIndex("price"))
+    _by_price_active: SortedIndex = field(
+        init=False, default_factory=lambda: SortedIndex("price_active")
+    )
+
+    def create(self, name: str, price: float) -> Item:
+        with self._lock:
+            return self._create(name, price)
+
+    def create_many(self, entries: Iterable[tuple[str, float]]) -> list[Item]:
+        with self._lock:
+            return [self._create(name, price) for name, price in entries]
+
+    def get(self, id: int) -> Item | None:
+        return self._data.get(id)
+
+    def get_many(self, ids: Iterable[int]) -> list[Item | None]:
+        return [self._data.get(id) for id in ids]
+
+    def replace(
+        self, id: int, name: str, price: float, versions: Collection[int] | None = None
+    ) -> Item | None:
+        with self._lock:
+            current = self._data.get(id)
+            if current is None:
+                return None
+            check_version(current.version, versions)
+
+            item = Item(id=id, name=name, price=price, version=current.version + 1)
+            self._unindex(current)
+            self._data[id] = item
+            self._index(item)
+
+            return item
+
+    def patch(
+        self, id: int, fields: dict[str, Any], versions: Collection[int] | None = None
+    ) -> Item | None:
+        with self._lock:
+            item = self._data.get(id)
+            if item is None:
+                return None
+            check_version(item.version, versions)
+
+            # validate before touching indexes, they rely on price being a number
+            patched = Item.model_validate(
+                item.model_dump() | fields | {"version": item.version + 1}
+            )
+
+            self._unindex(item)
+            self._data[id] = patched
+            self._index(patched)
+
+            return patched
+
+    def delete(self, id: int) -> bool:
+        with self._lock:
+            item = self._data.get(id)
+            if item is None:
+                return False
+
+            if not item.deleted:
+                self._unindex(item)
+                item.deleted = True
+                item.version += 1
+                item.invalidate_json()
+                self._index(item)
+
+            return True
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        show_deleted: bool = False,
+        cursor: str | None = None,
+    ) -> Page[Item]:
+        if min_price is None and max_price is None:
+            scan = _Scan(self._by_id if show_deleted else self._by_id_active)
+        else:
+            index = self._by_price if show_deleted else self._by_price_active
+            scan = _Scan(index, min_price, max_price)
+
+        with self._lock:
+            return _list_page(self._data, [scan], offset, limit, cursor, lambda _: None)
+
+    def _create(self, name: str, price: float) -> Item:
+        item = Item(id=self._last_id + 1, name=name, price=price)
+        self._last_id = item.id
+        self._data[item.id] = item
+        self._index(item)
+
+        return item
+
+    def _index(self, item: Item) -> None:
+        self._by_id.add((item.id,))
+        self._by_price.add((item.price, item.id))
+        if not item.deleted:
+            self._by_id_active.add((item.id,))
+            self._by_price_active.add((item.price, item.id))
+
+    def _unindex(self, item: Item) -> None:
+        self._by_id.remove((item.id,))
+        self._by_price.remove((item.price, item.id))
+        if not item.deleted:
+            self._by_id_active.remove((item.id,))
+            self._by_price_active.remove((item.price, item.id))
+
+
+@dataclass(slots=True)
+class CartStore:
+    """In-memory carts, safe to share between the threads running sync handlers"""
+
+    _data: dict[int, Cart] = field(init=False, default_factory=dict)
+    _last_id: int = field(init=False, default=0)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
+    _by_id: SortedIndex = field(init=False, default_factory=lambda: SortedIndex("id"))
+    _by_price: SortedIndex = field(init=False, default_factory=lambda: SortedIndex("price"))
+    _by_quantity: SortedIndex = field(
+        init=False, default_factory=lambda: SortedIndex("quantity")
+    )
+
+    def create(self) -> Cart:
+        with self._lock:
+            self._last_id += 1
+            cart = Cart(id=self._last_id)
+            self._data[cart.id] = cart
+            self._index(cart)
+
+            return cart
+
+    def get(self, id: int) -> Cart | None:
+        return self._data.get(id)
+
+    def add_item(self, cart_id: int, item: Item) -> Cart | None:
+        return self.add_items(cart_id, [(item, 1)])
+
+    def add_items(self, cart_id: int, lines: Iterable[tuple[Item, int]]) -> Cart | None:
+        with self._lock:
+            cart = self._data.get(cart_id)
+            if cart is None:
+                return None
+
+            # reindex once per batch, not once per line
+            self._unindex(cart)
+            for item, quantity in lines:
+                cart.add(item, quantity)
+            cart.version += 1
+            self._index(cart)
+            return cart
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        min_quantity: int | None = None,
+        max_quantity: int | None = None,
+        cursor: str | None = None,
+    ) -> Page[Cart]:
+        by_price = min_price is not None or max_price is not None
+        by_quantity = min_quantity is not None or max_quantity is not None
+
+        scans = []
+        if by_price:
+            scans.append(_Scan(self._by_price, min_price, max_price))
+        if by_quantity:
+            scans.append(_Scan(self._by_quantity, min_quantity, max_quantity))
+        if not scans:
+            scans.append(_Scan(self._by_id))
+
+        def in_range(value: float, low: float | None, high: float | None) -> bool:
+            return (low is None or value >= low) and (high is None or value <= high)
+
+        def predicate_for(index: SortedIndex) -> Callable[[Key], bool] | None:
+            # the chosen index covers its own range, check the other one per cart
+            if index is self._by_price and by_quantity:
+                return lambda key: in_range(
+                    self._data[key[-1]].quantity, min_quantity, max_quantity
+                )
+            if index is self._by_quantity and by_price:
+                return lambda key: in_range(self._data[key[-1]].price, min_price, max_price)
+            return None
+
+        with self._lock:
+            return _list_page(self._data, scans, offset, limit, cursor, predicate_for)
+
+    def _keys(self, cart: Cart) -> Iterable[tuple[SortedIndex, Key]]:
+        yield self._by_id, (cart.id,)
+        yield self._by_price, (cart.price, cart.id)
+        yield self._by_quantity, (cart.quantity, cart.id)
+
+    def _index(self, cart: Cart) -> None:
+        for index, key in self._keys(cart):
+            index.add(key)
+
+    def _unindex(self, cart: Cart) -> None:
+        for index, key in self._keys(cart):
+            index.remove(key)
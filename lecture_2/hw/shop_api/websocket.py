@@ -1,41 +1,212 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Mapping
+from contextlib import asynccontextmanager, suppress
 from dataclasses import dataclass, field
 from uuid import uuid4
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, status
+from prometheus_client import Gauge
 from prometheus_fastapi_instrumentator import Instrumentator
+from .backplane import BACKPLANE_ENV, MessageTooLarge, open_backplane
+from .fanout import Coalescer, OverflowPolicy, Subscriber, text_event
 
-app = FastAPI()
-Instrumentator().instrument(app).expose(app)
+# rooms without subscribers for this long are dropped from chat_rooms
+ROOM_IDLE_SECONDS = 60.0
+
+# coalescing of new rooms, off unless the delay in seconds is set
+COALESCE_DELAY_ENV = "CHAT_COALESCE_DELAY"
+COALESCE_BATCH_ENV = "CHAT_COALESCE_BATCH"
+
+CHAT_ROOMS = Gauge("chat_rooms", "Chat rooms of this process")
+CHAT_ROOM_SUBSCRIBERS = Gauge("chat_room_subscribers", "Subscribers of a chat room", ["room"])
 
 @dataclass(slots=True)
 class ChatRoom:
-    subscribers: list[WebSocket] = field(init=False, default_factory=list)
+    max_queue: int = 1024
+    policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    history_size: int = 1024
+    # coalescing sends live frames of each window as one JSON array frame, off when None
+    coalesce_delay: float | None = None
+    coalesce_batch: int = 64
+    # dict keeps insertion order and gives O(1) unsubscribe
+    subscribers: dict[WebSocket, Subscriber] = field(init=False, default_factory=dict)
+    idle_since: float | None = field(init=False, default_factory=time.monotonic)
+    # subscribers waiting for accept, the room is not idle while there are any
+    joining: int = field(init=False, default=0)
+    # sequence number of the last message, history holds the newest ones up to it.
+    # Numbers are per room instance, the epoch tells instances apart across
+    # workers and idle eviction
+    epoch: str = field(init=False, default_factory=lambda: uuid4().hex)
+    seq: int = field(init=False, default=0)
+    history: deque[str] = field(init=False)
+    coalescer: Coalescer | None = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        self.history = deque(maxlen=self.history_size)
+        if self.coalesce_delay is not None:
+            self.coalescer = Coalescer(self._fan_out_frame, self.coalesce_delay, self.coalesce_batch)
+
+    async def subscribe(self, ws: WebSocket, since: int | None = None, epoch: str | None = None) -> None:
+        # busy before the first await, so the evictor never drops a room under a joining client
+        self.joining += 1
+        self.idle_since = None
+        try:
+            await ws.accept()
+        except BaseException:
+            self.joining -= 1
+            self._check_idle()
+            raise
+        self.joining -= 1
+
+        subscriber = Subscriber(ws, self.max_queue, self.policy)
+        if self.coalescer is not None:
+            # pending messages are in history already, the replay must not repeat them
+            self.coalescer.flush()
+        # queued before the subscriber joins, so nothing is missed or sent twice
+        subscriber.offer(text_event(self.replay(since, epoch)))
+        self.subscribers[ws] = subscriber
 
-    async def subscribe(self, ws: WebSocket) -> None:
-        await ws.accept()
-        self.subscribers.append(ws)
+    def replay(self, since: int | None = None, epoch: str | None = None) -> str:
+        """First frame of every subscriber, messages after `since` still in history.
+
+        `first_seq` above `since + 1` means older messages were already
+        overwritten. Live frames after it are `{"seq": n, "message": ...}`
+        continuing from `last_seq`, a subscriber that dropped frames sees
+        the gap in `seq`. Without `since` no messages are replayed, the
+        frame only tells the epoch and seq to resume from. A `since` of
+        another epoch, counted by another worker or by a room since
+        evicted, is ignored and the whole history is replayed.
+        """
+        if since is None:
+            since = self.seq
+        elif epoch != self.epoch:
+            since = 0
+        first_seq = self.seq - len(self.history) + 1
+        skip = max(0, since + 1 - first_seq)
+        messages = list(islice(self.history, skip, None))
+        return json.dumps(
+            {
+                "epoch": self.epoch,
+                "first_seq": max(first_seq, since + 1),
+                "last_seq": self.seq,
+                "messages": messages,
+            }
+        )
 
     async def unsubscribe(self, ws: WebSocket) -> None:
-        self.subscribers.remove(ws)
+        subscriber = self.subscribers.pop(ws, None)
+        self._check_idle()
+        if subscriber is not None:
+            await subscriber.stop()
 
     async def publish(self, message: str) -> None:
-        for ws in self.subscribers:
-            await ws.send_text(message)
+        self.deliver(message)
+
+    def deliver(self, message: str) -> None:
+        # only enqueues, sender tasks of the subscribers do the sending
+        self.seq += 1
+        self.history.append(message)
+        frame = {"seq": self.seq, "message": message}
+        if self.coalescer is not None:
+            self.coalescer.add(frame)
+        else:
+            self._fan_out_frame(json.dumps(frame, ensure_ascii=False))
+
+    def _fan_out_frame(self, frame: str) -> None:
+        event = text_event(frame)
+        failed = [ws for ws, subscriber in self.subscribers.items() if not subscriber.offer(event)]
+
+        # failed sends and evicted slow consumers are never tried again, their sender
+        # tasks have finished or are closing the connection
+        for ws in failed:
+            del self.subscribers[ws]
+        if failed:
+            self._check_idle()
+
+    def _check_idle(self) -> None:
+        if not self.subscribers and not self.joining:
+            self.idle_since = time.monotonic()
+
+def room_options(environ: Mapping[str, str]) -> dict:
+    """ChatRoom keyword arguments configured through the environment"""
+    options = {}
+    if environ.get(COALESCE_DELAY_ENV):
+        options["coalesce_delay"] = float(environ[COALESCE_DELAY_ENV])
+    if environ.get(COALESCE_BATCH_ENV):
+        options["coalesce_batch"] = int(environ[COALESCE_BATCH_ENV])
+    return options
 
-chat_rooms = {}
+# passed to every room get_chat_room creates
+chat_room_options = room_options(os.environ)
+
+chat_rooms: dict[str, ChatRoom] = {}
+
+CHAT_ROOMS.set_function(lambda: len(chat_rooms))
+
+def get_chat_room(chat_name: str) -> ChatRoom:
+    chat_room = chat_rooms.get(chat_name)
+    if chat_room is None:
+        chat_room = chat_rooms[chat_name] = ChatRoom(**chat_room_options)
+        CHAT_ROOM_SUBSCRIBERS.labels(chat_name).set_function(lambda: len(chat_room.subscribers))
+    return chat_room
+
+def evict_idle_rooms(now: float, idle_seconds: float = ROOM_IDLE_SECONDS) -> int:
+    idle = [
+        chat_name
+        for chat_name, chat_room in chat_rooms.items()
+        if chat_room.idle_since is not None and now - chat_room.idle_since >= idle_seconds
+    ]
+    for chat_name in idle:
+        del chat_rooms[chat_name]
+        CHAT_ROOM_SUBSCRIBERS.remove(chat_name)
+    return len(idle)
+
+async def evict_idle_rooms_forever() -> None:
+    while True:
+        await asyncio.sleep(ROOM_IDLE_SECONDS / 2)
+        evict_idle_rooms(time.monotonic())
+
+def deliver(chat_name: str, message: str) -> None:
+    chat_room = chat_rooms.get(chat_name)
+    if chat_room is not None:
+        chat_room.deliver(message)
+
+# rooms of all workers sharing the backplane receive the same messages in the same order
+backplane = open_backplane(os.environ.get(BACKPLANE_ENV, "memory"), deliver)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    evictor = asyncio.create_task(evict_idle_rooms_forever())
+    yield
+    evictor.cancel()
+    with suppress(asyncio.CancelledError):
+        await evictor
+    await backplane.close()
+
+app = FastAPI(lifespan=lifespan)
+Instrumentator().instrument(app).expose(app)
 
 @app.websocket("/chat/{chat_name}")
-async def ws_chat(ws: WebSocket, chat_name: str):
+async def ws_chat(ws: WebSocket, chat_name: str, since: int | None = None, epoch: str | None = None):
     client_id = uuid4()
-    if chat_name not in chat_rooms:
-        chat_rooms[chat_name] = ChatRoom()
-
-    chat_room = chat_rooms[chat_name]
-    await chat_room.subscribe(ws)
-    await chat_room.publish(f"client {client_id} subscribed")
+    chat_room = get_chat_room(chat_name)
+    await chat_room.subscribe(ws, since, epoch)
+    await backplane.publish(chat_name, f"client {client_id} subscribed")
     try:
         while True:
             message = await ws.receive_text()
-            await chat_room.publish(message)
+            try:
+                await backplane.publish(chat_name, message)
+            except MessageTooLarge:
+                # refused by every backplane alike, rather than lost between workers
+                await ws.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                break
     except WebSocketDisconnect:
-        chat_room.unsubscribe(ws)
-        await chat_room.publish(f"client {client_id} unsubscribed")
+        pass
+    finally:
+        await chat_room.unsubscribe(ws)
+    await backplane.publish(chat_name, f"client {client_id} unsubscribed")
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from json.encoder import encode_basestring
+from typing import Iterable
+
+from fastapi import Response
 from pydantic import BaseModel, ConfigDict
 
 from lecture_2.rest_example.store.models import (
@@ -23,6 +27,27 @@ class PokemonResponse(BaseModel):
         )
 
 
+def pokemon_json(entity: PokemonEntity) -> bytes:
+    """Same JSON as a serialized PokemonResponse, written straight from the dataclasses"""
+    info = entity.info
+    return b'{"id":%d,"name":%s,"published":%s}' % (
+        entity.id,
+        encode_basestring(info.name).encode(),
+        b"true" if info.published else b"false",
+    )
+
+
+def pokemon_response(
+    entity: PokemonEntity, status_code: int = 200, headers: dict[str, str] | None = None
+) -> Response:
+    return Response(pokemon_json(entity), status_code, headers, media_type="application/json")
+
+
+def pokemon_list_response(entities: Iterable[PokemonEntity]) -> Response:
+    body = b"[" + b",".join([pokemon_json(entity) for entity in entities]) + b"]"
+    return Response(body, media_type="application/json")
+
+
 class PokemonRequest(BaseModel):
     name: str
     published: bool
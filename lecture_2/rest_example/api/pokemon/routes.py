@@ -1,30 +1,55 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, AsyncIterable, AsyncIterator
 
-from fastapi import APIRouter, HTTPException, Query, Response
-from pydantic import NonNegativeInt, PositiveInt
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import NonNegativeInt, PositiveInt, ValidationError
 
 from lecture_2.rest_example import store
+from lecture_2.rest_example.store.engine import MAX_ID, MIN_ID
 
 from .contracts import (
     PatchPokemonRequest,
     PokemonRequest,
     PokemonResponse,
+    pokemon_json,
+    pokemon_list_response,
+    pokemon_response,
 )
 
+# handlers return responses encoded by pokemon_json, response_model only documents them
 router = APIRouter(prefix="/pokemon")
 
+# the store keeps ids as int64
+PokemonId = Annotated[int, Path(ge=MIN_ID, le=MAX_ID)]
 
-@router.get("/")
+# records inserted per id range reservation during bulk import
+BULK_CHUNK = 1000
+# longest accepted NDJSON line
+MAX_LINE = 64 * 1024
+# records per chunk written by export
+EXPORT_CHUNK = 1000
+
+
+@router.get("/", response_model=list[PokemonResponse])
 async def get_pokemon_list(
     offset: Annotated[NonNegativeInt, Query()] = 0,
     limit: Annotated[PositiveInt, Query()] = 10,
-) -> list[PokemonResponse]:
-    return [PokemonResponse.from_entity(e) for e in store.get_many(offset, limit)]
+    published: Annotated[bool | None, Query()] = None,
+    name_prefix: Annotated[str | None, Query()] = None,
+) -> Response:
+    return pokemon_list_response(store.get_many(offset, limit, published, name_prefix))
+
+
+@router.get("/export")
+async def export_pokemon() -> StreamingResponse:
+    # records change while the export runs, it is not a point-in-time snapshot
+    return StreamingResponse(_export_chunks(), media_type="application/x-ndjson")
 
 
 @router.get(
     "/{id}",
+    response_model=PokemonResponse,
     responses={
         HTTPStatus.OK: {
             "description": "Successfully returned requested pokemon",
@@ -34,7 +59,7 @@ async def get_pokemon_list(
         },
     },
 )
-async def get_pokemon_by_id(id: int) -> PokemonResponse:
+async def get_pokemon_by_id(id: PokemonId) -> Response:
     entity = store.get_one(id)
 
     if not entity:
@@ -43,24 +68,63 @@ async def get_pokemon_by_id(id: int) -> PokemonResponse:
             f"Request resource /pokemon/{id} was not found",
         )
 
-    return PokemonResponse.from_entity(entity)
+    return pokemon_response(entity)
 
 
 @router.post(
     "/",
     status_code=HTTPStatus.CREATED,
+    response_model=PokemonResponse,
 )
-async def post_pokemon(info: PokemonRequest, response: Response) -> PokemonResponse:
+async def post_pokemon(info: PokemonRequest) -> Response:
     entity = store.add(info.as_pokemon_info())
+    await store.sync()
 
     # as REST states one should provide uri to newly created resource in location header
-    response.headers["location"] = f"/pokemon/{entity.id}"
+    return pokemon_response(
+        entity, HTTPStatus.CREATED, headers={"location": f"/pokemon/{entity.id}"}
+    )
 
-    return PokemonResponse.from_entity(entity)
+
+@router.post("/bulk", status_code=HTTPStatus.CREATED)
+async def post_pokemon_bulk(request: Request) -> dict:
+    """Inserts NDJSON pokemon from the request stream in chunks of BULK_CHUNK.
+
+    Chunks before an invalid line stay inserted, the error tells how many.
+    """
+    id_ranges: list[range] = []
+    chunk = []
+
+    try:
+        async for line_number, line in _ndjson_lines(request.stream()):
+            try:
+                chunk.append(PokemonRequest.model_validate_json(line).as_pokemon_info())
+            except ValidationError as e:
+                raise HTTPException(
+                    HTTPStatus.UNPROCESSABLE_ENTITY,
+                    f"line {line_number}: {e.errors()[0]['msg']}, "
+                    f"{sum(map(len, id_ranges))} pokemon created before it",
+                )
+
+            if len(chunk) == BULK_CHUNK:
+                id_ranges.append(store.add_many(chunk))
+                chunk = []
+
+        if chunk:
+            id_ranges.append(store.add_many(chunk))
+    finally:
+        # chunks created before an error are reported, so they are synced too
+        await store.sync()
+
+    return {
+        "created": sum(map(len, id_ranges)),
+        "ids": [[ids.start, ids.stop - 1] for ids in _merge(id_ranges)],
+    }
 
 
 @router.patch(
     "/{id}",
+    response_model=PokemonResponse,
     responses={
         HTTPStatus.OK: {
             "description": "Successfully patched pokemon",
@@ -70,8 +134,9 @@ async def post_pokemon(info: PokemonRequest, response: Response) -> PokemonRespo
         },
     },
 )
-async def patch_pokemon(id: int, info: PatchPokemonRequest) -> PokemonResponse:
+async def patch_pokemon(id: PokemonId, info: PatchPokemonRequest) -> Response:
     entity = store.patch(id, info.as_patch_pokemon_info())
+    await store.sync()
 
     if entity is None:
         raise HTTPException(
@@ -79,11 +144,12 @@ async def patch_pokemon(id: int, info: PatchPokemonRequest) -> PokemonResponse:
             f"Requested resource /pokemon/{id} was not found",
         )
 
-    return PokemonResponse.from_entity(entity)
+    return pokemon_response(entity)
 
 
 @router.put(
     "/{id}",
+    response_model=PokemonResponse,
     responses={
         HTTPStatus.OK: {
             "description": "Successfully updated or upserted pokemon",
@@ -94,15 +160,16 @@ async def patch_pokemon(id: int, info: PatchPokemonRequest) -> PokemonResponse:
     }
 )
 async def put_pokemon(
-    id: int,
+    id: PokemonId,
     info: PokemonRequest,
     upsert: Annotated[bool, Query()] = False,
-) -> PokemonResponse:
+) -> Response:
     entity = (
         store.upsert(id, info.as_pokemon_info())
         if upsert
         else store.update(id, info.as_pokemon_info())
     )
+    await store.sync()
 
     if entity is None:
         raise HTTPException(
@@ -110,10 +177,60 @@ async def put_pokemon(
             f"Requested resource /pokemon/{id} was not found",
         )
 
-    return PokemonResponse.from_entity(entity)
+    return pokemon_response(entity)
 
 
 @router.delete("/{id}")
-async def delete_pokemon(id: int) -> Response:
+async def delete_pokemon(id: PokemonId) -> Response:
     store.delete(id)
+    await store.sync()
     return Response("")
+
+
+async def _ndjson_lines(stream: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Non-blank lines and their 1-based numbers, counting blank lines too"""
+    rest = b""
+    number = 0
+    async for chunk in stream:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            number += 1
+            if len(line) > MAX_LINE:
+                raise _line_too_long(number)
+            if line.strip():
+                yield number, line
+
+        if len(rest) > MAX_LINE:
+            raise _line_too_long(number + 1)
+
+    if rest.strip():
+        yield number + 1, rest
+
+
+def _line_too_long(number: int) -> HTTPException:
+    return HTTPException(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"line {number}: longer than {MAX_LINE} bytes")
+
+
+def _merge(id_ranges: list[range]) -> list[range]:
+    merged: list[range] = []
+    for ids in id_ranges:
+        if merged and merged[-1].stop == ids.start:
+            merged[-1] = range(merged[-1].start, ids.stop)
+        else:
+            merged.append(ids)
+    return merged
+
+
+async def _export_chunks() -> AsyncIterator[bytes]:
+    lines = []
+    for entity in store.entities():
+        lines.append(pokemon_json(entity))
+        if len(lines) == EXPORT_CHUNK:
+            lines.append(b"")
+            yield b"\n".join(lines)
+            lines = []
+
+    if lines:
+        lines.append(b"")
+        yield b"\n".join(lines)
@@ -1,7 +1,17 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from lecture_2.rest_example import store
 from lecture_2.rest_example.api.pokemon import router
 
-app = FastAPI(title="Pokemon REST API Example")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    store.close()
+
+
+app = FastAPI(title="Pokemon REST API Example", lifespan=lifespan)
 
 app.include_router(router)
@@ -1,14 +1,40 @@
+from .concurrent import ConcurrentStore, IdAllocator
+from .durable import DurableStore, FsyncPolicy
+from .engine import DenseStore
 from .models import PatchPokemonInfo, PokemonEntity, PokemonInfo
-from .queries import add, delete, get_many, get_one, patch, update, upsert
+from .queries import (
+    add,
+    add_many,
+    close,
+    delete,
+    entities,
+    get_many,
+    get_one,
+    get_page,
+    patch,
+    sync,
+    update,
+    upsert,
+)
 
 __all__ = [
+    "ConcurrentStore",
+    "DenseStore",
+    "DurableStore",
+    "FsyncPolicy",
+    "IdAllocator",
     "PokemonEntity",
     "PokemonInfo",
     "PatchPokemonInfo",
     "add",
+    "add_many",
+    "close",
     "delete",
+    "entities",
     "get_many",
     "get_one",
+    "get_page",
+    "sync",
     "update",
     "upsert",
     "patch",
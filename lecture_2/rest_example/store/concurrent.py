@@ -0,0 +1,261 @@
+"""Pokemon store that sync handlers may share across threads.
+
+Starlette runs sync handlers in a threadpool and free-threaded Python
+runs any of them in parallel, so nothing here relies on the GIL:
+
+- ids come from `IdAllocator`, which hands out whole ranges under a lock
+- every id belongs to one of `stripes` locks, writers of different
+  stripes never wait for each other
+- stored records are never mutated, writers replace them, so readers take
+  no locks and always see a whole record
+
+Listing order is insertion order, kept in the `_order` list. An entry
+there is current only while the record it names still points back to
+it, which skips deleted and re-inserted ids. Listing walks that list
+from the start, so `get_many` costs O(offset + limit), unlike the
+indexed `DenseStore`.
+
+Once most entries are stale, `_order` is compacted under all locks and
+records are renumbered. A listing that ran into a compaction walks
+again, `get_page` cursors from before it may skip or repeat records.
+
+The example app's handlers are `async def`, only sync (threadpool)
+handlers or other threads share this store across threads.
+"""
+
+import threading
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from lecture_2.rest_example.store.engine import MAX_ID_GAP, _check_id
+from lecture_2.rest_example.store.models import (
+    PatchPokemonInfo,
+    PokemonEntity,
+    PokemonInfo,
+)
+
+# stale `_order` entries tolerated before a compaction, besides one per current entry
+ORDER_SLACK = 1024
+
+
+@dataclass(slots=True)
+class IdAllocator:
+    next_id: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def allocate(self, count: int = 1) -> range:
+        with self._lock:
+            ids = range(self.next_id, self.next_id + count)
+            self.next_id = ids.stop
+            return ids
+
+    def advance_past(self, id: int) -> None:
+        # same rule as `DenseStore.upsert`, a far id doesn't move later ids
+        with self._lock:
+            if self.next_id <= id < self.next_id + MAX_ID_GAP:
+                self.next_id = id + 1
+
+
+@dataclass(slots=True, frozen=True)
+class _Record:
+    position: int
+    info: PokemonInfo
+
+
+@dataclass(slots=True)
+class ConcurrentStore:
+    stripes: int = 64
+
+    ids: IdAllocator = field(init=False, default_factory=IdAllocator)
+    _locks: list[threading.Lock] = field(init=False)
+    _records: list[dict[int, _Record]] = field(init=False)
+    _order: list[int] = field(init=False, default_factory=list)
+    _order_lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    # entries of `_order` whose records were deleted
+    _stale: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._records = [{} for _ in range(self.stripes)]
+
+    def __len__(self) -> int:
+        return sum(map(len, self._records))
+
+    def add(self, info: PokemonInfo) -> PokemonEntity:
+        info = _copy(info)
+        while True:
+            id = self.ids.allocate().start
+            with self._locks[id % self.stripes]:
+                records = self._records[id % self.stripes]
+                # an upsert may have taken the id since it was allocated
+                if id not in records:
+                    records[id] = _Record(self._append_order([id]), info)
+                    return PokemonEntity(id, info)
+
+    def add_many(self, infos: list[PokemonInfo]) -> range:
+        infos = [_copy(info) for info in infos]
+        while True:
+            ids = self.ids.allocate(len(infos))
+            with ExitStack() as locked:
+                # in stripe order, like every holder of several locks
+                for stripe in sorted({id % self.stripes for id in ids}):
+                    locked.enter_context(self._locks[stripe])
+                if any(id in self._records[id % self.stripes] for id in ids):
+                    continue
+
+                start = self._append_order(ids)
+                for position, id, info in zip(range(start, start + len(ids)), ids, infos):
+                    self._records[id % self.stripes][id] = _Record(position, info)
+                return ids
+
+    def delete(self, id: int) -> None:
+        with self._locks[id % self.stripes]:
+            if self._records[id % self.stripes].pop(id, None) is None:
+                return
+            with self._order_lock:
+                self._stale += 1
+
+        if self._stale > len(self._order) - self._stale + ORDER_SLACK:
+            self._compact()
+
+    def get_one(self, id: int) -> PokemonEntity | None:
+        record = self._records[id % self.stripes].get(id)
+        if record is None:
+            return None
+
+        return PokemonEntity(id, record.info)
+
+    def get_many(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        published: bool | None = None,
+        name_prefix: str | None = None,
+    ) -> Iterable[PokemonEntity]:
+        while True:
+            order, skip = self._order, offset
+            entities = []
+            for entity in self._listed(order, 0, published, name_prefix):
+                if skip:
+                    skip -= 1
+                    continue
+                if len(entities) == limit:
+                    break
+                entities.append(entity)
+
+            # positions changed under the walk, which may have skipped records
+            if self._order is order:
+                return entities
+
+    def get_page(self, cursor: int = 0, limit: int = 10) -> tuple[list[PokemonEntity], int | None]:
+        """Up to `limit` pokemon from order position `cursor` on and the cursor of the next page"""
+        order = self._order
+        entities = []
+        end = len(order)
+        position = max(cursor, 0)
+        while position < end and len(entities) < limit:
+            entity = self._current(order, position)
+            if entity is not None:
+                entities.append(entity)
+            position += 1
+
+        return entities, (position if position < end else None)
+
+    def entities(self) -> Iterable[PokemonEntity]:
+        # by stripe, each copied under its lock, so a compaction does not disturb the walk
+        for lock, records in zip(self._locks, self._records):
+            with lock:
+                copied = list(records.items())
+            for id, record in copied:
+                yield PokemonEntity(id, record.info)
+
+    def update(self, id: int, info: PokemonInfo) -> PokemonEntity | None:
+        return self.modify(id, lambda _: info)
+
+    def upsert(self, id: int, info: PokemonInfo) -> PokemonEntity:
+        _check_id(id)
+        info = _copy(info)
+        with self._locks[id % self.stripes]:
+            records = self._records[id % self.stripes]
+            record = records.get(id)
+            if record is None:
+                self.ids.advance_past(id)
+                records[id] = _Record(self._append_order([id]), info)
+            else:
+                records[id] = _Record(record.position, info)
+
+        return PokemonEntity(id, info)
+
+    def patch(self, id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
+        return self.modify(
+            id,
+            lambda info: PokemonInfo(
+                info.name if patch_info.name is None else patch_info.name,
+                info.published if patch_info.published is None else patch_info.published,
+            ),
+        )
+
+    def modify(self, id: int, change: Callable[[PokemonInfo], PokemonInfo]) -> PokemonEntity | None:
+        """Replaces the record with `change(record)` under the stripe lock of `id`"""
+        with self._locks[id % self.stripes]:
+            records = self._records[id % self.stripes]
+            record = records.get(id)
+            if record is None:
+                return None
+
+            info = _copy(change(record.info))
+            records[id] = _Record(record.position, info)
+
+        return PokemonEntity(id, info)
+
+    def _append_order(self, ids: Iterable[int]) -> int:
+        with self._order_lock:
+            start = len(self._order)
+            self._order.extend(ids)
+            return start
+
+    def _compact(self) -> None:
+        with ExitStack() as locked:
+            for lock in (*self._locks, self._order_lock):
+                locked.enter_context(lock)
+            # another delete may have compacted meanwhile
+            if self._stale <= len(self._order) - self._stale + ORDER_SLACK:
+                return
+
+            order = []
+            for position, id in enumerate(self._order):
+                records = self._records[id % self.stripes]
+                record = records.get(id)
+                if record is not None and record.position == position:
+                    records[id] = _Record(len(order), record.info)
+                    order.append(id)
+
+            self._order = order
+            self._stale = 0
+
+    def _current(self, order: list[int], position: int) -> PokemonEntity | None:
+        id = order[position]
+        record = self._records[id % self.stripes].get(id)
+        if record is None or record.position != position:
+            return None
+
+        return PokemonEntity(id, record.info)
+
+    def _listed(
+        self, order: list[int], position: int, published: bool | None, name_prefix: str | None
+    ) -> Iterator[PokemonEntity]:
+        # positions appended after the walk started are not visited
+        for position in range(position, len(order)):
+            entity = self._current(order, position)
+            if (
+                entity is not None
+                and (published is None or entity.info.published == published)
+                and (name_prefix is None or entity.info.name.startswith(name_prefix))
+            ):
+                yield entity
+
+
+def _copy(info: PokemonInfo) -> PokemonInfo:
+    # stored infos are never shared with callers, who might mutate them
+    return PokemonInfo(info.name, info.published)
@@ -0,0 +1,382 @@
+"""Write-ahead log and snapshots for the Pokemon store.
+
+Every mutation is appended to `wal.log` as a binary record holding the
+resulting state of the pokemon, so replaying a record is the same as an
+upsert (or a delete) and replaying twice is harmless. Records are
+buffered and written in groups; `FsyncPolicy` decides when they reach
+the disk.
+
+Every `snapshot_every` records the log is renamed to a numbered segment
+`wal.<n>.log` and continues in a new `wal.log`. A copy of the slot arrays
+taken at that point is written to `snapshot.bin` (through a temporary
+file and a rename) by a background thread, which then deletes the
+segments up to `n`. The copy shares the stored infos, so it may see
+later changes, but every change after the rename is in the new log and
+replaying it fixes them up. Startup loads the snapshot and replays the
+segments and the log, all read in chunks, and stops at the first torn or
+corrupt record of each.
+
+Neither snapshots nor fsyncs run on the caller's thread. Appends only
+buffer records, a committer thread writes them, and with the `always`
+policy handlers await `sync()` before answering.
+
+Record layout, little endian:
+
+    crc32 u32 | op u8 | id i64 | published u8 | name length u32 | name utf-8
+
+crc32 covers everything after itself.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import threading
+import zlib
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntEnum, StrEnum
+from typing import BinaryIO, Iterable, Iterator
+
+from lecture_2.rest_example.store.engine import DenseStore
+from lecture_2.rest_example.store.models import (
+    PatchPokemonInfo,
+    PokemonEntity,
+    PokemonInfo,
+)
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR_ENV = "POKEMON_DATA_DIR"
+FSYNC_ENV = "POKEMON_FSYNC"
+
+WAL_NAME = "wal.log"
+SNAPSHOT_NAME = "snapshot.bin"
+
+_HEADER = struct.Struct("<IBqBI")
+_CRC = struct.Struct("<I")
+_NEXT_ID = struct.Struct("<q")
+_SNAPSHOT_MAGIC = b"PKSNAP1\n"
+_CHUNK = 1 << 20
+
+
+class Op(IntEnum):
+    ADD = 1
+    UPDATE = 2
+    UPSERT = 3
+    PATCH = 4
+    DELETE = 5
+
+
+_OPS = frozenset(Op)
+
+
+class FsyncPolicy(StrEnum):
+    ALWAYS = "always"  # write and fsync before `sync()` returns
+    INTERVAL = "interval"  # write and fsync a group once it is full or old enough
+    NEVER = "never"  # write groups, leave syncing to the OS
+
+
+def encode_record(op: Op, id: int, info: PokemonInfo | None) -> bytes:
+    name = info.name.encode() if info is not None else b""
+    published = info.published if info is not None else False
+    body = _HEADER.pack(0, op, id, published, len(name))[_CRC.size:] + name
+    return _CRC.pack(zlib.crc32(body)) + body
+
+
+def read_records(file: BinaryIO) -> Iterator[tuple[int, int, PokemonInfo | None]]:
+    """Records of `file` from its current position up to the first broken one"""
+    unpack, header, crc_size, crc32 = _HEADER.unpack_from, _HEADER.size, _CRC.size, zlib.crc32
+    buffer, pos = b"", 0
+    while True:
+        view = memoryview(buffer)
+        while len(buffer) - pos >= header:
+            crc, op, id, published, length = unpack(buffer, pos)
+            end = pos + header + length
+            if end > len(buffer):
+                break
+            if op not in _OPS or crc32(view[pos + crc_size:end]) != crc:
+                return
+
+            if op == Op.DELETE:
+                yield op, id, None
+            else:
+                yield op, id, PokemonInfo(str(view[pos + header:end], "utf-8"), published == 1)
+            pos = end
+
+        chunk = file.read(_CHUNK)
+        if not chunk:
+            return
+        view.release()
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+@dataclass(slots=True)
+class WriteAheadLog:
+    path: str
+    policy: FsyncPolicy = FsyncPolicy.INTERVAL
+    group_size: int = 256
+    interval: float = 0.05
+
+    # records appended since the log was opened or rotated
+    records: int = field(init=False, default=0)
+    _file: BinaryIO = field(init=False)
+    _group: list[bytes] = field(init=False, default_factory=list)
+    # rotated files and the records they still have to receive
+    _sealed: list[tuple[BinaryIO, list[bytes]]] = field(init=False, default_factory=list)
+    _renamed: bool = field(init=False, default=False)
+    # _lock guards the fields above and is never held during I/O, _io_lock keeps writes in order
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    _io_lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    _wake: threading.Event = field(init=False, default_factory=threading.Event)
+    _closed: threading.Event = field(init=False, default_factory=threading.Event)
+    _committer: threading.Thread = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._file = open(self.path, "ab")
+        # commits full groups at once and others after `interval`
+        self._committer = threading.Thread(target=self._commit_periodically, daemon=True)
+        self._committer.start()
+
+    def append(self, op: Op, id: int, info: PokemonInfo | None) -> None:
+        record = encode_record(op, id, info)
+        with self._lock:
+            self._group.append(record)
+            self.records += 1
+            if len(self._group) >= self.group_size:
+                self._wake.set()
+
+    def rotate(self, path: str) -> None:
+        """Renames the log to `path` and continues in a new file, buffered records go to the old one"""
+        with self._lock:
+            os.rename(self.path, path)
+            self._sealed.append((self._file, self._group))
+            self._file, self._group = open(self.path, "ab"), []
+            self._renamed = True
+            self.records = 0
+
+    def commit(self) -> None:
+        """Writes the records appended so far, fsyncs them unless policy is `never`"""
+        with self._io_lock:
+            with self._lock:
+                sealed, self._sealed = self._sealed, []
+                file, group, self._group = self._file, self._group, []
+                renamed, self._renamed = self._renamed, False
+
+            for sealed_file, sealed_group in sealed:
+                self._write(sealed_file, sealed_group)
+                sealed_file.close()
+            self._write(file, group)
+            if renamed and self.policy is not FsyncPolicy.NEVER:
+                # makes the rename and the new file durable
+                fsync_dir(os.path.dirname(self.path))
+
+    def close(self) -> None:
+        self._closed.set()
+        self._wake.set()
+        self._committer.join()
+        self.commit()
+        with self._io_lock:
+            self._file.close()
+
+    def _write(self, file: BinaryIO, group: list[bytes]) -> None:
+        # the whole group goes out in one write call
+        if group and not file.closed:
+            file.write(b"".join(group))
+            file.flush()
+            if self.policy is not FsyncPolicy.NEVER:
+                os.fsync(file.fileno())
+
+    def _commit_periodically(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.commit()
+
+
+def fsync_dir(path: str) -> None:
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(path: str, next_id: int, entities: Iterable[PokemonEntity]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(_SNAPSHOT_MAGIC + _NEXT_ID.pack(next_id))
+        group = []
+        for entity in entities:
+            group.append(encode_record(Op.UPSERT, entity.id, entity.info))
+            if len(group) == 4096:
+                file.write(b"".join(group))
+                group.clear()
+        file.write(b"".join(group))
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def log_segments(data_dir: str) -> list[tuple[int, str]]:
+    """Numbered log segments of `data_dir`, oldest first"""
+    segments = []
+    for name in os.listdir(data_dir):
+        number = name.removeprefix("wal.").removesuffix(".log")
+        if name.startswith("wal.") and name.endswith(".log") and number.isdigit():
+            segments.append((int(number), os.path.join(data_dir, name)))
+    return sorted(segments)
+
+
+def load(store: DenseStore, data_dir: str) -> None:
+    """Fills `store` from the snapshot and log in `data_dir`"""
+    snapshot = os.path.join(data_dir, SNAPSHOT_NAME)
+    if os.path.exists(snapshot):
+        with open(snapshot, "rb") as file:
+            if file.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{snapshot} is not a pokemon snapshot")
+            (store.next_id,) = _NEXT_ID.unpack(file.read(_NEXT_ID.size))
+            _replay(store, read_records(file))
+
+    logs = [path for _, path in log_segments(data_dir)] + [os.path.join(data_dir, WAL_NAME)]
+    for log in logs:
+        if os.path.exists(log):
+            with open(log, "rb") as file:
+                _replay(store, read_records(file))
+
+
+def _replay(store: DenseStore, records: Iterable[tuple[int, int, PokemonInfo | None]]) -> None:
+    for op, id, info in records:
+        if op == Op.DELETE:
+            store.delete(id)
+        else:
+            store.upsert(id, info)
+
+
+@dataclass(slots=True)
+class DurableStore:
+    """`DenseStore` that logs every mutation, reads go straight to the store"""
+
+    data_dir: str
+    policy: FsyncPolicy = FsyncPolicy.INTERVAL
+    snapshot_every: int = 100_000
+
+    store: DenseStore = field(init=False, default_factory=DenseStore)
+    wal: WriteAheadLog = field(init=False)
+    # number of the next log segment
+    _segment: int = field(init=False, default=0)
+    _snapshots: ThreadPoolExecutor = field(
+        init=False, default_factory=lambda: ThreadPoolExecutor(1, "pokemon-snapshot")
+    )
+    _snapshot: Future | None = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        segments = log_segments(self.data_dir)
+        self._segment = segments[-1][0] + 1 if segments else 0
+        load(self.store, self.data_dir)
+        wal = os.path.join(self.data_dir, WAL_NAME)
+        replayed = segments or (os.path.exists(wal) and os.path.getsize(wal) > 0)
+        self.wal = WriteAheadLog(wal, self.policy)
+        if replayed:
+            # compacts the replayed logs, which also drops a torn tail new records would follow
+            self.snapshot()
+
+    def add(self, info: PokemonInfo) -> PokemonEntity:
+        entity = self.store.add(info)
+        self._log(Op.ADD, entity.id, entity.info)
+        return entity
+
+    def add_many(self, infos: list[PokemonInfo]) -> range:
+        ids = self.store.add_many(infos)
+        for id, info in zip(ids, infos):
+            self._log(Op.ADD, id, info)
+        return ids
+
+    def delete(self, id: int) -> None:
+        if self.store.get_one(id) is not None:
+            self.store.delete(id)
+            self._log(Op.DELETE, id, None)
+
+    def get_one(self, id: int) -> PokemonEntity | None:
+        return self.store.get_one(id)
+
+    def get_many(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        published: bool | None = None,
+        name_prefix: str | None = None,
+    ) -> Iterable[PokemonEntity]:
+        return self.store.get_many(offset, limit, published, name_prefix)
+
+    def get_page(self, cursor: int = 0, limit: int = 10) -> tuple[list[PokemonEntity], int | None]:
+        return self.store.get_page(cursor, limit)
+
+    def entities(self) -> Iterable[PokemonEntity]:
+        return self.store.entities()
+
+    def update(self, id: int, info: PokemonInfo) -> PokemonEntity | None:
+        entity = self.store.update(id, info)
+        if entity is not None:
+            self._log(Op.UPDATE, entity.id, entity.info)
+        return entity
+
+    def upsert(self, id: int, info: PokemonInfo) -> PokemonEntity:
+        entity = self.store.upsert(id, info)
+        self._log(Op.UPSERT, entity.id, entity.info)
+        return entity
+
+    def patch(self, id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
+        entity = self.store.patch(id, patch_info)
+        if entity is not None:
+            self._log(Op.PATCH, entity.id, entity.info)
+        return entity
+
+    async def sync(self) -> None:
+        """Waits until mutations made so far are on disk with the `always` policy"""
+        if self.policy is FsyncPolicy.ALWAYS:
+            await asyncio.to_thread(self.wal.commit)
+
+    def snapshot(self) -> None:
+        """Writes a snapshot and waits for it"""
+        self._start_snapshot().result()
+
+    def close(self) -> None:
+        self._snapshots.shutdown()
+        self.wal.close()
+
+    def _log(self, op: Op, id: int, info: PokemonInfo | None) -> None:
+        self.wal.append(op, id, info)
+        if self.wal.records >= self.snapshot_every and (self._snapshot is None or self._snapshot.done()):
+            self._snapshot = self._start_snapshot()
+            self._snapshot.add_done_callback(_log_failure)
+
+    def _start_snapshot(self) -> Future:
+        # only a rename and a copy of the slot arrays happen here, no I/O waits
+        segment = self._segment
+        self._segment += 1
+        self.wal.rotate(os.path.join(self.data_dir, f"wal.{segment}.log"))
+        ids, infos = self.store.slots()
+        return self._snapshots.submit(self._write_snapshot, segment, self.store.next_id, ids, infos)
+
+    def _write_snapshot(
+        self, segment: int, next_id: int, ids: array, infos: list[PokemonInfo | None]
+    ) -> None:
+        self.wal.commit()
+        entities = (PokemonEntity(id, info) for id, info in zip(ids, infos) if info is not None)
+        write_snapshot(os.path.join(self.data_dir, SNAPSHOT_NAME), next_id, entities)
+
+        # a crash before these are gone replays them over the new snapshot, which is harmless
+        for number, path in log_segments(self.data_dir):
+            if number <= segment:
+                os.unlink(path)
+
+
+def _log_failure(snapshot: Future) -> None:
+    if not snapshot.cancelled() and snapshot.exception() is not None:
+        # the segments stay and are replayed, the next snapshot deletes them
+        logger.error("pokemon snapshot failed", exc_info=snapshot.exception())
@@ -0,0 +1,432 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator
+
+from lecture_2.rest_example.store.models import (
+    PatchPokemonInfo,
+    PokemonEntity,
+    PokemonInfo,
+)
+
+# ids up to this far past the end of the id array are kept in it, farther ones
+# (upserts of arbitrary ids) go to a dict so one large id does not allocate gigabytes
+MAX_ID_GAP = 1 << 16
+
+NO_SLOT = -1
+
+# ids are kept in int64 arrays (and logged as int64 by the durable store)
+MIN_ID = -(1 << 63)
+MAX_ID = (1 << 63) - 1
+
+# slot states, kept one byte per slot so a filtered scan is a bytearray.find
+FREE = 0
+UNPUBLISHED = 1
+PUBLISHED = 2
+
+_STATE_BYTES = {UNPUBLISHED: b"\x01", PUBLISHED: b"\x02"}
+
+# keys per chunk of the name index, chunks are split at twice this
+NAME_CHUNK = 1000
+
+
+@dataclass(slots=True)
+class SlotCounts:
+    """Fenwick tree counting the slots in one state.
+
+    Maps a position among those slots to the slot in O(log n), which makes
+    offset pagination independent of how deep the offset is.
+    """
+
+    _tree: list[int] = field(default_factory=lambda: [0])
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def append(self, counted: bool) -> None:
+        i = len(self._tree)
+        total, j, stop = int(counted), i - 1, i - (i & -i)
+        while j > stop:
+            total += self._tree[j]
+            j -= j & -j
+        self._tree.append(total)
+
+    def add(self, slot: int, delta: int) -> None:
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self) -> int:
+        total, i = 0, len(self._tree) - 1
+        while i:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+@dataclass(slots=True)
+class NameIndex:
+    """Sorted `(name, slot)` keys kept in chunks.
+
+    An insert or removal moves the keys of one chunk instead of the whole
+    index, which a single sorted list would do at a million names.
+    """
+
+    _chunks: list[list[tuple[str, int]]] = field(default_factory=list)
+    _maxes: list[tuple[str, int]] = field(default_factory=list)
+
+    def add(self, key: tuple[str, int]) -> None:
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._chunks[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._chunks[i], key)
+
+        chunk = self._chunks[i]
+        if len(chunk) > 2 * NAME_CHUNK:
+            self._chunks[i:i + 1] = [chunk[:NAME_CHUNK], chunk[NAME_CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[NAME_CHUNK - 1], chunk[-1]]
+
+    def remove(self, key: tuple[str, int]) -> None:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            return
+
+        del chunk[j]
+        if not chunk:
+            del self._chunks[i], self._maxes[i]
+        elif j == len(chunk):
+            self._maxes[i] = chunk[-1]
+
+    def count_prefixed(self, prefix: str) -> int:
+        return self._rank(prefix, bisect_right) - self._rank(prefix, bisect_left)
+
+    def _rank(self, prefix: str, bisect) -> int:
+        # names cut to the prefix length keep the sort order
+        def head(key: tuple[str, int]) -> str:
+            return key[0][:len(prefix)]
+
+        i = bisect(self._maxes, prefix, key=head)
+        before = sum(map(len, islice(self._chunks, i)))
+        if i == len(self._chunks):
+            return before
+        return before + bisect(self._chunks[i], prefix, key=head)
+
+    def prefixed(self, prefix: str) -> Iterable[int]:
+        """Slots of names starting with `prefix`, in name order"""
+        i = bisect_left(self._maxes, (prefix,))
+        j = bisect_left(self._chunks[i], (prefix,)) if i < len(self._chunks) else 0
+        while i < len(self._chunks):
+            chunk = self._chunks[i]
+            while j < len(chunk):
+                name, slot = chunk[j]
+                if not name.startswith(prefix):
+                    return
+                yield slot
+                j += 1
+            i, j = i + 1, 0
+
+
+def find(rank: int, *counts: SlotCounts) -> int:
+    """Slot at 0-based `rank` among the slots in `counts`, the slot count when there are fewer"""
+    trees = [c._tree for c in counts]
+    pos, size = 0, len(counts[0])
+    step = 1 << size.bit_length()
+    while step:
+        nxt = pos + step
+        if nxt <= size:
+            total = sum(tree[nxt] for tree in trees)
+            if total <= rank:
+                pos = nxt
+                rank -= total
+        step >>= 1
+    return pos
+
+
+def _check_id(id: int) -> None:
+    if not MIN_ID <= id <= MAX_ID:
+        raise ValueError(f"pokemon id {id} is out of the int64 range")
+
+
+def _positions(data: bytearray, marker: bytes) -> Iterator[int]:
+    position = data.find(marker)
+    while position != -1:
+        yield position
+        position = data.find(marker, position + 1)
+
+
+def _state(info: PokemonInfo) -> int:
+    return PUBLISHED if info.published else UNPUBLISHED
+
+
+@dataclass(slots=True)
+class DenseStore:
+    """Pokemon kept in parallel slot arrays.
+
+    `_slot_of[id]` points into the slot arrays, deleted slots go to a free
+    list and are reused by later inserts. Listing walks slots in order.
+    Slot states double as the `published` index, `_names` answers name
+    prefix lookups.
+    """
+
+    next_id: int = 0
+    _slot_of: array = field(default_factory=lambda: array("q"))
+    _sparse_slot_of: dict[int, int] = field(default_factory=dict)
+
+    _ids: array = field(default_factory=lambda: array("q"))
+    _infos: list[PokemonInfo | None] = field(default_factory=list)
+    _states: bytearray = field(default_factory=bytearray)
+    _free: list[int] = field(default_factory=list)
+    _counts: dict[int, SlotCounts] = field(
+        default_factory=lambda: {UNPUBLISHED: SlotCounts(), PUBLISHED: SlotCounts()}
+    )
+    _names: NameIndex = field(default_factory=NameIndex)
+    _count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, info: PokemonInfo) -> PokemonEntity:
+        id = self.next_id
+        while self._slot(id) != NO_SLOT:
+            # taken by a far upsert
+            id += 1
+        self._insert(id, info)
+        self.next_id = id + 1
+
+        return PokemonEntity(id, info)
+
+    def add_many(self, infos: list[PokemonInfo]) -> range:
+        """Adds `infos` under one reserved range of ids"""
+        ids = self._free_ids(len(infos))
+        for id, info in zip(ids, infos):
+            self._insert(id, info)
+        self.next_id = ids.stop
+
+        return ids
+
+    def delete(self, id: int) -> None:
+        slot = self._slot(id)
+        if slot == NO_SLOT:
+            return
+
+        info = self._infos[slot]
+        self._set_slot(id, NO_SLOT)
+        self._unindex(slot, info)
+        self._infos[slot] = None
+        self._free.append(slot)
+        self._count -= 1
+
+    def get_one(self, id: int) -> PokemonEntity | None:
+        slot = self._slot(id)
+        if slot == NO_SLOT:
+            return None
+
+        return PokemonEntity(id, self._infos[slot])
+
+    def get_many(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        published: bool | None = None,
+        name_prefix: str | None = None,
+    ) -> Iterable[PokemonEntity]:
+        """Same pokemon as filtering the full listing, answered from the indexes"""
+        if name_prefix:
+            slots = self._prefix_slots(name_prefix, published, offset, limit)
+            return [PokemonEntity(self._ids[slot], self._infos[slot]) for slot in slots]
+
+        if published is None:
+            entities, _ = self.get_page(find(offset, *self._counts.values()), limit)
+            return entities
+
+        state = PUBLISHED if published else UNPUBLISHED
+        marker, states = _STATE_BYTES[state], self._states
+        slot = find(offset, self._counts[state])
+        entities = []
+        while len(entities) < limit and (slot := states.find(marker, slot)) != -1:
+            entities.append(PokemonEntity(self._ids[slot], self._infos[slot]))
+            slot += 1
+        return entities
+
+    def get_page(self, cursor: int = 0, limit: int = 10) -> tuple[list[PokemonEntity], int | None]:
+        """Up to `limit` pokemon from slot `cursor` on and the cursor of the next page"""
+        ids, infos = self._ids, self._infos
+        entities = []
+        slot = max(cursor, 0)
+        while slot < len(infos) and len(entities) < limit:
+            info = infos[slot]
+            if info is not None:
+                entities.append(PokemonEntity(ids[slot], info))
+            slot += 1
+
+        return entities, (slot if slot < len(infos) else None)
+
+    def entities(self) -> Iterable[PokemonEntity]:
+        for id, info in zip(self._ids, self._infos):
+            if info is not None:
+                yield PokemonEntity(id, info)
+
+    def slots(self) -> tuple[array, list[PokemonInfo | None]]:
+        """Copies of the id and info slots, infos themselves are shared and patch changes them"""
+        return self._ids[:], self._infos[:]
+
+    def update(self, id: int, info: PokemonInfo) -> PokemonEntity | None:
+        slot = self._slot(id)
+        if slot == NO_SLOT:
+            return None
+
+        self._replace(slot, info)
+
+        return PokemonEntity(id, info)
+
+    def upsert(self, id: int, info: PokemonInfo) -> PokemonEntity:
+        _check_id(id)
+        slot = self._slot(id)
+        if slot == NO_SLOT:
+            self._insert(id, info)
+            # later adds continue past near ids and step over far ones, so an
+            # upsert close to MAX_ID does not use up the ids of later adds
+            if self.next_id <= id < self.next_id + MAX_ID_GAP:
+                self.next_id = id + 1
+        else:
+            self._replace(slot, info)
+
+        return PokemonEntity(id, info)
+
+    def patch(self, id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
+        slot = self._slot(id)
+        if slot == NO_SLOT:
+            return None
+
+        info = self._infos[slot]
+        self._unindex(slot, info)
+        if patch_info.name is not None:
+            info.name = patch_info.name
+
+        if patch_info.published is not None:
+            info.published = patch_info.published
+        self._index(slot, info)
+
+        return PokemonEntity(id, info)
+
+    def _free_ids(self, count: int) -> range:
+        # ids at or after next_id are only taken by far upserts
+        start = self.next_id
+        while taken := [id for id in range(start, start + count) if self._slot(id) != NO_SLOT]:
+            start = taken[-1] + 1
+
+        return range(start, start + count)
+
+    def _prefix_slots(self, prefix: str, published: bool | None, offset: int, limit: int) -> list[int]:
+        # the index hands out every name match, which then have to be filtered and
+        # sorted. A walk over the candidate slots in order stops after offset + limit
+        # matches, checking about candidates / matches slots for each
+        named = self._names.count_prefixed(prefix)
+        candidates, matches = len(self._infos), named
+        if published is not None:
+            # assumes published pokemon are spread evenly over names
+            candidates = self._counts[PUBLISHED if published else UNPUBLISHED].total()
+            matches = named * candidates // max(self._count, 1)
+
+        if (offset + limit) * candidates < matches * named:
+            return self._scan_prefix_slots(prefix, published, offset, limit)
+
+        slots = list(self._names.prefixed(prefix))
+        if published is not None:
+            state, states = (PUBLISHED if published else UNPUBLISHED), self._states
+            slots = [slot for slot in slots if states[slot] == state]
+
+        # listing order is slot order
+        slots.sort()
+        return slots[offset:offset + limit]
+
+    def _scan_prefix_slots(self, prefix: str, published: bool | None, offset: int, limit: int) -> list[int]:
+        infos = self._infos
+        if published is None:
+            candidates = range(len(infos))
+        else:
+            candidates = _positions(self._states, _STATE_BYTES[PUBLISHED if published else UNPUBLISHED])
+
+        matches = (
+            slot
+            for slot in candidates
+            if (info := infos[slot]) is not None and info.name.startswith(prefix)
+        )
+        return list(islice(matches, offset, offset + limit))
+
+    def _slot(self, id: int) -> int:
+        if 0 <= id < len(self._slot_of):
+            return self._slot_of[id]
+        return self._sparse_slot_of.get(id, NO_SLOT)
+
+    def _set_slot(self, id: int, slot: int) -> None:
+        if 0 <= id < len(self._slot_of) + MAX_ID_GAP:
+            if id >= len(self._slot_of):
+                # grows geometrically, so sparse ids are moved over O(log n) times at most
+                size = max(id + 1, 2 * len(self._slot_of), 1024)
+                self._slot_of.extend([NO_SLOT] * (size - len(self._slot_of)))
+                self._absorb_sparse()
+            self._slot_of[id] = slot
+        elif slot == NO_SLOT:
+            self._sparse_slot_of.pop(id, None)
+        else:
+            self._sparse_slot_of[id] = slot
+
+    def _absorb_sparse(self) -> None:
+        # ids that are now within the array move from the dict into it
+        if not self._sparse_slot_of:
+            return
+        for id in [id for id in self._sparse_slot_of if 0 <= id < len(self._slot_of)]:
+            self._slot_of[id] = self._sparse_slot_of.pop(id)
+
+    def _insert(self, id: int, info: PokemonInfo) -> None:
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = id
+            self._infos[slot] = info
+            self._index(slot, info)
+        else:
+            slot = len(self._infos)
+            state = _state(info)
+            self._ids.append(id)
+            self._infos.append(info)
+            self._states.append(state)
+            for counted, counts in self._counts.items():
+                counts.append(counted == state)
+            self._names.add((info.name, slot))
+
+        self._set_slot(id, slot)
+        self._count += 1
+
+    def _replace(self, slot: int, info: PokemonInfo) -> None:
+        self._unindex(slot, self._infos[slot])
+        self._infos[slot] = info
+        self._index(slot, info)
+
+    def _index(self, slot: int, info: PokemonInfo) -> None:
+        state = _state(info)
+        self._states[slot] = state
+        self._counts[state].add(slot, 1)
+
+        self._names.add((info.name, slot))
+
+    def _unindex(self, slot: int, info: PokemonInfo) -> None:
+        self._counts[self._states[slot]].add(slot, -1)
+        self._states[slot] = FREE
+
+        self._names.remove((info.name, slot))
@@ -7,8 +7,10 @@ class PokemonInfo:
     published: bool
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class PokemonEntity:
+    """Read-only view of a stored pokemon, `info` is the stored object, not a copy"""
+
     id: int
     info: PokemonInfo
 
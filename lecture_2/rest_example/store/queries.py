@@ -1,75 +1,94 @@
+import os
 from typing import Iterable
 
+from lecture_2.rest_example.store.concurrent import ConcurrentStore
+from lecture_2.rest_example.store.durable import (
+    DATA_DIR_ENV,
+    FSYNC_ENV,
+    DurableStore,
+    FsyncPolicy,
+)
+from lecture_2.rest_example.store.engine import DenseStore
 from lecture_2.rest_example.store.models import (
     PatchPokemonInfo,
     PokemonEntity,
     PokemonInfo,
 )
 
-_data = dict[int, PokemonInfo]()
 
+# "concurrent" for handlers that share the store across threads, in memory only
+ENGINE_ENV = "POKEMON_STORE"
 
-def int_id_generator() -> Iterable[int]:
-    i = 0
-    while True:
-        yield i
-        i += 1
 
+def _open_store() -> DenseStore | DurableStore | ConcurrentStore:
+    # in memory unless a data directory is configured
+    data_dir = os.environ.get(DATA_DIR_ENV)
 
-_id_generator = int_id_generator()
+    if os.environ.get(ENGINE_ENV) == "concurrent":
+        if data_dir:
+            raise ValueError(f"{ENGINE_ENV}=concurrent keeps no data, unset {DATA_DIR_ENV}")
+        return ConcurrentStore()
 
+    if not data_dir:
+        return DenseStore()
 
-def add(info: PokemonInfo) -> PokemonEntity:
-    _id = next(_id_generator)
-    _data[_id] = info
+    return DurableStore(data_dir, FsyncPolicy(os.environ.get(FSYNC_ENV, FsyncPolicy.INTERVAL)))
 
-    return PokemonEntity(_id, info)
 
+_store = _open_store()
 
-def delete(id: int) -> None:
-    if id in _data:
-        del _data[id]
 
+def close() -> None:
+    if isinstance(_store, DurableStore):
+        _store.close()
 
-def get_one(id: int) -> PokemonEntity | None:
-    if id not in _data:
-        return None
 
-    return PokemonEntity(id=id, info=_data[id])
+async def sync() -> None:
+    """Waits until mutations made so far are durable, when the store is configured so"""
+    if isinstance(_store, DurableStore):
+        await _store.sync()
 
 
-def get_many(offset: int = 0, limit: int = 10) -> Iterable[PokemonEntity]:
-    curr = 0
-    for id, info in _data.items():
-        if offset <= curr < offset + limit:
-            yield PokemonEntity(id, info)
+def add(info: PokemonInfo) -> PokemonEntity:
+    return _store.add(info)
 
-        curr += 1
 
+def add_many(infos: list[PokemonInfo]) -> range:
+    return _store.add_many(infos)
 
-def update(id: int, info: PokemonInfo) -> PokemonEntity | None:
-    if id not in _data:
-        return None
 
-    _data[id] = info
+def entities() -> Iterable[PokemonEntity]:
+    return _store.entities()
+
 
-    return PokemonEntity(id=id, info=info)
+def delete(id: int) -> None:
+    _store.delete(id)
 
 
-def upsert(id: int, info: PokemonInfo) -> PokemonEntity:
-    _data[id] = info
+def get_one(id: int) -> PokemonEntity | None:
+    return _store.get_one(id)
 
-    return PokemonEntity(id=id, info=info)
 
+def get_many(
+    offset: int = 0,
+    limit: int = 10,
+    published: bool | None = None,
+    name_prefix: str | None = None,
+) -> Iterable[PokemonEntity]:
+    return _store.get_many(offset, limit, published, name_prefix)
 
-def patch(id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
-    if id not in _data:
-        return None
 
-    if patch_info.name is not None:
-        _data[id].name = patch_info.name
+def get_page(cursor: int = 0, limit: int = 10) -> tuple[list[PokemonEntity], int | None]:
+    return _store.get_page(cursor, limit)
+
+
+def update(id: int, info: PokemonInfo) -> PokemonEntity | None:
+    return _store.update(id, info)
 
-    if patch_info.published is not None:
-        _data[id].published = patch_info.published
 
-    return PokemonEntity(id=id, info=_data[id])
+def upsert(id: int, info: PokemonInfo) -> PokemonEntity:
+    return _store.upsert(id, info)
+
+
+def patch(id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
+    return _store.patch(id, patch_info)
@@ -1,3 +1,6 @@
+import asyncio
+import json
+import logging
 from dataclasses import dataclass, field
 from uuid import uuid4
 
@@ -5,10 +8,19 @@ from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 
 app = FastAPI()
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(slots=True)
 class Broadcaster:
+    # when set, messages of each window go out as one JSON array frame
+    coalesce_delay: float | None = None
+    coalesce_batch: int = 64
     subscribers: list[WebSocket] = field(init=False, default_factory=list)
+    batch: list[str] = field(init=False, default_factory=list)
+    flusher: asyncio.Task | None = field(init=False, default=None)
+    # flushers still running, the event loop only keeps weak references to tasks
+    flushers: set[asyncio.Task] = field(init=False, default_factory=set)
 
     async def subscribe(self, ws: WebSocket) -> None:
         await ws.accept()
@@ -18,8 +30,42 @@ class Broadcaster:
         self.subscribers.remove(ws)
 
     async def publish(self, message: str) -> None:
+        if self.coalesce_delay is None:
+            await self.send_all(message)
+            return
+
+        self.batch.append(message)
+        if len(self.batch) >= self.coalesce_batch:
+            if self.flusher is not None:
+                self.flusher.cancel()
+                self.flusher = None
+            await self.flush()
+        elif self.flusher is None:
+            self.flusher = asyncio.create_task(self.flush_later())
+            self.flushers.add(self.flusher)
+            self.flusher.add_done_callback(self.flushed)
+
+    async def flush_later(self) -> None:
+        await asyncio.sleep(self.coalesce_delay)
+        self.flusher = None
+        await self.flush()
+
+    def flushed(self, task: asyncio.Task) -> None:
+        self.flushers.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("coalesced flush failed", exc_info=task.exception())
+
+    async def flush(self) -> None:
+        if self.batch:
+            frame = json.dumps(self.batch, ensure_ascii=False)
+            self.batch = []
+            await self.send_all(frame)
+
+    async def send_all(self, frame: str) -> None:
+        # one send event for all subscribers instead of one per send_text call
+        event = {"type": "websocket.send", "text": frame}
         for ws in self.subscribers:
-            await ws.send_text(message)
+            await ws.send(event)
 
 
 broadcaster = Broadcaster()
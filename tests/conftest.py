@@ -0,0 +1,8 @@
+import pytest
+
+from tests import helpers
+
+
+@pytest.fixture()
+def free_port() -> int:
+    return helpers.free_port()
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from lecture_2.hw.shop_api.backplane import (
+    MAX_MESSAGE_SIZE,
+    MessageTooLarge,
+    UnixSocketBackplane,
+    open_backplane,
+)
+
+
+def recorder() -> tuple[list, callable]:
+    received = []
+    return received, lambda room, message: received.append((room, message))
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_in_process_backplane_delivers_immediately() -> None:
+    received, deliver = recorder()
+    backplane = open_backplane("memory", deliver)
+
+    await backplane.publish("room", "hello")
+
+    assert received == [("room", "hello")]
+
+
+@pytest.mark.asyncio
+async def test_unix_backplane_delivers_same_order_everywhere(tmp_path) -> None:
+    url = f"unix://{tmp_path / 'chat.sock'}"
+    recorders = [recorder() for _ in range(3)]
+    backplanes = [open_backplane(url, deliver) for _, deliver in recorders]
+
+    for backplane in backplanes:
+        await backplane.start()
+    assert [backplane.is_hub for backplane in backplanes] == [True, False, False]
+    await wait_for(lambda: len(backplanes[0]._peers) == 2)
+
+    expected = 300
+    for i in range(expected // 3):
+        # bursts from every worker interleave and get batched per loop iteration
+        await asyncio.gather(
+            *(backplane.publish(f"room {i % 2}", f"{n}:{i}") for n, backplane in enumerate(backplanes))
+        )
+
+    await wait_for(lambda: all(len(received) == expected for received, _ in recorders))
+
+    first = recorders[0][0]
+    assert all(received == first for received, _ in recorders)
+    for n in range(3):
+        # messages of one publisher keep their order
+        assert [m for _, m in first if m.startswith(f"{n}:")] == [f"{n}:{i}" for i in range(100)]
+    assert all(backplane.gaps == 0 for backplane in backplanes[1:])
+
+    for backplane in backplanes:
+        await backplane.close()
+
+
+@pytest.mark.asyncio
+async def test_unix_backplane_fails_over_to_new_hub(tmp_path) -> None:
+    path = str(tmp_path / "chat.sock")
+    recorders = [recorder() for _ in range(3)]
+    hub, *peers = [UnixSocketBackplane(path, deliver) for _, deliver in recorders]
+
+    for backplane in (hub, *peers):
+        await backplane.start()
+    await wait_for(lambda: len(hub._peers) == 2)
+    await hub.publish("room", "before")
+    await wait_for(lambda: all(len(received) == 1 for received, _ in recorders))
+
+    await hub.close()
+    await wait_for(lambda: any(peer.is_hub for peer in peers))
+
+    await peers[0].publish("room", "after 0")
+    await peers[1].publish("room", "after 1")
+    await wait_for(lambda: all(len(received) == 3 for received, _ in recorders[1:]))
+
+    assert recorders[1][0] == recorders[2][0]
+    assert {message for _, message in recorders[1][0][1:]} == {"after 0", "after 1"}
+
+    for peer in peers:
+        await peer.close()
+
+
+@pytest.mark.asyncio
+async def test_backplanes_refuse_the_same_oversized_messages(tmp_path) -> None:
+    # every character escaped to \u0001, the longest JSON encoding
+    longest = "\x01" * (MAX_MESSAGE_SIZE - len("room"))
+    recorders = [recorder() for _ in range(3)]
+    memory = open_backplane("memory", recorders[0][1])
+    hub, peer = [open_backplane(f"unix://{tmp_path / 'chat.sock'}", deliver) for _, deliver in recorders[1:]]
+    await hub.start()
+    await peer.start()
+    await wait_for(lambda: len(hub._peers) == 1)
+
+    for backplane in (memory, peer):
+        with pytest.raises(MessageTooLarge):
+            await backplane.publish("room", longest + "x")
+        await backplane.publish("room", longest)
+    await wait_for(lambda: len(recorders[1][0]) == 1 and len(recorders[2][0]) == 1)
+
+    assert [received for received, _ in recorders] == [[("room", longest)]] * 3
+    assert len(hub._peers) == 1
+
+    await peer.close()
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_unix_backplane_closes_quietly(tmp_path) -> None:
+    errors = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+    path = str(tmp_path / "chat.sock")
+    hub, peer = UnixSocketBackplane(path, recorder()[1]), UnixSocketBackplane(path, recorder()[1])
+    await hub.start()
+    await peer.start()
+    await wait_for(lambda: len(hub._peers) == 1)
+
+    await hub.close()
+    await peer.close()
+    await asyncio.sleep(0.05)
+
+    assert errors == []
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.fanout import SLOW_CONSUMER_CLOSE_CODE, OverflowPolicy
+from lecture_2.hw.shop_api import backplane, websocket
+from lecture_2.hw.shop_api.websocket import ChatRoom, app, evict_idle_rooms, get_chat_room
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0, broken: bool = False) -> None:
+        self.delay = delay
+        self.broken = broken
+        self.received: list[str] = []
+        self.close_code: int | None = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send(self, event: dict) -> None:
+        message = event["text"]
+        if self.broken:
+            raise RuntimeError("connection is gone")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def live(frames: list[str]) -> list[tuple[int, str]]:
+    """`(seq, message)` of live frames, replay frames and coalesced arrays unpacked"""
+    result = []
+    for frame in map(json.loads, frames):
+        if isinstance(frame, dict) and "epoch" in frame:
+            continue
+        for entry in frame if isinstance(frame, list) else [frame]:
+            result.append((entry["seq"], entry["message"]))
+    return result
+
+
+def live_messages(frames: list[str]) -> list[str]:
+    return [message for _, message in live(frames)]
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_does_not_delay_others() -> None:
+    room = ChatRoom(max_queue=4)
+    slow, fast = FakeWebSocket(delay=60), FakeWebSocket()
+    await room.subscribe(slow)
+    await room.subscribe(fast)
+
+    for i in range(10):
+        await asyncio.wait_for(room.publish(str(i)), timeout=0.1)
+        await settle()
+
+    assert live(fast.received) == [(i + 1, str(i)) for i in range(10)]
+    # the replay frame is stuck in send, queue keeps the 4 newest
+    assert room.subscribers[slow].dropped == 6
+
+    await room.unsubscribe(slow)
+    await room.unsubscribe(fast)
+    assert not room.subscribers
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_subscriber() -> None:
+    room = ChatRoom(max_queue=2, policy=OverflowPolicy.DISCONNECT)
+    slow, fast = FakeWebSocket(delay=0.05), FakeWebSocket()
+    await room.subscribe(slow)
+    await room.subscribe(fast)
+
+    for i in range(5):
+        await room.publish(str(i))
+        await settle()
+    await asyncio.sleep(0.1)
+
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert live(slow.received) == []
+    assert slow not in room.subscribers
+    assert fast.close_code is None
+    assert live_messages(fast.received) == [str(i) for i in range(5)]
+
+    await room.unsubscribe(slow)
+    await room.unsubscribe(fast)
+
+
+@pytest.mark.asyncio
+async def test_publish_removes_failed_subscribers() -> None:
+    room = ChatRoom()
+    broken, alive = FakeWebSocket(broken=True), FakeWebSocket()
+    await room.subscribe(broken)
+    await room.subscribe(alive)
+
+    # the replay frame failed already
+    await room.publish("first")
+    assert list(room.subscribers) == [alive]
+    assert live_messages(alive.received) == ["first"]
+
+    await room.unsubscribe(alive)
+
+
+@pytest.mark.asyncio
+async def test_idle_rooms_are_evicted(monkeypatch) -> None:
+    monkeypatch.setattr(websocket, "chat_rooms", {})
+    busy, idle = get_chat_room("busy"), get_chat_room("idle")
+    ws = FakeWebSocket()
+    await busy.subscribe(ws)
+    await busy.unsubscribe(ws)
+    await busy.subscribe(ws)
+
+    assert evict_idle_rooms(idle.idle_since + 1, idle_seconds=10) == 0
+    assert evict_idle_rooms(idle.idle_since + 10, idle_seconds=10) == 1
+    assert list(websocket.chat_rooms) == ["busy"]
+
+    await busy.unsubscribe(ws)
+    assert evict_idle_rooms(busy.idle_since + 10, idle_seconds=10) == 1
+    assert websocket.chat_rooms == {}
+
+
+class PendingAcceptWebSocket(FakeWebSocket):
+    def __init__(self) -> None:
+        super().__init__()
+        self.accepted = asyncio.Event()
+
+    async def accept(self) -> None:
+        await self.accepted.wait()
+
+
+@pytest.mark.asyncio
+async def test_room_is_not_evicted_while_accept_is_pending(monkeypatch) -> None:
+    monkeypatch.setattr(websocket, "chat_rooms", {})
+    room = get_chat_room("joining")
+    ws = PendingAcceptWebSocket()
+    joining = asyncio.create_task(room.subscribe(ws))
+    await settle()
+
+    assert evict_idle_rooms(time.monotonic() + 3600, idle_seconds=10) == 0
+
+    ws.accepted.set()
+    await joining
+    websocket.deliver("joining", "hello")
+    await settle()
+    assert live_messages(ws.received) == ["hello"]
+
+    await room.unsubscribe(ws)
+    assert evict_idle_rooms(room.idle_since + 10, idle_seconds=10) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_accept_leaves_room_idle() -> None:
+    room = ChatRoom()
+    ws = PendingAcceptWebSocket()
+    joining = asyncio.create_task(room.subscribe(ws))
+    await settle()
+    assert room.idle_since is None
+
+    joining.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await joining
+    assert room.idle_since is not None
+    assert not room.subscribers
+
+
+def test_chat_over_websocket() -> None:
+    # every TestClient session runs its own event loop, so only one shares the room
+    with TestClient(app).websocket_connect("/chat/test_chat_over_websocket") as ws:
+        replay = json.loads(ws.receive_text())
+        assert replay["messages"] == []
+        seq = replay["last_seq"]
+        subscribed = json.loads(ws.receive_text())
+        assert subscribed["seq"] == seq + 1
+        assert subscribed["message"].endswith(" subscribed")
+
+        ws.send_text("hello")
+        ws.send_text("world")
+
+        assert json.loads(ws.receive_text()) == {"seq": seq + 2, "message": "hello"}
+        assert json.loads(ws.receive_text()) == {"seq": seq + 3, "message": "world"}
+
+
+@pytest.mark.asyncio
+async def test_subscriber_resumes_from_history() -> None:
+    room = ChatRoom(history_size=3)
+    for i in range(1, 6):
+        await room.publish(f"m{i}")
+
+    ws = FakeWebSocket()
+    await room.subscribe(ws, since=3, epoch=room.epoch)
+    await room.publish("m6")
+    await settle()
+
+    replay, *frames = ws.received
+    assert json.loads(replay) == {"epoch": room.epoch, "first_seq": 4, "last_seq": 5, "messages": ["m4", "m5"]}
+    assert live(frames) == [(6, "m6")]
+
+    # older messages are gone, first_seq tells the client what it missed
+    assert json.loads(room.replay(0, room.epoch))["messages"] == ["m4", "m5", "m6"]
+    assert json.loads(room.replay(0, room.epoch))["first_seq"] == 4
+    assert json.loads(room.replay(6, room.epoch))["messages"] == []
+
+    await room.unsubscribe(ws)
+
+
+@pytest.mark.asyncio
+async def test_since_of_another_epoch_replays_whole_history(monkeypatch) -> None:
+    monkeypatch.setattr(websocket, "chat_rooms", {})
+    old = get_chat_room("evicted")
+    for i in range(1, 4):
+        await old.publish(f"old {i}")
+    assert evict_idle_rooms(old.idle_since + 10, idle_seconds=10) == 1
+
+    room = get_chat_room("evicted")
+    await room.publish("new 1")
+    await room.publish("new 2")
+    replay = json.loads(room.replay(2, old.epoch))
+
+    # seq 2 of the evicted room is not seq 2 here
+    assert replay["epoch"] == room.epoch != old.epoch
+    assert replay["first_seq"] == 1
+    assert replay["messages"] == ["new 1", "new 2"]
+    assert json.loads(room.replay(1))["messages"] == ["new 1", "new 2"]
+
+
+def test_chat_over_websocket_resumes_since() -> None:
+    client = TestClient(app)
+    # without since the first frame only tells where to resume from
+    with client.websocket_connect("/chat/test_chat_over_websocket_resumes_since") as ws:
+        epoch = json.loads(ws.receive_text())["epoch"]
+        assert json.loads(ws.receive_text())["message"].endswith(" subscribed")
+        ws.send_text("missed")
+        assert json.loads(ws.receive_text()) == {"seq": 2, "message": "missed"}
+
+    with client.websocket_connect(f"/chat/test_chat_over_websocket_resumes_since?since=1&epoch={epoch}") as ws:
+        replay = json.loads(ws.receive_text())
+        assert replay["epoch"] == epoch
+        assert replay["first_seq"] == 2
+        assert replay["messages"][0] == "missed"
+        assert replay["messages"][1].endswith(" unsubscribed")
+        assert json.loads(ws.receive_text())["message"].endswith(" subscribed")
+
+
+@pytest.mark.asyncio
+async def test_coalescing_room_sends_json_array_frames() -> None:
+    room = ChatRoom(coalesce_delay=0.01, coalesce_batch=3)
+    ws = FakeWebSocket()
+    await room.subscribe(ws)
+
+    for i in range(5):
+        await room.publish(str(i))
+    await settle()
+    # a full batch goes out at once, the rest waits for the delay
+    batches = lambda: [[e["message"] for e in json.loads(frame)] for frame in ws.received[1:]]
+    assert batches() == [["0", "1", "2"]]
+
+    await asyncio.sleep(0.02)
+    assert batches() == [["0", "1", "2"], ["3", "4"]]
+    assert live(ws.received)[-1] == (5, "4")
+
+    await room.publish("pending")
+    late = FakeWebSocket()
+    await room.subscribe(late, since=5, epoch=room.epoch)
+    await settle()
+    # the pending batch is flushed before the replay, so it is not sent twice
+    assert json.loads(ws.received[-1]) == [{"seq": 6, "message": "pending"}]
+    assert json.loads(late.received[0])["messages"] == ["pending"]
+    assert late.received[1:] == []
+
+    await room.unsubscribe(ws)
+    await room.unsubscribe(late)
+
+
+def test_room_options_from_environment() -> None:
+    assert websocket.room_options({}) == {}
+    assert websocket.room_options({"CHAT_COALESCE_DELAY": "", "OTHER": "1"}) == {}
+    assert websocket.room_options({"CHAT_COALESCE_DELAY": "0.005", "CHAT_COALESCE_BATCH": "16"}) == {
+        "coalesce_delay": 0.005,
+        "coalesce_batch": 16,
+    }
+
+
+def test_chat_over_websocket_coalesces_when_configured(monkeypatch) -> None:
+    monkeypatch.setattr(websocket, "chat_room_options", {"coalesce_delay": 0.01, "coalesce_batch": 2})
+
+    with TestClient(app).websocket_connect("/chat/test_chat_over_websocket_coalesces") as ws:
+        assert "epoch" in json.loads(ws.receive_text())
+        ws.send_text("hello")
+        ws.send_text("world")
+
+        messages = []
+        while len(messages) < 3:
+            frame = json.loads(ws.receive_text())
+            assert isinstance(frame, list)
+            messages.extend(entry["message"] for entry in frame)
+
+    assert messages[0].endswith(" subscribed")
+    assert messages[1:] == ["hello", "world"]
+
+
+@pytest.mark.asyncio
+async def test_resume_after_dropped_frames() -> None:
+    room = ChatRoom(max_queue=2)
+    ws = FakeWebSocket(delay=0.01)
+    await room.subscribe(ws)
+
+    # the replay frame is being sent while these arrive, only the 2 newest stay queued
+    for i in range(1, 7):
+        await room.publish(f"m{i}")
+    await asyncio.sleep(0.1)
+    await room.unsubscribe(ws)
+
+    replay, *frames = ws.received
+    assert room.subscribers == {}
+    assert live(frames) == [(5, "m5"), (6, "m6")]
+
+    # the client resumes after the last seq it got without a gap
+    resumed = FakeWebSocket()
+    await room.subscribe(resumed, since=json.loads(replay)["last_seq"], epoch=json.loads(replay)["epoch"])
+    assert json.loads(resumed.received[0])["messages"] == ["m1", "m2", "m3", "m4", "m5", "m6"]
+
+    await room.unsubscribe(resumed)
+
+
+def test_chat_over_websocket_closes_on_oversized_message(monkeypatch) -> None:
+    monkeypatch.setattr(backplane, "MAX_MESSAGE_SIZE", 100)
+    client = TestClient(app)
+
+    with client.websocket_connect("/chat/test_oversized") as ws:
+        json.loads(ws.receive_text())
+        assert json.loads(ws.receive_text())["message"].endswith(" subscribed")
+        ws.send_text("x" * 100)
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            while True:
+                ws.receive_text()
+
+    assert disconnect.value.code == 1009
+    with client.websocket_connect("/chat/test_oversized?since=0") as ws:
+        messages = json.loads(ws.receive_text())["messages"]
+    assert [m.split()[-1] for m in messages] == ["subscribed", "unsubscribed"]
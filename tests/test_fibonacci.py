@@ -0,0 +1,32 @@
+import pytest
+
+from lecture_1.fibonacci import FibonacciEngine
+
+
+def fibonacci_loop(n: int) -> tuple[int, int]:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+
+    return a, b
+
+
+@pytest.mark.parametrize("cache_size", [0, 4, 1024])
+def test_pair_matches_loop(cache_size: int) -> None:
+    engine = FibonacciEngine(cache_size=cache_size)
+
+    for n in [*range(100), 1000, 1001, 4096, 4097, 12345, 12344, 20_000]:
+        assert engine.pair(n) == fibonacci_loop(n)
+
+
+def test_cache_is_bounded() -> None:
+    engine = FibonacciEngine(cache_size=8)
+    engine.warm(range(1000))
+
+    assert len(engine._cache) <= 8
+
+
+@pytest.mark.parametrize("n", [-1, 101])
+def test_out_of_range(n: int) -> None:
+    with pytest.raises(ValueError):
+        FibonacciEngine(max_n=100).pair(n)
@@ -15,6 +15,8 @@ from lecture_1.hw.math_plain_asgi import app
         ("GET", "/not_found"),
         ("POST", "/"),
         ("POST", "/not_found"),
+        ("GET", "/factorial/10"),
+        ("GET", "/fibonacci/1/2"),
     ],
 )
 async def test_not_found(method: str, path: str):
@@ -26,6 +28,23 @@ async def test_not_found(method: str, path: str):
         assert response.status_code == HTTPStatus.NOT_FOUND
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("method", "path"),
+    [
+        ("POST", "/factorial"),
+        ("PUT", "/fibonacci/10"),
+        ("DELETE", "/mean"),
+    ],
+)
+async def test_method_not_allowed(method: str, path: str):
+    async with TestClient(app) as client:
+        response = await client.open(path, method=method)
+
+    assert response.status_code == HTTPStatus.METHOD_NOT_ALLOWED
+    assert response.headers["allow"] == "GET"
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     ("query", "status_code"),
@@ -38,6 +57,8 @@ async def test_not_found(method: str, path: str):
         ({"n": 0}, HTTPStatus.OK),
         ({"n": 1}, HTTPStatus.OK),
         ({"n": 10}, HTTPStatus.OK),
+        ({"n": 1500}, HTTPStatus.OK),
+        ({"n": 10**9}, HTTPStatus.BAD_REQUEST),
     ],
 )
 async def test_factorial(query: dict[str, Any], status_code: int):
@@ -55,6 +76,7 @@ async def test_factorial(query: dict[str, Any], status_code: int):
     [
         ("/lol", HTTPStatus.UNPROCESSABLE_ENTITY),
         ("/-1", HTTPStatus.BAD_REQUEST),
+        ("/1000000000", HTTPStatus.BAD_REQUEST),
         ("/0", HTTPStatus.OK),
         ("/1", HTTPStatus.OK),
         ("/10", HTTPStatus.OK),
@@ -78,6 +100,9 @@ async def test_fibonacci(params: str, status_code: int):
         ([1, 2, 3], HTTPStatus.OK),
         ([1, 2.0, 3.0], HTTPStatus.OK),
         ([1.0, 2.0, 3.0], HTTPStatus.OK),
+        ({"a": 1}, HTTPStatus.UNPROCESSABLE_ENTITY),
+        (["a"], HTTPStatus.UNPROCESSABLE_ENTITY),
+        ([[1]], HTTPStatus.UNPROCESSABLE_ENTITY),
     ],
 )
 async def test_mean(json: dict[str, Any] | None, status_code: int):
@@ -86,4 +111,14 @@ async def test_mean(json: dict[str, Any] | None, status_code: int):
 
     assert response.status_code == status_code
     if status_code == HTTPStatus.OK:
-        assert "result" in response.json()
\ No newline at end of file
+        assert "result" in response.json()
+
+
+@pytest.mark.asyncio()
+async def test_mean_payload_too_large(monkeypatch):
+    monkeypatch.setattr("lecture_1.hw.math_plain_asgi.MAX_MEAN_BODY_SIZE", 16)
+
+    async with TestClient(app) as client:
+        response = await client.get("/mean", json=list(range(100)))
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
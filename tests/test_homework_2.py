@@ -283,3 +283,204 @@ def test_delete_item(existing_item: dict[str, Any]) -> None:
 
     response = client.delete(f"/item/{item_id}")
     assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize(
+    ("path", "query"),
+    [
+        ("/item", {"limit": 3}),
+        ("/item", {"limit": 2, "min_price": 10.0, "show_deleted": True}),
+        ("/cart", {"limit": 4}),
+        ("/cart", {"limit": 3, "min_quantity": 1, "max_price": 10_000.0}),
+    ],
+)
+def test_list_cursor_pagination(path: str, query: dict[str, Any]) -> None:
+    expected = client.get(path, params={**query, "limit": 10_000}).json()
+
+    pages, cursor = [], None
+    while True:
+        response = client.get(path, params={**query, "cursor": cursor} if cursor else query)
+        assert response.status_code == HTTPStatus.OK
+        pages.extend(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert pages == expected
+
+
+@pytest.mark.parametrize("path", ["/item", "/cart"])
+def test_list_invalid_cursor(path: str) -> None:
+    response = client.get(path, params={"cursor": "garbage"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_post_item_batch() -> None:
+    batch = [{"name": f"batch item {i}", "price": 1.5 * i} for i in range(5)]
+
+    response = client.post("/item/batch", json=batch)
+
+    assert response.status_code == HTTPStatus.CREATED
+    created = response.json()
+    assert [{"name": item["name"], "price": item["price"]} for item in created] == batch
+    assert len({item["id"] for item in created}) == len(batch)
+
+    for item in created:
+        assert client.get(f"/item/{item['id']}").json() == item
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        [{"name": "no price"}],
+        [{"price": 1.0}],
+        {"name": "not a list", "price": 1.0},
+        [{"name": "item", "price": 1.0}] * 1001,
+    ],
+)
+def test_post_item_batch_invalid(body: Any) -> None:
+    response = client.post("/item/batch", json=body)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_get_item_list_by_ids(deleted_item: dict[str, Any]) -> None:
+    first, second = client.post(
+        "/item/batch", json=[{"name": "first", "price": 1.0}, {"name": "second", "price": 2.0}]
+    ).json()
+    ids = [second["id"], deleted_item["id"], first["id"], 10**9]
+
+    response = client.get("/item", params={"ids": ",".join(map(str, ids))})
+
+    assert response.status_code == HTTPStatus.OK
+    assert [item["id"] for item in response.json()] == [second["id"], first["id"]]
+
+    response = client.get("/item", params={"ids": ",".join(map(str, ids)), "show_deleted": True})
+    assert [item["id"] for item in response.json()] == ids[:3]
+
+    response = client.get("/item", params={"ids": "1,x"})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_post_cart_add_batch(existing_empty_cart_id: int, existing_items: list[int]) -> None:
+    first, second = existing_items[:2]
+    body = [
+        {"item_id": first, "quantity": 3},
+        {"item_id": second},
+        {"item_id": first, "quantity": 2},
+    ]
+
+    response = client.post(f"/cart/{existing_empty_cart_id}/add", json=body)
+
+    assert response.status_code == HTTPStatus.OK
+    cart = response.json()
+    assert [(line["id"], line["quantity"]) for line in cart["items"]] == [(first, 5), (second, 1)]
+
+    prices = {id: client.get(f"/item/{id}").json()["price"] for id in (first, second)}
+    assert cart["price"] == pytest.approx(5 * prices[first] + prices[second])
+    assert client.get(f"/cart/{existing_empty_cart_id}").json() == cart
+
+
+@pytest.mark.parametrize(
+    ("body", "status_code"),
+    [
+        ([{"item_id": 10**9}], HTTPStatus.NOT_FOUND),
+        ([{"item_id": "deleted"}], HTTPStatus.NOT_FOUND),
+        ([{"item_id": 1, "quantity": 0}], HTTPStatus.UNPROCESSABLE_ENTITY),
+        ([{"quantity": 1}], HTTPStatus.UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_post_cart_add_batch_is_atomic(
+    existing_empty_cart_id: int,
+    existing_items: list[int],
+    deleted_item: dict[str, Any],
+    body: list[dict[str, Any]],
+    status_code: int,
+) -> None:
+    for line in body:
+        if line.get("item_id") == "deleted":
+            line["item_id"] = deleted_item["id"]
+    body = [{"item_id": existing_items[0]}, *body]
+
+    response = client.post(f"/cart/{existing_empty_cart_id}/add", json=body)
+
+    assert response.status_code == status_code
+    assert client.get(f"/cart/{existing_empty_cart_id}").json()["items"] == []
+
+
+def test_post_cart_add_batch_unknown_cart() -> None:
+    response = client.post("/cart/1000000000/add", json=[])
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize("resource", ["item", "cart"])
+def test_conditional_get(
+    resource: str, existing_item: dict[str, Any], existing_empty_cart_id: int
+) -> None:
+    id = existing_item["id"] if resource == "item" else existing_empty_cart_id
+    response = client.get(f"/{resource}/{id}")
+    tag = response.headers["etag"]
+    assert tag.startswith('W/"')
+
+    response = client.get(f"/{resource}/{id}", headers={"If-None-Match": f'"0", {tag}'})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers["etag"] == tag
+    assert response.content == b""
+
+    if resource == "item":
+        client.patch(f"/item/{id}", json={"price": 1.0})
+    else:
+        client.post(f"/cart/{id}/add/{existing_item['id']}")
+
+    response = client.get(f"/{resource}/{id}", headers={"If-None-Match": tag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["etag"] != tag
+    assert response.json()
+
+
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_if_match(existing_item: dict[str, Any], method: str) -> None:
+    item_id = existing_item["id"]
+    body = {"name": "matched", "price": 1.0}
+    tag = client.get(f"/item/{item_id}").headers["etag"]
+
+    response = client.request(method, f"/item/{item_id}", json=body, headers={"If-Match": tag})
+    assert response.status_code == HTTPStatus.OK
+    new_tag = response.headers["etag"]
+    assert new_tag != tag
+    assert client.get(f"/item/{item_id}").headers["etag"] == new_tag
+
+    response = client.request(method, f"/item/{item_id}", json=body, headers={"If-Match": tag})
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+
+    response = client.request(method, f"/item/{item_id}", json=body, headers={"If-Match": "*"})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_delete_bumps_version(existing_item: dict[str, Any]) -> None:
+    item_id = existing_item["id"]
+    tag = client.get(f"/item/{item_id}").headers["etag"]
+
+    client.delete(f"/item/{item_id}")
+    response = client.put(
+        f"/item/{item_id}", json={"name": "revived", "price": 1.0}, headers={"If-Match": tag}
+    )
+
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+
+
+@pytest.mark.parametrize("price", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_prices(existing_item: dict[str, Any], price: str) -> None:
+    body = f'{{"name": "not a number", "price": {price}}}'
+    headers = {"Content-Type": "application/json"}
+
+    for method, path, content in [
+        ("POST", "/item", body),
+        ("POST", "/item/batch", f"[{body}]"),
+        ("PUT", f"/item/{existing_item['id']}", body),
+        ("PATCH", f"/item/{existing_item['id']}", f'{{"price": {price}}}'),
+    ]:
+        response = client.request(method, path, content=content, headers=headers)
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, (method, path)
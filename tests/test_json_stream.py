@@ -0,0 +1,92 @@
+import json
+import math
+import random
+
+import pytest
+
+from lecture_1.hw.json_stream import (
+    BodyTooLarge,
+    MalformedArray,
+    StreamingMean,
+    read_mean,
+)
+
+
+def feed_in_chunks(body: bytes, chunk_size: int) -> StreamingMean:
+    mean = StreamingMean()
+    for i in range(0, len(body), chunk_size):
+        mean.feed(body[i : i + chunk_size])
+
+    mean.close()
+    return mean
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+def test_mean_matches_json_loads(chunk_size: int) -> None:
+    rng = random.Random(chunk_size)
+    numbers = [rng.choice([rng.uniform(-1e6, 1e6), rng.randint(-100, 100)]) for _ in range(500)]
+    numbers += [1e-300, -0.0, 12.5e3]
+    body = json.dumps(numbers, indent=rng.choice([None, 1])).encode()
+
+    mean = feed_in_chunks(body, chunk_size)
+
+    assert mean.count == len(numbers)
+    assert mean.value == pytest.approx(math.fsum(numbers) / len(numbers), rel=1e-12)
+
+
+def test_compensated_sum() -> None:
+    mean = feed_in_chunks(b"[1e100, 1.0, -1e100, 1.0]", 4)
+
+    assert mean.value == 0.5
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1024])
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b"   ",
+        b"{}",
+        b"[",
+        b"[1,",
+        b"[1,]",
+        b"[,1]",
+        b"[1 2]",
+        b"[01]",
+        b"[1.]",
+        b"[.5]",
+        b"[1e]",
+        b"[--1]",
+        b"[[1]]",
+        b'["1"]',
+        b"[true]",
+        b"[1] 2",
+        b"[1]]",
+    ],
+)
+def test_malformed(body: bytes, chunk_size: int) -> None:
+    with pytest.raises(MalformedArray):
+        feed_in_chunks(body, chunk_size)
+
+
+def test_empty_array() -> None:
+    assert feed_in_chunks(b" [ ] ", 1).count == 0
+
+
+@pytest.mark.asyncio
+async def test_read_mean_body_limit() -> None:
+    messages = iter(
+        [
+            {"type": "http.request", "body": b"[1, 2,", "more_body": True},
+            {"type": "http.request", "body": b" 3]", "more_body": False},
+        ]
+    )
+
+    async def receive():
+        return next(messages)
+
+    with pytest.raises(BodyTooLarge):
+        await read_mean({"headers": []}, receive, max_body_size=8)
+
+    with pytest.raises(BodyTooLarge):
+        await read_mean({"headers": [(b"content-length", b"9")]}, receive, 8)
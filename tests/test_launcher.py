@@ -0,0 +1,65 @@
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from lecture_1 import launcher
+from lecture_1.launcher import Supervisor
+from tests.helpers import get
+
+
+@pytest.mark.slow
+def test_launcher_serves_and_drains_on_sigterm(free_port: int) -> None:
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "lecture_1.launcher",
+            "lecture_1.hw.math_plain_asgi:app",
+            "--workers=2",
+            f"--port={free_port}",
+            "--log-level=warning",
+        ]
+    )
+
+    try:
+        for _ in range(10):
+            assert get(free_port, "/fibonacci/10") == b'{"result": 89}'
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+    finally:
+        process.kill()
+
+
+def test_sigterm_during_restart_backoff_does_not_spawn(monkeypatch: pytest.MonkeyPatch) -> None:
+    supervisor = Supervisor(app=None, host="127.0.0.1", port=0, workers=1)
+    supervisor._pids[100] = time.monotonic()
+    exits = iter([(100, 256), (0, 0)])
+    spawned = []
+
+    monkeypatch.setattr(launcher.os, "waitpid", lambda *_: next(exits))
+    monkeypatch.setattr(launcher.time, "sleep", lambda _: supervisor._stop(signal.SIGTERM, None))
+    monkeypatch.setattr(Supervisor, "_spawn", lambda self: spawned.append(self))
+
+    supervisor._reap()
+
+    assert spawned == []
+    assert supervisor._pids == {}
+
+
+def test_undrained_workers_are_killed_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    supervisor = Supervisor(app=None, host="127.0.0.1", port=0, workers=1, graceful_timeout=0.0)
+    supervisor._pids[100] = time.monotonic()
+    supervisor._stopping_since = time.monotonic() - 10
+    killed = []
+
+    monkeypatch.setattr(launcher.os, "waitpid", lambda *_: (0, 0))
+    monkeypatch.setattr(launcher.os, "kill", lambda pid, signum: killed.append((pid, signum)))
+
+    for _ in range(3):
+        supervisor._reap()
+
+    assert killed == [(100, signal.SIGKILL)]
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from lecture_1.offload import OffloadExecutor, Overloaded, encode_factorial
+
+
+@pytest.mark.asyncio
+async def test_cheap_call_runs_inline() -> None:
+    executor = OffloadExecutor(cost_threshold=10, max_in_flight=0)
+
+    assert await executor.run(os.getpid, cost=1) == os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_heavy_call_runs_in_pool() -> None:
+    executor = OffloadExecutor(cost_threshold=10, max_workers=1)
+
+    try:
+        assert await executor.run(os.getpid, cost=10) != os.getpid()
+
+        assert await executor.run(encode_factorial, 20, cost=20) == encode_factorial(20)
+
+        # far above the default int->str digit limit of the main process
+        body = await executor.run(encode_factorial, 5_000, cost=5_000)
+        assert body.startswith(b'{"result": 4228577926')
+    finally:
+        executor.shutdown()
+
+    assert executor.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_heavy_call_rejected_when_overloaded() -> None:
+    executor = OffloadExecutor(cost_threshold=10, max_in_flight=0)
+
+    with pytest.raises(Overloaded):
+        await executor.run(os.getpid, cost=10)
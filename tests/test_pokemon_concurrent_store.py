@@ -0,0 +1,214 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from lecture_2.rest_example.api.pokemon import PokemonRequest, PokemonResponse
+from lecture_2.rest_example.store import (
+    ConcurrentStore,
+    DenseStore,
+    IdAllocator,
+    PatchPokemonInfo,
+    PokemonInfo,
+)
+from lecture_2.rest_example.store import concurrent, queries
+from lecture_2.rest_example.store.durable import DATA_DIR_ENV
+
+THREADS = 16
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    # with the GIL, threads switching every few instructions is what exposes races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def hammer(func, count: int = THREADS) -> list:
+    start = threading.Barrier(count)
+
+    def run(n: int):
+        start.wait()
+        return func(n)
+
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_same_results_as_dense_store() -> None:
+    concurrent, dense = ConcurrentStore(stripes=4), DenseStore()
+    for store in (concurrent, dense):
+        for i in range(30):
+            store.add(PokemonInfo(f"p{i}", i % 3 == 0))
+        store.add_many([PokemonInfo(f"bulk{i}", True) for i in range(5)])
+        for id in (1, 5, 31):
+            store.delete(id)
+        store.update(2, PokemonInfo("updated", True))
+        store.patch(3, PatchPokemonInfo(name="patched"))
+        store.upsert(5, PokemonInfo("back", False))
+        store.upsert(50, PokemonInfo("far", True))
+        assert store.add(PokemonInfo("next", False)).id == 51
+
+    def listed(store, **filters):
+        return [(e.id, e.info) for e in store.get_many(0, 100, **filters)]
+
+    # re-inserted ids go to the end of the listing, dense store reuses a free slot
+    assert sorted(listed(concurrent)) == sorted(listed(dense))
+    assert sorted(listed(concurrent, published=True)) == sorted(listed(dense, published=True))
+    assert sorted(listed(concurrent, name_prefix="p1")) == sorted(listed(dense, name_prefix="p1"))
+    assert concurrent.update(1, PokemonInfo("missing", True)) is None
+    assert concurrent.patch(1, PatchPokemonInfo(name="missing")) is None
+
+
+def test_ids_are_unique_under_contention() -> None:
+    store = ConcurrentStore()
+
+    def add(n: int) -> list[int]:
+        ids = [store.add(PokemonInfo(f"{n}-{i}", True)).id for i in range(500)]
+        ids.extend(store.add_many([PokemonInfo(f"{n}-bulk", False)] * 50))
+        return ids
+
+    ids = [id for chunk in hammer(add) for id in chunk]
+
+    assert len(ids) == len(set(ids)) == THREADS * 550
+    assert len(store) == len(ids)
+    assert sorted(e.id for e in store.entities()) == sorted(ids)
+
+
+def test_no_lost_updates() -> None:
+    store = ConcurrentStore(stripes=4)
+    ids = [store.add(PokemonInfo("", False)).id for _ in range(8)]
+
+    def append(n: int) -> None:
+        for i in range(400):
+            store.modify(ids[i % len(ids)], lambda info: PokemonInfo(info.name + "x", info.published))
+            store.patch(ids[(i + n) % len(ids)], PatchPokemonInfo(published=i % 2 == 0))
+
+    hammer(append)
+
+    assert sum(len(store.get_one(id).info.name) for id in ids) == THREADS * 400
+
+
+def test_add_does_not_overwrite_upsert_of_its_id(monkeypatch) -> None:
+    store = ConcurrentStore()
+    allocate = IdAllocator.allocate
+
+    def upsert_first(ids: IdAllocator, count: int = 1) -> range:
+        allocated = allocate(ids, count)
+        if allocated.start in (0, 10):
+            # an upsert of the same id wins the stripe lock before the add stores it
+            store.upsert(allocated.start, PokemonInfo("upserted", True))
+        return allocated
+
+    monkeypatch.setattr(IdAllocator, "allocate", upsert_first)
+
+    assert store.add(PokemonInfo("added", False)).id == 1
+    store.ids.next_id = 10
+    assert store.add_many([PokemonInfo("added", False)] * 3) == range(13, 16)
+    assert store.get_one(0).info.name == store.get_one(10).info.name == "upserted"
+    assert len(store) == 6
+
+
+def test_order_is_compacted_under_churn(monkeypatch) -> None:
+    monkeypatch.setattr(concurrent, "ORDER_SLACK", 8)
+    store = ConcurrentStore(stripes=4)
+    store.add_many([PokemonInfo(f"p{i}", i % 2 == 0) for i in range(20)])
+
+    for round in range(50):
+        for id in range(5, 15):
+            store.delete(id)
+            store.upsert(id, PokemonInfo(f"p{id}", id % 2 == 0))
+
+    assert len(store._order) <= 2 * len(store) + 8 + 1
+    listed = [e.id for e in store.get_many(0, 100)]
+    assert listed[:5] == [0, 1, 2, 3, 4]
+    assert sorted(listed) == list(range(20))
+
+
+@pytest.mark.parametrize("limit", [7, 100])
+def test_readers_see_whole_records_while_writers_run(limit: int, monkeypatch) -> None:
+    # frequent compactions while pages are read
+    monkeypatch.setattr(concurrent, "ORDER_SLACK", 16)
+    store = ConcurrentStore()
+    store.add_many([PokemonInfo("even", False) for _ in range(200)])
+    stop = threading.Event()
+    errors = []
+
+    def write() -> None:
+        i = 0
+        while not stop.is_set():
+            id = i % 200
+            # name and published always change together
+            store.update(id, PokemonInfo("odd" if i % 2 else "even", bool(i % 2)))
+            store.delete(200 + i % 50)
+            store.upsert(200 + (i + 25) % 50, PokemonInfo("even", False))
+            i += 1
+
+    def read(n: int) -> None:
+        for _ in range(200):
+            page = store.get_many(n * 3, limit)
+            if len({e.id for e in page}) != len(page):
+                errors.append("duplicate id in page")
+            # ids below 200 are never deleted, so pages are never short
+            if len(page) != limit:
+                errors.append(f"page of {len(page)} records")
+            for entity in page:
+                if (entity.info.name == "odd") != entity.info.published:
+                    errors.append(f"torn record {entity}")
+
+    writers = [threading.Thread(target=write) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    try:
+        hammer(read, 8)
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+
+    assert errors == []
+
+
+def test_sync_handlers_share_the_store_across_threads() -> None:
+    store = ConcurrentStore()
+    app = FastAPI()
+
+    # plain def handlers run in the threadpool, concurrently with each other
+    @app.post("/pokemon/", status_code=201)
+    def post_pokemon(info: PokemonRequest) -> PokemonResponse:
+        return PokemonResponse.from_entity(store.add(info.as_pokemon_info()))
+
+    @app.put("/pokemon/{id}")
+    def put_pokemon(id: int, info: PokemonRequest) -> PokemonResponse:
+        return PokemonResponse.from_entity(store.upsert(id, info.as_pokemon_info()))
+
+    client = TestClient(app)
+
+    def requests(n: int) -> list[int]:
+        ids = []
+        for i in range(20):
+            response = client.post("/pokemon/", json={"name": f"{n}-{i}", "published": True})
+            assert response.status_code == 201
+            ids.append(response.json()["id"])
+            assert client.put(f"/pokemon/{1000 + n}", json={"name": f"put {i}", "published": False}).status_code == 200
+        return ids
+
+    ids = [id for chunk in hammer(requests, 8) for id in chunk]
+
+    assert len(set(ids)) == len(ids) == 160
+    assert len(store) == 168
+    assert all(store.get_one(id).info.name != "put" for id in ids)
+
+
+def test_concurrent_engine_refuses_a_data_dir(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv(queries.ENGINE_ENV, "concurrent")
+    assert isinstance(queries._open_store(), ConcurrentStore)
+
+    monkeypatch.setenv(DATA_DIR_ENV, str(tmp_path))
+    with pytest.raises(ValueError):
+        queries._open_store()
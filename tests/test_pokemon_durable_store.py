@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from lecture_2.rest_example.store import (
+    DurableStore,
+    FsyncPolicy,
+    PatchPokemonInfo,
+    PokemonInfo,
+)
+from lecture_2.rest_example.store import durable
+from lecture_2.rest_example.store.durable import SNAPSHOT_NAME, WAL_NAME, log_segments, read_records
+
+
+def contents(store: DurableStore) -> list[tuple[int, str, bool]]:
+    return sorted((e.id, e.info.name, e.info.published) for e in store.store.entities())
+
+
+def mutate(store: DurableStore) -> None:
+    for i in range(10):
+        store.add(PokemonInfo(f"p{i}", False))
+    store.delete(3)
+    store.delete(9)
+    store.update(1, PokemonInfo("updated", True))
+    store.upsert(42, PokemonInfo("upserted", False))
+    store.patch(2, PatchPokemonInfo(published=True))
+    store.patch(42, PatchPokemonInfo(name="patched"))
+
+
+@pytest.mark.parametrize("policy", list(FsyncPolicy))
+def test_log_is_replayed_on_restart(tmp_path, policy: FsyncPolicy) -> None:
+    store = DurableStore(str(tmp_path), policy)
+    mutate(store)
+    expected = contents(store)
+    store.close()
+
+    reopened = DurableStore(str(tmp_path), policy)
+    assert contents(reopened) == expected
+    # ids are not handed out twice, even those of deleted pokemon
+    assert reopened.add(PokemonInfo("new", True)).id == 43
+    reopened.close()
+
+
+def test_snapshot_truncates_log(tmp_path) -> None:
+    store = DurableStore(str(tmp_path), FsyncPolicy.NEVER, snapshot_every=5)
+    mutate(store)
+    expected = contents(store)
+    store.close()
+
+    # the log keeps only records after the last snapshot, its segments are gone
+    with open(tmp_path / WAL_NAME, "rb") as file:
+        assert len(list(read_records(file))) < 16
+    assert os.path.exists(tmp_path / SNAPSHOT_NAME)
+    assert log_segments(str(tmp_path)) == []
+
+    reopened = DurableStore(str(tmp_path))
+    assert contents(reopened) == expected
+    reopened.close()
+
+
+def test_torn_tail_is_dropped(tmp_path) -> None:
+    store = DurableStore(str(tmp_path), FsyncPolicy.ALWAYS)
+    mutate(store)
+    expected = contents(store)
+    store.add(PokemonInfo("torn", True))
+    store.close()
+
+    with open(tmp_path / WAL_NAME, "r+b") as file:
+        file.truncate(os.path.getsize(tmp_path / WAL_NAME) - 3)
+
+    reopened = DurableStore(str(tmp_path), FsyncPolicy.ALWAYS)
+    assert contents(reopened) == expected
+    reopened.add(PokemonInfo("after restart", True))
+    reopened.close()
+
+    # records written after the torn tail are not lost on the next restart
+    again = DurableStore(str(tmp_path))
+    assert "after restart" in {name for _, name, _ in contents(again)}
+    again.close()
+
+
+def test_rejected_upsert_is_not_logged(tmp_path) -> None:
+    store = DurableStore(str(tmp_path), FsyncPolicy.ALWAYS)
+    store.add(PokemonInfo("first", True))
+    with pytest.raises(ValueError):
+        store.upsert(2**63, PokemonInfo("too far", True))
+    store.upsert(2**63 - 1, PokemonInfo("far", True))
+    assert store.add(PokemonInfo("second", True)).id == 1
+    expected = contents(store)
+    store.close()
+
+    reopened = DurableStore(str(tmp_path))
+    assert contents(reopened) == expected
+    assert reopened.add(PokemonInfo("third", True)).id == 2
+    reopened.close()
+
+
+def test_snapshot_is_written_off_the_caller_thread(tmp_path, monkeypatch) -> None:
+    release, threads = threading.Event(), []
+    write_snapshot = durable.write_snapshot
+
+    def blocking_write_snapshot(*args) -> None:
+        threads.append(threading.current_thread())
+        assert release.wait(5)
+        write_snapshot(*args)
+
+    monkeypatch.setattr(durable, "write_snapshot", blocking_write_snapshot)
+    store = DurableStore(str(tmp_path), FsyncPolicy.NEVER, snapshot_every=3)
+    for i in range(3):
+        store.add(PokemonInfo(f"p{i}", False))
+    # mutations go on while the snapshot is being written
+    store.patch(0, PatchPokemonInfo(name="patched"))
+    store.delete(1)
+    store.add(PokemonInfo("during snapshot", True))
+    expected = contents(store)
+
+    release.set()
+    store.close()
+    assert threads and threads[0] is not threading.current_thread()
+
+    reopened = DurableStore(str(tmp_path))
+    assert contents(reopened) == expected
+    reopened.close()
+
+
+def test_failed_snapshot_keeps_log_segments(tmp_path, monkeypatch) -> None:
+    def failing_write_snapshot(*args) -> None:
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(durable, "write_snapshot", failing_write_snapshot)
+        store = DurableStore(str(tmp_path), FsyncPolicy.INTERVAL, snapshot_every=4)
+        mutate(store)
+        expected = contents(store)
+        store.close()
+
+    assert log_segments(str(tmp_path)) != []
+    reopened = DurableStore(str(tmp_path))
+    assert contents(reopened) == expected
+    assert log_segments(str(tmp_path)) == []
+    reopened.close()
+
+
+def test_sync_writes_records_with_always_policy(tmp_path) -> None:
+    store = DurableStore(str(tmp_path), FsyncPolicy.ALWAYS)
+    store.add(PokemonInfo("first", True))
+    store.upsert(7, PokemonInfo("second", False))
+    asyncio.run(store.sync())
+
+    with open(tmp_path / WAL_NAME, "rb") as file:
+        assert [id for _, id, _ in read_records(file)] == [0, 7]
+    store.close()
@@ -1,3 +1,4 @@
+import json
 from dataclasses import asdict
 from http import HTTPStatus
 
@@ -6,6 +7,8 @@ from faker import Faker
 from fastapi.testclient import TestClient
 
 from lecture_2.rest_example import store
+from lecture_2.rest_example.api.pokemon import PokemonResponse
+from lecture_2.rest_example.api.pokemon.contracts import pokemon_json
 from lecture_2.rest_example.main import app
 from lecture_2.rest_example.store.models import PokemonEntity, PokemonInfo
 
@@ -92,6 +95,23 @@ def test_get_pokemon_list(
             assert any(p.id == item["id"] for p in existing_pokemons)
 
 
+@pytest.mark.parametrize("published", [True, False])
+def test_get_pokemon_list_filtered(existing_pokemons: list[PokemonEntity], published: bool) -> None:
+    prefix = existing_pokemons[0].info.name[:1]
+    response = client.get(
+        "/pokemon", params={"published": published, "name_prefix": prefix, "limit": 1000}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    ids = {item["id"] for item in response.json()}
+    for item in response.json():
+        assert item["published"] == published
+        assert item["name"].startswith(prefix)
+    for pokemon in existing_pokemons:
+        if pokemon.info.published == published and pokemon.info.name.startswith(prefix):
+            assert pokemon.id in ids
+
+
 def test_delete_pokemon(existing_pokemon: PokemonEntity) -> None:
     response = client.delete(f"/pokemon/{existing_pokemon.id}")
 
@@ -180,6 +200,23 @@ def test_put_pokemon(
         assert response.json() == {"id": entity.id, **new_body}
 
 
+def test_put_pokemon_far_ids() -> None:
+    response = client.put(f"/pokemon/{2**63 - 1}", params={"upsert": True}, json={"name": "far", "published": True})
+    assert response.status_code == HTTPStatus.OK
+
+    try:
+        response = client.post("/pokemon", json={"name": "after far", "published": True})
+        assert response.status_code == HTTPStatus.CREATED
+        store.delete(response.json()["id"])
+    finally:
+        store.delete(2**63 - 1)
+
+    for id in (2**63, -(2**63) - 1):
+        response = client.put(f"/pokemon/{id}", params={"upsert": True}, json={"name": "x", "published": True})
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert client.get(f"/pokemon/{id}").status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 def test_post_pokemon(pokemon_info: PokemonInfo) -> None:
     response = client.post("/pokemon", json=asdict(pokemon_info))
 
@@ -223,3 +260,78 @@ def test_patch_pokemon(request, pokemon: str, data: dict, status_code: int) -> N
         for key in ["name", "published"]:
             if key in data:
                 assert response_data[key] == data[key]
+
+
+def test_bulk_import_and_export() -> None:
+    infos = [PokemonInfo(faker.name(), faker.boolean()) for _ in range(2500)]
+    body = "\n".join(json.dumps(asdict(info)) for info in infos) + "\n\n"
+
+    # generator body is sent chunked, like a client streaming a large file
+    response = client.post(
+        "/pokemon/bulk", content=(body[i:i + 777].encode() for i in range(0, len(body), 777))
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+    data = response.json()
+    assert data["created"] == len(infos)
+    [[first, last]] = data["ids"]
+    assert last - first + 1 == len(infos)
+
+    exported = {}
+    with client.stream("GET", "/pokemon/export") as response:
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        for line in response.iter_lines():
+            record = json.loads(line)
+            exported[record.pop("id")] = record
+
+    for id, info in zip(range(first, last + 1), infos):
+        assert exported[id] == asdict(info)
+        store.delete(id)
+
+
+def test_bulk_import_rejects_invalid_line() -> None:
+    body = '{"name": "a", "published": true}\n{"name": "b"}\n'
+
+    response = client.post("/pokemon/bulk", content=body)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()["detail"].startswith("line 2: ")
+
+
+def test_bulk_import_reports_physical_line_numbers() -> None:
+    body = '\n{"name": "a", "published": true}\n\n{"name": "b"}\n'
+
+    response = client.post("/pokemon/bulk", content=(body[i:i + 5].encode() for i in range(0, len(body), 5)))
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()["detail"].startswith("line 4: ")
+
+
+@pytest.mark.parametrize("end", ["\n", ""])
+def test_bulk_import_rejects_long_lines(end: str) -> None:
+    long_line = json.dumps({"name": "x" * 200_000, "published": True})
+    body = '{"name": "a", "published": true}\n' + long_line + end
+
+    response = client.post("/pokemon/bulk", content=body)
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert response.json()["detail"].startswith("line 2: ")
+
+
+@pytest.mark.parametrize("name", ["plain", 'quote " and \\\\ backslash', "line\nbreak\ttab", "ünïcødé ☃", "\x00\x1f"])
+@pytest.mark.parametrize("published", [True, False])
+def test_pokemon_json_matches_response_model(name: str, published: bool) -> None:
+    entity = PokemonEntity(7, PokemonInfo(name, published))
+
+    encoded = pokemon_json(entity)
+
+    assert encoded == PokemonResponse.from_entity(entity).model_dump_json().encode()
+    assert json.loads(encoded) == {"id": 7, "name": name, "published": published}
+
+
+def test_openapi_documents_response_models() -> None:
+    paths = client.get("/openapi.json").json()["paths"]
+
+    schema = paths["/pokemon/{id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/PokemonResponse"}
@@ -0,0 +1,193 @@
+import random
+
+import pytest
+
+from lecture_2.rest_example.store import (
+    ConcurrentStore,
+    DenseStore,
+    PatchPokemonInfo,
+    PokemonInfo,
+)
+from lecture_2.rest_example.store.engine import MAX_ID, MIN_ID
+
+
+def listing(store: DenseStore) -> list[tuple[int, str]]:
+    return [(e.id, e.info.name) for e in store.get_many(0, len(store) + 1)]
+
+
+def test_add_get_delete_reuses_slots() -> None:
+    store = DenseStore()
+    entities = [store.add(PokemonInfo(f"p{i}", i % 2 == 0)) for i in range(5)]
+    assert [e.id for e in entities] == [0, 1, 2, 3, 4]
+
+    store.delete(1)
+    store.delete(1)
+    assert store.get_one(1) is None
+    assert len(store) == 4
+
+    # the freed slot is reused, ids keep growing
+    entity = store.add(PokemonInfo("new", True))
+    assert entity.id == 5
+    assert listing(store) == [(0, "p0"), (5, "new"), (2, "p2"), (3, "p3"), (4, "p4")]
+
+
+def test_update_upsert_patch() -> None:
+    store = DenseStore()
+    entity = store.add(PokemonInfo("old", False))
+
+    assert store.update(entity.id, PokemonInfo("new", True)).info == PokemonInfo("new", True)
+    assert store.update(100, PokemonInfo("missing", True)) is None
+    assert store.patch(100, PatchPokemonInfo(name="missing")) is None
+    assert store.patch(entity.id, PatchPokemonInfo(published=False)).info == PokemonInfo("new", False)
+
+    assert store.upsert(7, PokemonInfo("upserted", True)).id == 7
+    assert store.add(PokemonInfo("after upsert", True)).id == 8
+
+
+@pytest.mark.parametrize("id", [-5, 10**12])
+def test_upsert_far_ids(id: int) -> None:
+    store = DenseStore()
+    store.upsert(id, PokemonInfo("far", True))
+
+    assert store.get_one(id).info.name == "far"
+    store.delete(id)
+    assert store.get_one(id) is None
+    assert len(store) == 0
+
+
+@pytest.mark.parametrize("offset", [0, 1, 37, 499, 500, 1000])
+def test_get_many_matches_linear_walk(offset: int) -> None:
+    store = DenseStore()
+    rng = random.Random(offset)
+    for i in range(1000):
+        store.add(PokemonInfo(f"p{i}", True))
+    for id in rng.sample(range(1000), 400):
+        store.delete(id)
+    for i in range(100):
+        store.add(PokemonInfo(f"q{i}", False))
+
+    everything = listing(store)
+    assert len(everything) == len(store) == 700
+    assert [(e.id, e.info.name) for e in store.get_many(offset, 25)] == everything[offset:offset + 25]
+
+
+def test_cursor_pages_cover_all_records() -> None:
+    store = DenseStore()
+    for i in range(95):
+        store.add(PokemonInfo(f"p{i}", True))
+    for id in range(0, 95, 3):
+        store.delete(id)
+
+    seen, cursor = [], 0
+    while cursor is not None:
+        page, cursor = store.get_page(cursor, 10)
+        assert len(page) <= 10
+        seen.extend((e.id, e.info.name) for e in page)
+
+    assert seen == listing(store)
+
+
+def linear_filter(store: DenseStore, published: bool | None, name_prefix: str | None) -> list:
+    return [
+        (e.id, e.info.name, e.info.published)
+        for e in store.get_many(0, len(store) + 1)
+        if (published is None or e.info.published == published)
+        and (name_prefix is None or e.info.name.startswith(name_prefix))
+    ]
+
+
+@pytest.mark.parametrize("published", [None, True, False])
+@pytest.mark.parametrize("name_prefix", [None, "", "b", "ba", "bar", "zzz"])
+def test_filtered_listing_matches_linear_filter(published: bool | None, name_prefix: str | None) -> None:
+    store = DenseStore()
+    rng = random.Random(0)
+    names = ["a", "b", "ba", "bar", "bark", "baz", "c"]
+    for i in range(600):
+        store.add(PokemonInfo(rng.choice(names), rng.random() < 0.3))
+    for id in rng.sample(range(600), 200):
+        store.delete(id)
+    for id in rng.sample(range(600), 200):
+        if store.get_one(id) is not None:
+            store.patch(id, PatchPokemonInfo(name=rng.choice(names), published=rng.random() < 0.5))
+    for id in rng.sample(range(600), 50):
+        store.upsert(id, PokemonInfo(rng.choice(names), rng.random() < 0.5))
+    for i in range(50):
+        store.add(PokemonInfo(rng.choice(names), rng.random() < 0.3))
+
+    expected = linear_filter(store, published, name_prefix)
+    for offset in (0, 3, 50, len(expected) - 1, len(expected) + 5):
+        page = store.get_many(max(offset, 0), 20, published, name_prefix)
+        assert [(e.id, e.info.name, e.info.published) for e in page] == expected[max(offset, 0):][:20]
+
+
+@pytest.mark.parametrize("published", [None, True, False])
+@pytest.mark.parametrize("offset", [0, 7, 900, 1999])
+def test_common_prefix_is_scanned_in_slot_order(published: bool | None, offset: int) -> None:
+    store = DenseStore()
+    rng = random.Random(offset)
+    for i in range(2000):
+        store.add(PokemonInfo(f"{rng.choice('ppppq')}{rng.randrange(100)}", rng.random() < 0.5))
+    for id in rng.sample(range(2000), 300):
+        store.delete(id)
+
+    expected = linear_filter(store, published, "p")
+    page = store.get_many(offset, 10, published, "p")
+    assert [(e.id, e.info.name, e.info.published) for e in page] == expected[offset:offset + 10]
+
+
+def test_count_prefixed_matches_names() -> None:
+    store = DenseStore()
+    rng = random.Random(0)
+    names = [f"{rng.choice(['a', 'ab', 'abc', 'b', 'ba'])}{rng.randrange(10)}" for _ in range(5000)]
+    for name in names:
+        store.add(PokemonInfo(name, True))
+
+    for prefix in ["a", "ab", "abc", "abc1", "b", "ba9", "c", "\U0010ffff"]:
+        assert store._names.count_prefixed(prefix) == sum(name.startswith(prefix) for name in names)
+
+
+def test_add_many_reserves_one_id_range() -> None:
+    store = DenseStore()
+    store.add(PokemonInfo("first", True))
+    store.delete(0)
+
+    ids = store.add_many([PokemonInfo(f"p{i}", i % 2 == 0) for i in range(5)])
+
+    assert ids == range(1, 6)
+    assert [e.id for e in store.get_many(0, 10, published=True)] == [1, 3, 5]
+    assert store.add(PokemonInfo("next", False)).id == 6
+
+
+@pytest.mark.parametrize("store_type", [DenseStore, ConcurrentStore])
+@pytest.mark.parametrize("id", [MIN_ID, MAX_ID, 10**6])
+def test_far_upserts_do_not_use_up_ids(store_type: type, id: int) -> None:
+    store = store_type()
+    store.add(PokemonInfo("first", True))
+    store.upsert(id, PokemonInfo("far", True))
+
+    assert store.add(PokemonInfo("next", True)).id == 1
+    assert store.add_many([PokemonInfo("many", True)] * 3) == range(2, 5)
+    assert store.get_one(id).info.name == "far"
+
+
+def test_adds_step_over_far_upserted_ids() -> None:
+    store = DenseStore()
+    store.upsert(2**17, PokemonInfo("far", True))
+    store.upsert(2**17 + 2, PokemonInfo("far", True))
+    store.next_id = 2**17 - 1
+
+    assert store.add(PokemonInfo("before", True)).id == 2**17 - 1
+    assert store.add(PokemonInfo("between", True)).id == 2**17 + 1
+    assert store.add_many([PokemonInfo("after", True)] * 2) == range(2**17 + 3, 2**17 + 5)
+    assert len(store) == 6
+
+
+@pytest.mark.parametrize("store_type", [DenseStore, ConcurrentStore])
+@pytest.mark.parametrize("id", [MIN_ID - 1, MAX_ID + 1])
+def test_upsert_rejects_ids_out_of_int64_range(store_type: type, id: int) -> None:
+    store = store_type()
+    with pytest.raises(ValueError):
+        store.upsert(id, PokemonInfo("too far", True))
+
+    assert len(store) == 0
+    assert store.add(PokemonInfo("first", True)).id == 0
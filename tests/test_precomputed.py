@@ -0,0 +1,99 @@
+import json
+import math
+from pathlib import Path
+
+import pytest
+from async_asgi_testclient import TestClient
+
+from lecture_1.hw.math_plain_asgi import app
+from lecture_1.precomputed import (
+    ResultTable,
+    Tables,
+    default_tables,
+    factorial_bodies,
+    fibonacci_bodies,
+    write_table,
+)
+
+
+@pytest.fixture()
+def tables(tmp_path: Path):
+    write_table(tmp_path / "factorial.tbl", 100, factorial_bodies(100))
+    write_table(tmp_path / "fibonacci.tbl", 200, fibonacci_bodies(200))
+
+    tables = Tables()
+    tables.load(tmp_path)
+
+    yield tables
+
+    tables.factorial.close()
+    tables.fibonacci.close()
+
+
+def test_table_roundtrip(tables: Tables) -> None:
+    assert tables.factorial.count == 100
+    for n in range(100):
+        assert json.loads(bytes(tables.factorial_body(n))) == {
+            "result": math.factorial(n)
+        }
+
+    assert bytes(tables.fibonacci_body(10)) == b'{"result": 89}'
+    assert tables.factorial_body(100) is None
+    assert tables.fibonacci_body(-1) is None
+    assert Tables().factorial_body(1) is None
+
+
+def test_not_a_table(tmp_path: Path) -> None:
+    path = tmp_path / "garbage.tbl"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        ResultTable.open(path)
+
+
+def marked(bodies):
+    # same values plus a key the computed responses never have
+    for body in bodies:
+        yield body[:-1] + b', "table": true}'
+
+
+@pytest.fixture()
+def marked_tables(tmp_path: Path):
+    write_table(tmp_path / "factorial.tbl", 100, marked(factorial_bodies(100)))
+    write_table(tmp_path / "fibonacci.tbl", 200, marked(fibonacci_bodies(200)))
+
+    tables = Tables()
+    tables.load(tmp_path)
+
+    yield tables
+
+    tables.factorial.close()
+    tables.fibonacci.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("path", "query", "body"),
+    [
+        ("/factorial", {"n": 5}, b'{"result": 120, "table": true}'),
+        ("/factorial", {"n": 150}, None),
+        ("/fibonacci/10", {}, b'{"result": 89, "table": true}'),
+        ("/fibonacci/300", {}, None),
+    ],
+)
+async def test_served_from_tables(
+    monkeypatch, marked_tables: Tables, path: str, query: dict, body: bytes | None
+) -> None:
+    monkeypatch.setattr(default_tables, "factorial", marked_tables.factorial)
+    monkeypatch.setattr(default_tables, "fibonacci", marked_tables.fibonacci)
+
+    async with TestClient(app) as client:
+        response = await client.get(path, query_string=query)
+
+    assert response.status_code == 200
+    if body is not None:
+        assert response.content == body
+    else:
+        # past the end of the tables, computed
+        assert "result" in response.json()
+        assert "table" not in response.json()
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from argparse import Namespace
+
+import pytest
+
+from lecture_2.hw.run_shop_api import Call, Histogram, LoadGenerator, Shop, run
+from tests.helpers import get
+
+
+def test_histogram_percentiles_within_precision() -> None:
+    rng = random.Random(0)
+    samples = sorted(rng.lognormvariate(-6, 1) for _ in range(20_000))
+    histogram = Histogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    for q in (50, 95, 99, 99.9):
+        exact = samples[int(q / 100 * len(samples)) - 1]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.02)
+
+    assert histogram.percentile(100) == samples[-1]
+    assert Histogram().percentile(99) == 0.0
+
+
+class StubPool:
+    async def request(self, method: str, target: str, body: bytes = b"") -> tuple[int, bytes]:
+        return 201, b"not json"
+
+
+def test_unexpected_errors_are_recorded() -> None:
+    generator = LoadGenerator(StubPool(), Shop(random.Random(0)), {})
+    call = Call("POST /item", "POST", "/item", expected=201, on_success=json.loads)
+
+    asyncio.run(generator._send(call, 0.0))
+
+    assert generator.stats["POST /item"].errors == {"JSONDecodeError": 1}
+
+
+@pytest.mark.slow
+def test_open_loop_run_against_shop_api(free_port: int) -> None:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "lecture_2.hw.shop_api.main:app",
+            f"--port={free_port}",
+            "--log-level=warning",
+        ]
+    )
+
+    try:
+        get(free_port, "/item")
+        args = Namespace(
+            url=f"http://127.0.0.1:{free_port}",
+            rps=200.0,
+            concurrency=8,
+            max_in_flight=1000,
+            duration=1.0,
+            weights=[],
+            seed_items=40,
+            seed_carts=5,
+            seed=1,
+        )
+
+        start = time.perf_counter()
+        generator = asyncio.run(run(args))
+
+        assert time.perf_counter() - start < 10
+        total = sum(stats.latency.total for stats in generator.stats.values())
+        assert 100 < total < 300
+        assert all(not stats.errors for stats in generator.stats.values())
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
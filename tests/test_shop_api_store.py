@@ -0,0 +1,261 @@
+import json
+import math
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import ValidationError
+
+from lecture_2.hw.shop_api.models import Cart, Item
+from lecture_2.hw.shop_api.repository import (
+    CartRepository,
+    ItemRepository,
+    open_repositories,
+)
+from lecture_2.hw.shop_api.store import InvalidCursor
+
+
+def collect_pages(list_page, limit: int, **filters) -> list:
+    result, cursor = [], None
+    while True:
+        page = list_page(limit=limit, cursor=cursor, **filters)
+        result.extend(page.entities)
+        cursor = page.next_cursor
+        if cursor is None:
+            return result
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repositories(request, tmp_path) -> tuple[ItemRepository, CartRepository]:
+    if request.param == "sqlite":
+        return open_repositories(f"sqlite:///{tmp_path / 'shop.db'}")
+    return open_repositories("memory")
+
+
+@pytest.fixture()
+def item_store(repositories: tuple[ItemRepository, CartRepository]) -> ItemRepository:
+    rng = random.Random(1)
+    store, _ = repositories
+
+    for i in range(300):
+        store.create(f"item {i}", round(rng.uniform(1.0, 100.0), 1))
+
+    for id in rng.sample(range(1, 301), 60):
+        store.delete(id)
+
+    for id in rng.sample(range(1, 301), 60):
+        store.patch(id, {"price": round(rng.uniform(1.0, 100.0), 1)})
+
+    return store
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"show_deleted": True},
+        {"min_price": 20.0},
+        {"max_price": 50.0},
+        {"min_price": 20.0, "max_price": 50.0, "show_deleted": True},
+        {"min_price": 200.0},
+    ],
+)
+@pytest.mark.parametrize("limit", [1, 7, 1000])
+def test_item_list_matches_linear_filter(
+    item_store: ItemRepository, filters: dict, limit: int
+) -> None:
+    min_price = filters.get("min_price", float("-inf"))
+    max_price = filters.get("max_price", float("inf"))
+    expected = {
+        item.id
+        for item in map(item_store.get, range(1, 301))
+        if (filters.get("show_deleted") or not item.deleted)
+        and min_price <= item.price <= max_price
+    }
+
+    by_price = "min_price" in filters or "max_price" in filters
+    order = (lambda id: (item_store.get(id).price, id)) if by_price else None
+
+    paged = collect_pages(item_store.list, limit, **filters)
+
+    assert [item.id for item in paged] == sorted(expected, key=order)
+
+    offset_page = item_store.list(offset=5, limit=limit, **filters).entities
+    assert offset_page == paged[5 : 5 + limit]
+
+
+def test_cart_list_matches_linear_filter(
+    repositories: tuple[ItemRepository, CartRepository],
+) -> None:
+    rng = random.Random(2)
+    items, carts = repositories
+    all_items = [items.create(f"item {i}", rng.uniform(1.0, 10.0)) for i in range(20)]
+
+    for _ in range(200):
+        cart = carts.create()
+        for _ in range(rng.randint(0, 8)):
+            carts.add_item(cart.id, rng.choice(all_items))
+
+    filters = {"min_price": 10.0, "max_price": 40.0, "min_quantity": 2, "max_quantity": 6}
+    expected = {
+        cart.id
+        for cart in map(carts.get, range(1, 201))
+        if 10.0 <= cart.price <= 40.0
+        and 2 <= sum(line.quantity for line in cart.items) <= 6
+    }
+
+    for limit in (1, 3, 500):
+        assert {cart.id for cart in collect_pages(carts.list, limit, **filters)} == expected
+
+
+def test_cart_lines_and_aggregates() -> None:
+    cart = Cart(id=1)
+    first, second = Item(id=1, name="a", price=2.0), Item(id=2, name="b", price=3.0)
+
+    for item in (first, second, first, first):
+        cart.add(item)
+
+    assert [(line.id, line.quantity) for line in cart.items] == [(1, 3), (2, 1)]
+    assert cart.line(1) is cart.items[0]
+    assert cart.quantity == 4
+    assert cart.price == 9.0
+    assert set(cart.model_dump()) == {"id", "items", "price"}
+
+    restored = Cart.model_validate(cart.model_dump())
+    assert restored.quantity == 4
+    assert restored.line(2).quantity == 1
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "WyJpZCIsWyJ4Il1d", "WyJwcmljZSIsWzFdXQ"])
+def test_invalid_cursor(item_store: ItemRepository, cursor: str) -> None:
+    with pytest.raises(InvalidCursor):
+        item_store.list(cursor=cursor)
+
+
+def test_sqlite_storage_is_shared_and_durable(tmp_path) -> None:
+    url = f"sqlite:///{tmp_path / 'shop.db'}"
+    items, carts = open_repositories(url)
+
+    item = items.create("durable", 5.0)
+    cart = carts.create()
+    carts.add_item(cart.id, item)
+    carts.add_item(cart.id, item)
+
+    # a second handle behaves like another worker process
+    other_items, other_carts = open_repositories(url)
+    assert other_items.get(item.id) == item
+    assert other_carts.get(cart.id) == carts.get(cart.id)
+    assert other_carts.get(cart.id).model_dump() == {
+        "id": cart.id,
+        "items": [{"id": item.id, "name": "durable", "quantity": 2, "available": True}],
+        "price": 10.0,
+    }
+    assert other_carts.add_item(cart.id + 1, item) is None
+
+
+def test_batch_operations(repositories: tuple[ItemRepository, CartRepository]) -> None:
+    items, carts = repositories
+    created = items.create_many([("a", 1.0), ("b", 2.5), ("c", 4.0)])
+
+    assert [(item.name, item.price) for item in created] == [("a", 1.0), ("b", 2.5), ("c", 4.0)]
+    assert items.get_many([created[2].id, 10**6, created[0].id]) == [created[2], None, created[0]]
+
+    cart = carts.create()
+    carts.add_item(cart.id, created[0])
+    cart = carts.add_items(cart.id, [(created[1], 2), (created[0], 3)])
+
+    assert [(line.id, line.quantity) for line in cart.items] == [
+        (created[0].id, 4),
+        (created[1].id, 2),
+    ]
+    assert cart.quantity == 6
+    assert cart.price == pytest.approx(9.0)
+    assert carts.list(min_quantity=6).entities == [cart]
+    assert carts.add_items(cart.id + 1, [(created[0], 1)]) is None
+
+
+def test_cached_json_follows_mutations(
+    repositories: tuple[ItemRepository, CartRepository],
+) -> None:
+    items, carts = repositories
+    item = items.create("a", 2.0)
+    cart = carts.create()
+
+    assert json.loads(items.get(item.id).json_bytes()) == item.model_dump()
+
+    items.delete(item.id)
+    assert json.loads(items.get(item.id).json_bytes())["deleted"] is True
+
+    carts.get(cart.id).json_bytes()
+    carts.add_item(cart.id, item)
+    carts.add_items(cart.id, [(item, 2)])
+    cached = json.loads(carts.get(cart.id).json_bytes())
+    assert cached == carts.get(cart.id).model_dump()
+    assert cached["items"][0]["quantity"] == 3
+
+    patched = items.patch(item.id, {"price": 3.0})
+    assert json.loads(items.get(item.id).json_bytes())["price"] == 3.0
+    assert patched.json_bytes() == items.get(item.id).json_bytes()
+
+
+@pytest.mark.parametrize("price", [math.nan, math.inf, -math.inf])
+def test_prices_must_be_finite(price: float) -> None:
+    items, _ = open_repositories("memory")
+    item = items.create("a", 1.0)
+
+    with pytest.raises(ValidationError):
+        items.create("b", price)
+    with pytest.raises(ValidationError):
+        items.patch(item.id, {"price": price})
+
+    assert [i.id for i in items.list(min_price=0, max_price=10).entities] == [item.id]
+
+
+def test_memory_store_shared_by_threads() -> None:
+    # switch threads often so unguarded multi-step mutations interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    items, carts = open_repositories("memory")
+    cart_ids = [carts.create().id for _ in range(8)]
+
+    def work(n: int) -> tuple[list[int], int]:
+        rng = random.Random(n)
+        created, added = [], 0
+        for i in range(200):
+            item = items.create(f"{n}-{i}", rng.uniform(0, 100))
+            created.append(item.id)
+            target = rng.choice(created)
+            match rng.randrange(4):
+                case 0:
+                    items.replace(target, "replaced", rng.uniform(0, 100))
+                case 1:
+                    items.patch(target, {"price": rng.uniform(0, 100)})
+                case 2:
+                    items.delete(target)
+                case 3:
+                    carts.add_item(rng.choice(cart_ids), item)
+                    added += 1
+            collect_pages(items.list, 50, min_price=10, max_price=90)
+            carts.list(min_price=0, min_quantity=1)
+        return created, added
+
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(work, range(8)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    ids = [id for created, _ in results for id in created]
+    assert sorted(ids) == list(range(1, len(ids) + 1))
+
+    every = collect_pages(items.list, 100, show_deleted=True)
+    assert [item.id for item in every] == sorted(ids)
+    by_price = collect_pages(items.list, 100, min_price=0, max_price=100)
+    assert [(i.price, i.id) for i in by_price] == sorted(
+        (i.price, i.id) for i in every if not i.deleted
+    )
+    assert sum(cart.quantity for cart in collect_pages(carts.list, 3, min_quantity=0)) == sum(
+        added for _, added in results
+    )